@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Skip-if-Unchanged Writer for Generated JSON Artifacts
+
+The schema, display and JSON-LD files produced by the post-publisher scripts
+(generate_valueset_schemas.py, generate_jsonld_vocabularies.py and
+generate_logical_model_schemas.py) are mostly identical from one run to the
+next, apart from volatile fields such as the JSON-LD "generatedAt" timestamp.
+
+write_json() hashes the JSON exactly as it would be written, with the
+volatile fields left out, and only writes the file when that hash differs
+from the one of the file already on disk. Unchanged artifacts therefore keep
+their content and mtime, and re-deploys only upload what really changed.
+
+The hashes are recorded per output directory in a compact manifest kept
+with the build state (input/temp/artifact-manifest.json, so it is not
+published with the output) and unchanged files do not even have to be read
+back on the next run. The manifest is only a cache: a file whose size or
+mtime no longer matches its manifest entry is re-hashed from disk.
+
+write_json_stream() does the same for a document with one large array
+member, which is rendered and hashed one array item at a time, so the
+array never has to be built in memory. write_text_stream() covers non-JSON
+artifacts such as the N-Quads export, hashing their text as written.
+
+Usage:
+    if artifact_writer.write_json(schema, filepath):
+        ...  # written
+    artifact_writer.write_json_stream(head, "@graph", iter_items(), filepath)
+    artifact_writer.save_manifests()
+
+Author: SMART Guidelines Team
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# top-level fields whose values change on every run without the artifact changing
+VOLATILE_FIELDS = frozenset(["generatedAt"])
+
+MANIFEST_PATH = "input/temp/artifact-manifest.json"
+
+# output directory -> ArtifactManifest, loaded on first use in this process
+manifests: Dict[str, "ArtifactManifest"] = {}
+
+
+def strip_volatile(data: Any) -> Any:
+    """
+    Return data without its top-level VOLATILE_FIELDS keys.
+
+    Nested keys of the same name (a logical model property, a JSON-LD term
+    definition) are content and are kept.
+    """
+    if isinstance(data, dict):
+        return {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+    return data
+
+
+def render_json(data: Any, indent: Optional[int] = 2) -> str:
+    """Render data the way write_json() writes it."""
+    return json.dumps(data, indent=indent, ensure_ascii=False)
+
+
+def content_hash(data: Any, indent: Optional[int] = 2) -> str:
+    """SHA-256 of the rendered JSON with the volatile fields left out."""
+    return hashlib.sha256(render_json(strip_volatile(data), indent).encode("utf-8")).hexdigest()
+
+
+class ArtifactManifest:
+    """
+    Content hashes of the artifacts written to one output directory.
+
+    The manifests of all output directories share one file, keyed by the
+    absolute path of the directory.
+
+    Attributes:
+        output_dir: Absolute path of the output directory
+        path: Location of the manifest file
+        entries: File name -> {'hash', 'size', 'mtime_ns'}
+        updated: File names whose entry changed since the manifest was loaded
+    """
+
+    def __init__(self, output_dir: str, path: str = MANIFEST_PATH):
+        self.output_dir = os.path.abspath(output_dir)
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = self.load().get(self.output_dir, {})
+        self.updated: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Read the entries of every output directory from the manifest file."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("directories", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def get_hash(self, filepath: str, indent: Optional[int] = 2,
+                 rehash: Optional[Callable[[str], str]] = None) -> Optional[str]:
+        """
+        Return the content hash of the file on disk, or None if there is none.
+
+        Files without an up to date manifest entry are re-hashed with rehash,
+        by default as JSON with content_hash().
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        entry = self.entries.get(os.path.basename(filepath))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["hash"]
+        try:
+            if rehash:
+                file_hash = rehash(filepath)
+            else:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    file_hash = content_hash(json.load(f), indent)
+        except (OSError, ValueError, EOFError):
+            return None
+        self.record(filepath, file_hash)
+        return file_hash
+
+    def record(self, filepath: str, file_hash: str) -> None:
+        stat = os.stat(filepath)
+        entry = {"hash": file_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        self.entries[os.path.basename(filepath)] = entry
+        self.updated[os.path.basename(filepath)] = entry
+
+    def save(self) -> bool:
+        """Merge this process's updates into the manifest file."""
+        if not self.updated:
+            return True
+        try:
+            # re-read so entries written by other scripts in the meantime are kept
+            directories = self.load()
+            directories.setdefault(self.output_dir, {}).update(self.updated)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"directories": directories}, f, separators=(",", ":"), sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self.updated = {}
+            return True
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Could not save artifact manifest {self.path}: {e}")
+            return False
+
+
+def get_manifest(output_dir: str) -> ArtifactManifest:
+    key = os.path.abspath(output_dir)
+    if key not in manifests:
+        manifests[key] = ArtifactManifest(output_dir)
+    return manifests[key]
+
+
+def write_json(data: Any, filepath: str, indent: Optional[int] = 2) -> bool:
+    """
+    Write data as JSON to filepath unless the file already has the same content.
+
+    Args:
+        data: JSON-serializable data
+        filepath: Target file
+        indent: JSON indentation
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    output_dir = os.path.dirname(filepath) or "."
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest = get_manifest(output_dir)
+    new_hash = content_hash(data, indent)
+    if manifest.get_hash(filepath, indent) == new_hash:
+        return False
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_json(data, indent))
+    os.replace(tmp_path, filepath)
+    manifest.record(filepath, new_hash)
+    return True
+
+
+def iter_json_stream(head: Dict[str, Any], array_key: str, items: Iterable[Any],
+                     tail: Optional[Dict[str, Any]] = None, indent: int = 2) -> Iterator[Tuple[str, str]]:
+    """
+    Render {**head, array_key: [*items], **tail} piece by piece, exactly as
+    render_json() would render it.
+
+    Yields:
+        (text, stripped text) pairs: the text to write and the same text with
+        the top-level volatile fields of head and tail left out, which is what
+        content_hash() hashes
+    """
+    pad = " " * indent
+    item_pad = pad * 2
+
+    def render_members(members: Dict[str, Any]) -> str:
+        return ",\n".join(f"{pad}{json.dumps(key, ensure_ascii=False)}: "
+                           f"{render_json(value, indent).replace(chr(10), chr(10) + pad)}"
+                           for key, value in members.items())
+
+    def render_part(members: Dict[str, Any], before: bool) -> str:
+        text = render_members(members)
+        return (",\n" + text if before else text + ",\n") if text else ""
+
+    tail = tail or {}
+    stripped_head = strip_volatile(head)
+    stripped_tail = strip_volatile(tail)
+    key_text = f"{pad}{json.dumps(array_key, ensure_ascii=False)}: ["
+    yield "{\n" + render_part(head, False) + key_text, "{\n" + render_part(stripped_head, False) + key_text
+
+    separator = "\n"
+    for item in items:
+        text = render_json(item, indent).replace("\n", "\n" + item_pad)
+        yield separator + item_pad + text, separator + item_pad + text
+        separator = ",\n"
+    close = "]" if separator == "\n" else "\n" + pad + "]"
+
+    yield close + render_part(tail, True) + "\n}", close + render_part(stripped_tail, True) + "\n}"
+
+
+def write_json_stream(head: Dict[str, Any], array_key: str, items: Iterable[Any], filepath: str,
+                      tail: Optional[Dict[str, Any]] = None, indent: int = 2) -> bool:
+    """
+    Write a JSON object with one large array member to filepath, unless the
+    file already has the same content.
+
+    The object is written and hashed as the items are consumed; the result is
+    the same as write_json({**head, array_key: list(items), **tail}, ...).
+
+    Args:
+        head: Members before the array
+        array_key: Name of the array member
+        items: Array items, consumed once
+        filepath: Target file
+        tail: Members after the array
+        indent: JSON indentation
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    output_dir = os.path.dirname(filepath) or "."
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest = get_manifest(output_dir)
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for text, stripped_text in iter_json_stream(head, array_key, items, tail, indent):
+                f.write(text)
+                digest.update(stripped_text.encode("utf-8"))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    new_hash = digest.hexdigest()
+    if manifest.get_hash(filepath, indent) == new_hash:
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, filepath)
+    manifest.record(filepath, new_hash)
+    return True
+
+
+def text_hash(filepath: str) -> str:
+    """SHA-256 of the text of a file written by write_text_stream()."""
+    digest = hashlib.sha256()
+    opener = gzip.open if filepath.endswith(".gz") else open
+    with opener(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_text_stream(chunks: Iterable[str], filepath: str) -> bool:
+    """
+    Write text chunks to filepath unless the file already has the same text.
+
+    A filepath ending in .gz is gzip-compressed; the hash is taken over the
+    uncompressed text and the gzip header carries no timestamp, so the same
+    text always gives the same file.
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    output_dir = os.path.dirname(filepath) or "."
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest = get_manifest(output_dir)
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as raw:
+            f = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) \
+                if filepath.endswith(".gz") else raw
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                f.write(data)
+                digest.update(data)
+            if f is not raw:
+                f.close()
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    new_hash = digest.hexdigest()
+    if manifest.get_hash(filepath, rehash=text_hash) == new_hash:
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, filepath)
+    manifest.record(filepath, new_hash)
+    return True
+
+
+def take_updates() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Hand over the manifest updates of this process, e.g. from a worker to the
+    main process which passes them to merge_updates().
+    """
+    updates = {key: manifest.updated for key, manifest in manifests.items() if manifest.updated}
+    for manifest in manifests.values():
+        manifest.updated = {}
+    return updates
+
+
+def merge_updates(updates: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+    """Merge manifest updates taken in another process."""
+    for key, entries in updates.items():
+        manifest = get_manifest(key)
+        manifest.entries.update(entries)
+        manifest.updated.update(entries)
+
+
+def save_manifests() -> None:
+    """Save the manifest of every output directory written to in this process."""
+    for manifest in manifests.values():
+        manifest.save()
@@ -15,6 +15,7 @@ from typing import List
 import logging
 import sys
 import glob as glob
+from pathlib import Path
 from extractor import extractor 
 from installer import installer
 
@@ -33,6 +34,7 @@ class bpmn_extractor(extractor):
         namespaces (dict): XML namespaces used in BPMN files
     """
     xslt_file: str = "includes/bpmn2fhirfsh.xsl"
+    parallel_safe: bool = True
     namespaces: dict = {'bpmn':"http://www.omg.org/spec/BPMN/20100524/MODEL"}
     
     def __init__(self, installer: installer) -> None:
@@ -73,11 +75,10 @@ class bpmn_extractor(extractor):
         Returns:
             True if transformation successful, False otherwise
         """
-        with open(self.inputfile_name, 'r', encoding="utf-8") as file:
-            bpmn = str(file.read())
-            if not self.installer.transform_xml("bpmn",bpmn,process_multiline=True):
-                self.logger.info("Could not transform bpmn on " + self.inputfile_name)
-                return False
+        # parsed straight from the file, without reading it into a string first
+        if not self.installer.transform_xml("bpmn",Path(self.inputfile_name),process_multiline=True):
+            self.logger.info("Could not transform bpmn on " + self.inputfile_name)
+            return False
         return True
             
 
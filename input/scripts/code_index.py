@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Code Lookup Index over the Expanded ValueSets
+
+generate_valueset_schemas.py writes one ValueSet-{id}.displays.json per
+ValueSet. Answering "is code X in ValueSet Y" or "what is the display of
+system|code" from those files means opening and parsing one JSON file per
+ValueSet. This module builds a single SQLite file covering every expanded
+ValueSet instead, with code membership, displays and systems, and reads it
+back through a small lookup API.
+
+The index is written by CodeIndexWriter (used by the CodeIndexSink of
+generate_valueset_schemas.py) and only replaces the file on disk when its
+content changed. CodeIndex opens it read-only and memory-mapped; every
+lookup is a single probe of a primary key or index.
+
+Tables:
+    valuesets(id, valueset_id, url)   one row per ValueSet
+    systems(id, uri)                  code system URIs, stored once
+    codes(valueset, system, code, display)
+                                      primary key (valueset, code, system),
+                                      indexed by (code, system)
+
+Usage:
+    with CodeIndex("output/valueset-code-index.sqlite") as index:
+        index.contains("DAK.DT.IMMZ.D2.DT.BCG", "DE5")
+        index.get_display("DE5", "http://smart.who.int/immunizations/CodeSystem/IMMZ.D")
+        index.get_valuesets("DE5")
+
+Author: SMART Guidelines Team
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+INDEX_NAME = "valueset-code-index.sqlite"
+
+# bumped when the tables change, so old readers do not misread a new index
+FORMAT_VERSION = "1"
+
+# bytes of the index that SQLite may memory-map instead of reading
+MMAP_SIZE = 1 << 30
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE valuesets (id INTEGER PRIMARY KEY, valueset_id TEXT UNIQUE NOT NULL, url TEXT);
+CREATE TABLE systems (id INTEGER PRIMARY KEY, uri TEXT UNIQUE NOT NULL);
+CREATE TABLE codes (
+    valueset INTEGER NOT NULL,
+    system INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    display TEXT,
+    PRIMARY KEY (valueset, code, system)
+) WITHOUT ROWID;
+"""
+
+# created after the rows are inserted, which is faster than maintaining it
+INDEXES = "CREATE INDEX codes_by_code ON codes (code, system);"
+
+
+class CodeIndexWriter:
+    """
+    Builds the index file from ValueSets added one by one.
+
+    The rows go to a temporary file next to the index. close() compares the
+    content hash with the one recorded in the existing index and only
+    replaces it when they differ, so an unchanged index keeps its mtime.
+
+    Attributes:
+        path: Location of the index file
+        valueset_count: Number of ValueSets added
+        code_count: Number of codes added
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.valueset_count = 0
+        self.code_count = 0
+        self.system_ids: Dict[str, int] = {}
+        self.valueset_ids = set()
+        self.hash = hashlib.sha256()
+        self.logger = logging.getLogger(__name__)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.connection = sqlite3.connect(self.tmp_path)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.executescript(SCHEMA)
+
+    def get_system_id(self, uri: str) -> int:
+        if uri not in self.system_ids:
+            self.system_ids[uri] = len(self.system_ids) + 1
+            self.connection.execute("INSERT INTO systems (id, uri) VALUES (?, ?)",
+                                    (self.system_ids[uri], uri))
+        return self.system_ids[uri]
+
+    def add_valueset(self, valueset_id: str, url: str, codes: List[Tuple[str, str, str]]) -> None:
+        """
+        Add the expansion of one ValueSet.
+
+        Args:
+            valueset_id: ValueSet id
+            url: ValueSet canonical URL
+            codes: (system, code, display) of every code in the expansion;
+                codes without a system use ''
+        """
+        if valueset_id in self.valueset_ids:
+            self.logger.warning(f"ValueSet {valueset_id} is already in the code index, skipping duplicate")
+            return
+        self.valueset_ids.add(valueset_id)
+        self.valueset_count += 1
+        valueset = self.valueset_count
+        self.connection.execute("INSERT INTO valuesets (id, valueset_id, url) VALUES (?, ?, ?)",
+                                (valueset, valueset_id, url))
+        rows = {}
+        for system, code, display in codes:
+            # the first display wins when an expansion lists a code twice
+            rows.setdefault((self.get_system_id(system or ''), code), display)
+        self.connection.executemany(
+            "INSERT INTO codes (valueset, system, code, display) VALUES (?, ?, ?, ?)",
+            ((valueset, system, code, display) for (system, code), display in rows.items()))
+        self.code_count += len(rows)
+        self.hash.update(json.dumps([valueset_id, url, codes], ensure_ascii=False).encode("utf-8"))
+
+    def close(self) -> bool:
+        """
+        Finish the index and move it into place unless the existing index
+        has the same content.
+
+        Returns:
+            True if the index file was written, False if it was already up to date
+        """
+        content_hash = self.hash.hexdigest()
+        self.connection.executescript(INDEXES)
+        self.connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("format_version", FORMAT_VERSION),
+            ("content_hash", content_hash),
+            ("valueset_count", str(self.valueset_count)),
+            ("code_count", str(self.code_count)),
+        ])
+        self.connection.commit()
+        self.connection.execute("VACUUM")
+        self.connection.close()
+
+        meta = read_meta(self.path)
+        if meta.get("content_hash") == content_hash and meta.get("format_version") == FORMAT_VERSION:
+            os.remove(self.tmp_path)
+            return False
+        os.replace(self.tmp_path, self.path)
+        return True
+
+    def abort(self) -> None:
+        """Discard the index being written."""
+        self.connection.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def connect_readonly(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+    connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return connection
+
+
+def read_meta(path: str) -> Dict[str, str]:
+    """Return the meta table of an index file, or {} if there is no readable index."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        connection = connect_readonly(path)
+        try:
+            return dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return {}
+
+
+class CodeIndex:
+    """
+    Read-only lookups in an index written by CodeIndexWriter.
+
+    The ValueSet and system tables are small and loaded when the index is
+    opened, so each lookup is a single probe of the codes table.
+
+    Attributes:
+        path: Location of the index file
+        meta: Format version, content hash and counts of the index
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Code index not found: {path}")
+        self.connection = connect_readonly(path)
+        self.meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            self.connection.close()
+            raise ValueError(f"Unsupported code index format {self.meta.get('format_version')} in {path}")
+        self.valuesets: Dict[str, int] = {}
+        self.valueset_urls: Dict[str, str] = {}
+        self.valueset_names: Dict[int, str] = {}
+        for id, valueset_id, url in self.connection.execute("SELECT id, valueset_id, url FROM valuesets"):
+            self.valuesets[valueset_id] = id
+            self.valueset_names[id] = valueset_id
+            if url:
+                self.valueset_urls[url] = valueset_id
+        self.systems: Dict[str, int] = {}
+        self.system_uris: Dict[int, str] = {}
+        for id, uri in self.connection.execute("SELECT id, uri FROM systems"):
+            self.systems[uri] = id
+            self.system_uris[id] = uri
+
+    def __enter__(self) -> "CodeIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_valueset(self, valueset: str) -> Optional[int]:
+        """Row id of a ValueSet given by id or canonical URL."""
+        if valueset in self.valuesets:
+            return self.valuesets[valueset]
+        valueset_id = self.valueset_urls.get(valueset)
+        return self.valuesets[valueset_id] if valueset_id else None
+
+    def contains(self, valueset: str, code: str, system: Optional[str] = None) -> bool:
+        """
+        Check whether a ValueSet expansion contains a code.
+
+        Args:
+            valueset: ValueSet id or canonical URL
+            code: Code to look up
+            system: Code system URI, or None to accept the code from any system
+
+        Returns:
+            True if the code is in the expansion
+        """
+        valueset_row = self.get_valueset(valueset)
+        if valueset_row is None:
+            return False
+        if system is None:
+            row = self.connection.execute(
+                "SELECT 1 FROM codes WHERE valueset = ? AND code = ? LIMIT 1",
+                (valueset_row, code)).fetchone()
+        else:
+            system_row = self.systems.get(system)
+            if system_row is None:
+                return False
+            row = self.connection.execute(
+                "SELECT 1 FROM codes WHERE valueset = ? AND code = ? AND system = ?",
+                (valueset_row, code, system_row)).fetchone()
+        return row is not None
+
+    def get_display(self, code: str, system: Optional[str] = None,
+                    valueset: Optional[str] = None) -> Optional[str]:
+        """
+        Return the display of a code, or None if the code is not indexed.
+
+        Args:
+            code: Code to look up
+            system: Code system URI, or None for any system
+            valueset: ValueSet id or URL to take the display from, or None for
+                the first ValueSet containing the code
+        """
+        query = "SELECT display FROM codes WHERE code = ?"
+        params: List[Any] = [code]
+        if system is not None:
+            if system not in self.systems:
+                return None
+            query += " AND system = ?"
+            params.append(self.systems[system])
+        if valueset is not None:
+            valueset_row = self.get_valueset(valueset)
+            if valueset_row is None:
+                return None
+            query += " AND valueset = ?"
+            params.append(valueset_row)
+        row = self.connection.execute(query + " ORDER BY valueset LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def get_valuesets(self, code: str, system: Optional[str] = None) -> List[str]:
+        """Return the ids of the ValueSets whose expansion contains the code."""
+        if system is None:
+            rows = self.connection.execute(
+                "SELECT DISTINCT valueset FROM codes WHERE code = ? ORDER BY valueset", (code,))
+        else:
+            if system not in self.systems:
+                return []
+            rows = self.connection.execute(
+                "SELECT valueset FROM codes WHERE code = ? AND system = ? ORDER BY valueset",
+                (code, self.systems[system]))
+        return [self.valueset_names[valueset_row] for valueset_row, in rows]
+
+    def get_systems(self, valueset: str) -> List[str]:
+        """Return the code system URIs used in a ValueSet expansion."""
+        valueset_row = self.get_valueset(valueset)
+        if valueset_row is None:
+            return []
+        rows = self.connection.execute(
+            "SELECT DISTINCT system FROM codes WHERE valueset = ? ORDER BY system", (valueset_row,))
+        return [self.system_uris[system_row] for system_row, in rows]
+
+    def iter_codes(self, valueset: str) -> Iterator[Tuple[str, str, str]]:
+        """Yield (system, code, display) for every code of a ValueSet expansion."""
+        valueset_row = self.get_valueset(valueset)
+        if valueset_row is None:
+            return
+        rows = self.connection.execute(
+            "SELECT system, code, display FROM codes WHERE valueset = ? ORDER BY code, system",
+            (valueset_row,))
+        for system_row, code, display in rows:
+            yield self.system_uris[system_row], code, display
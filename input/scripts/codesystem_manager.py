@@ -14,13 +14,106 @@ The codesystem_manager maintains centralized control over:
 
 Author: SMART Guidelines Team
 """
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
+import json
 import re
 import pprint
 import sys
 import stringer
 import logging
 
+
+class code_entry(object):
+    """
+    A single code of a managed CodeSystem.
+
+    Uses __slots__ to keep the per-code footprint small for large merged
+    terminologies. The list attributes hold the designation and property
+    dictionaries in the form accepted by codesystem_manager.merge_code.
+    """
+    __slots__ = ('code', 'display', 'definition', 'designation',
+                 'propertyString', 'propertyCode', 'propertyCoding')
+    list_fields = ('designation', 'propertyString', 'propertyCode', 'propertyCoding')
+
+    def __init__(self, code: str, display: str, definition: Optional[str] = None) -> None:
+        self.code = code
+        self.display = display
+        self.definition = definition
+        self.designation: List[Dict] = []
+        self.propertyString: List[Dict] = []
+        self.propertyCode: List[Dict] = []
+        self.propertyCoding: List[Dict] = []
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__ if k != 'code'}
+
+    def extend(self, field: str, values: List[Dict]) -> None:
+        # append values to the list field, skipping ones that are already present
+        current = getattr(self, field)
+        seen = {code_entry.value_key(v) for v in current}
+        for v in values:
+            key = code_entry.value_key(v)
+            if key not in seen:
+                seen.add(key)
+                current.append(v)
+
+    @staticmethod
+    def value_key(value: Any) -> str:
+        return json.dumps(value, sort_keys=True, default=str)
+
+
+class valueset_fsh(object):
+    """
+    FSH for a ValueSet that includes codes from a single CodeSystem.
+
+    Instances are registered with the installer in place of the rendered text
+    and iterated in chunks when the resource is written, so the include lines
+    of large ValueSets are never joined into one string.  A codes value of None
+    includes every code of the system.
+    """
+    __slots__ = ('id', 'codesystem_id', 'title', 'codes')
+
+    def __init__(self, id: str, codesystem_id: str, title: str, codes: Optional[List[str]] = None) -> None:
+        self.id = id
+        self.codesystem_id = codesystem_id
+        self.title = title
+        self.codes = codes
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def __iter__(self):
+        valueset = 'ValueSet: ' + stringer.escape(self.id) + '\n'
+        valueset += 'Title: "' + stringer.escape(self.title) + '"\n'
+        valueset += 'Description:  "Value Set for ' + stringer.escape(self.title) + '. Autogenerated from DAK artifacts"\n'
+        #valueset += "Usage: #definition\n"
+        #valueset += "* publisher = \"" + stringer.escape(self.publisher) + "\"\n" 
+        #valueset += "* experimental = false\n"
+        #valueset += "* version = \"" + self.version + "\"\n"
+        valueset += '* ^status = #active\n'
+        if self.codes is None:
+            valueset += '* include codes from system ' + stringer.escape(self.codesystem_id) + '\n'
+            yield valueset
+            return
+        yield valueset
+        for code in self.codes:
+            yield '* include ' + stringer.escape(self.codesystem_id) + '#"' + stringer.escape_code(code) + '"\n'
+
+    def __str__(self) -> str:
+        return "".join(self)
+
+
 class codesystem_manager(object):
     """
     Central manager for FHIR CodeSystem and ValueSet resources.
@@ -31,13 +124,15 @@ class codesystem_manager(object):
     across the SMART guidelines implementation.
 
     Attributes:
-        codesystems (dict): Collection of managed CodeSystem resources
+        codesystems (dict): Collection of managed CodeSystem resources, code -> code_entry
         codesystem_titles (dict): Mapping of CodeSystem IDs to display titles
         codesystem_properties (dict): Properties and metadata for CodeSystems
+        codesystem_displays (dict): Reverse index of display -> codes per CodeSystem
     """
-    codesystems: Dict[str, Dict[str, Any]] = {}
+    codesystems: Dict[str, Dict[str, code_entry]] = {}
     codesystem_titles: Dict[str, str] = {}
     codesystem_properties: Dict[str, Dict[str, Any]] = {}
+    codesystem_displays: Dict[str, Dict[str, List[str]]] = {}
 
     publisher: str 
     version: str
@@ -58,6 +153,7 @@ class codesystem_manager(object):
         self.codesystems[codesystem_id] = {}
         self.codesystem_titles[codesystem_id] = title
         self.codesystem_properties[codesystem_id] = {}
+        self.codesystem_displays[codesystem_id] = {}
             # need to replace this type of logic with exception handling probably
         return True
 
@@ -76,59 +172,100 @@ class codesystem_manager(object):
         return self.codesystem_properties[id]
 
 
-    def get_codes(self, id: str) -> Dict[str, Any]:
+    def get_codes(self, id: str) -> Dict[str, code_entry]:
         if not self.has_codesystem(id):
             return {}
         return self.codesystems[id]
 
-    def get_code(self, codesystem_id: str, code: str) -> Optional[Any]:
+    def get_code(self, codesystem_id: str, code: str) -> Optional[code_entry]:
         if not self.has_code(codesystem_id,code):
             return None
         else:
             return self.codesystems[codesystem_id][code]
 
+    def get_codes_by_display(self, codesystem_id: str, display: str) -> List[str]:
+        # the extractors currently resolve codes by id only (get_code/has_code);
+        # this lookup serves callers that only have a label, e.g. a workbook
+        # cell referring to a data element by name
+        if not self.has_codesystem(codesystem_id):
+            return []
+        return list(self.codesystem_displays[codesystem_id].get(display, []))
 
-    def merge_code_with_params(self, codesystem_id: str, code: str, display: str, definition: Optional[str] = None, designation: List = [], propertyString: List = []) -> bool:
+    def get_code_by_display(self, codesystem_id: str, display: str) -> Optional[code_entry]:
+        codes = self.get_codes_by_display(codesystem_id, display)
+        if not codes:
+            return None
+        return self.codesystems[codesystem_id][codes[0]]
+
+    def find_codes_by_display(self, display: str) -> Dict[str, List[str]]:
+        # codes with the given display across all codesystems, by codesystem id
+        result = {}
+        for codesystem_id, displays in self.codesystem_displays.items():
+            if display in displays:
+                result[codesystem_id] = list(displays[display])
+        return result
+
+    def merge_code_with_params(self, codesystem_id: str, code: str, display: str, definition: Optional[str] = None, designation: Optional[List] = None, propertyString: Optional[List] = None) -> bool:
         code_defn = {'display':display,
                     'definition':definition,
-                    'designation':designation,
-                    'propertyString': propertyString}
+                    'designation':list(designation or []),
+                    'propertyString': list(propertyString or [])}
         return self.merge_code(codesystem_id,code,code_defn)
 
-    def merge_code(self, codesystem_id: str, code: str, new_code: Dict[str, Any]) -> bool:
+    def merge_code(self, codesystem_id: str, code: str, new_code: Union[Dict[str, Any], code_entry]) -> bool:
         if not self.has_codesystem(codesystem_id):
             self.logger.info("tyring to create code on non-registered code-system:" + codesystem_id)
             return False
+        if isinstance(new_code, code_entry):
+            new_code = new_code.as_dict()
         if not 'display' in new_code:
             self.logger.info("trying to create code with out display:" + code)
             return False
-        if not 'definition' in new_code:
-            new_code['definition'] = None
-        if not 'designation' in new_code:
-            new_code['designation'] = []
-        if not 'propertyString' in new_code:
-            new_code['propertyString'] = []
-        if not 'propertyCode' in new_code:
-            new_code['propertyCode'] = []
-        if not 'propertyCoding' in new_code:
-            new_code['propertyCoding'] = []
+
+        entry = code_entry(code, new_code['display'], new_code.get('definition'))
+        for field in code_entry.list_fields:
+            entry.extend(field, new_code.get(field) or [])
 
         existing_code = self.get_code(codesystem_id,code)
         if existing_code:
             self.logger.info("Trying to create a code '" + code + "' when it already exists in " + codesystem_id)
-            if not existing_code['display'] == new_code['display']:
-                self.logger.info("Mismatched display of code '" + code + "': '" + existing_code['display'] \
-                        + "' !=  '" + new_code['display'] + "'")
-            if not stringer.is_blank(existing_code['definition']) and not stringer.is_blank(new_code['definition']) \
-                and not existing_code['definition'] == new_code['definition']:
-                self.logger.info("Mismatched definitions of code '" + code + "': '" + existing_code['definition'] \
-                        + "' !=  '" + new_code['definition'] + "'")
-            new_code['designation'] += existing_code['designation']
-            new_code['propertyString'] += existing_code['propertyString']
-            new_code['propertyCode'] += existing_code['propertyCode']
-        self.codesystems[codesystem_id][code] = new_code
+            if not existing_code.display == entry.display:
+                self.logger.info("Mismatched display of code '" + code + "': '" + str(existing_code.display) \
+                        + "' !=  '" + str(entry.display) + "'")
+            if not stringer.is_blank(existing_code.definition) and not stringer.is_blank(entry.definition) \
+                and not existing_code.definition == entry.definition:
+                self.logger.info("Mismatched definitions of code '" + code + "': '" + existing_code.definition \
+                        + "' !=  '" + entry.definition + "'")
+            for field in code_entry.list_fields:
+                entry.extend(field, getattr(existing_code, field))
+            self.unindex_display(codesystem_id, existing_code)
+        self.codesystems[codesystem_id][code] = entry
+        self.codesystem_displays[codesystem_id].setdefault(str(entry.display), []).append(code)
         return True
 
+    def unindex_display(self, codesystem_id: str, entry: code_entry) -> None:
+        displays = self.codesystem_displays[codesystem_id]
+        codes = displays.get(str(entry.display), [])
+        if entry.code in codes:
+            codes.remove(entry.code)
+            if not codes:
+                del displays[str(entry.display)]
+
+    def get_state(self) -> Dict[str, Any]:
+        return {'codesystems': self.codesystems,
+                'titles': self.codesystem_titles,
+                'properties': self.codesystem_properties}
+
+    def merge_state(self, state: Dict[str, Any]) -> bool:
+        # replays a snapshot from get_state() taken from a fresh manager, so each
+        # codesystem in it was registered there and is (re)registered here too
+        result = True
+        for codesystem_id, codes in state['codesystems'].items():
+            self.register(codesystem_id, state['titles'][codesystem_id])
+            self.add_properties(codesystem_id, state['properties'].get(codesystem_id, {}))
+            result &= self.add_dict(codesystem_id, codes)
+        return result
+
     def add_properties(self,codesystem_id:str,vals:dict):
         for k,v in vals.items():
             self.add_property(codesystem_id,k,v)
@@ -167,30 +304,20 @@ class codesystem_manager(object):
         return input
 
     def render_valueset_allcodes(self,vs_id,title,cs_id):
-        valueset = 'ValueSet: ' + stringer.escape(vs_id) + '\n'
-        valueset += 'Title: "' + stringer.escape(title) + '"\n'
-        valueset += 'Description:  "Value Set for ' + stringer.escape(title) + '. Autogenerated from DAK artifacts"\n'
-        #valueset += 'Usage: #definition\n'
-        #valueset += "* publisher = \"" + stringer.escape(self.publisher) + "\"\n" 
-        #valueset += "* experimental = false\n"
-        #valueset += "* version = \"" + self.version + "\"\n"
-        valueset += '* ^status = #active\n'
-        valueset += '* include codes from system ' + stringer.escape(cs_id) + '\n'
-        return valueset
+        return "".join(self.iter_valueset_allcodes(vs_id,title,cs_id))
+
+    def iter_valueset_allcodes(self,vs_id,title,cs_id):
+        yield from valueset_fsh(vs_id,cs_id,title)
 
     def render_vs_from_list(self,id:str, codesystem_id:str, title:str, codes):
+        return "".join(self.iter_vs_from_list(id,codesystem_id,title,codes))
 
-        valueset = 'ValueSet: ' + stringer.escape(id) + '\n'
-        valueset += 'Title: "' + stringer.escape(title) + '"\n'
-        valueset += 'Description:  "Value Set for ' + stringer.escape(title) + '. Autogenerated from DAK artifacts"\n'
-        #valueset += "Usage: #definition\n"
-        #valueset += "* publisher = \"" + stringer.escape(self.publisher) + "\"\n" 
-        #valueset += "* experimental = false\n"
-        #valueset += "* version = \"" + self.version + "\"\n"
-        valueset += '* ^status = #active\n'
-        for code in codes:
-            valueset += '* include ' + stringer.escape(codesystem_id) + '#"' + stringer.escape_code(code) + '"\n'            
-        return valueset
+    def iter_vs_from_list(self,id:str, codesystem_id:str, title:str, codes):
+        yield from valueset_fsh(id,codesystem_id,title,codes)
+
+    def stream_vs_from_list(self,id:str, codesystem_id:str, title:str, codes):
+        # installer resource form of render_vs_from_list, written out in chunks
+        return valueset_fsh(id,codesystem_id,title,list(codes))
 
     def render_vs_from_dict(self,id:str, title:str, codelist:dict , properties:dict = {}):
         self.logger.info("trying to register codesystem " + id )
@@ -213,6 +340,29 @@ class codesystem_manager(object):
         if not self.has_codesystem(id):
             self.logger.info("Trying to render absent codesystem " + id)
             return False
+        return "".join(self.iter_codesystem(id))
+
+    def write_codesystem(self, id: str, file) -> bool:
+        """
+        Write the FSH of a CodeSystem to an open text file one code at a time.
+
+        Args:
+            id: The CodeSystem ID
+            file: A writable text file handle
+
+        Returns:
+            True on success, False if the CodeSystem is not registered
+        """
+        if not self.has_codesystem(id):
+            self.logger.info("Trying to render absent codesystem " + id)
+            return False
+        for chunk in self.iter_codesystem(id):
+            file.write(chunk)
+        return True
+
+    def iter_codesystem(self,id:str):
+        # yields the CodeSystem header and then one chunk per code, so large
+        # codesystems can be written out without building the whole FSH text
         title = self.get_title(id)
         codesystem = 'CodeSystem: ' + stringer.escape(id) + '\n'
         codesystem += 'Title: "' + stringer.escape(title) + '"\n'
@@ -227,51 +377,47 @@ class codesystem_manager(object):
             for k,v in vals.items():
                 codesystem += '* ^property[=].' + k + ' = ' + v + "\n" # user is responsible for content
 
+        yield codesystem
         for code,val in self.get_codes(id).items():
-            if isinstance(val,str):
-                codesystem += '* #"' + stringer.escape_code(code) +  '" "' + stringer.escape(name) + '"\n'
-            elif isinstance(val,dict)  and 'display' in val:
-                codesystem += '* #"' + stringer.escape_code(code) +  '" "' + stringer.escape(val['display']) + '"\n'
-                if 'definition' in val and not stringer.is_blank(val['definition']):
-                    codesystem += '  * ^definition = """' + val['definition'] + '\n"""\n'
-                if 'designation' in val and isinstance(val['designation'],list):
-                    for d_val in val['designation']:
-                        if not isinstance(d_val,dict) or not 'value' in d_val:
-                            continue
-                        codesystem += '  * ^designation[+].value = ' + d_val['value'] + "\n"
-                        d_val.pop('value')
-                        for k,v in d_val.items():
-                            codesystem += '  * ^designation[=].' + k + " = " + v + "\n"
-
-                if 'propertyString' in val and isinstance(val['propertyString'],list):
-                    for p in val['propertyString']:
-                        if not isinstance(p,dict) or not 'code' in p or not 'value' in p:
-                            continue
-                        codesystem += '  * ^property[+].code = #"' + stringer.escape_code(p['code']) +  '"\n'
-                        codesystem += '  * ^property[=].valueString = "' + stringer.escape(p['value']) +  '"\n'
-
-                if 'propertyCode' in val and isinstance(val['propertyCode'],list):
-                    for p in val['propertyCode']:
-                        if not isinstance(p,dict) or not 'code' in p or not 'value' in p:
-                            continue
-                        codesystem += '  * ^property[+].code = #"' + stringer.escape_code(p['code']) +  '"\n'
-                        codesystem += '  * ^property[=].valueCode = "' + stringer.escape_code(p['value']) +  '"\n'
-
-                if 'propertyCoding' in val and isinstance(val['propertyCoding'],list):
-                    for p in val['propertyCoding']:
-                        if not isinstance(p,dict) or not 'code' in p or not 'value' in p \
-                            or not isinstance(p['value'],dict):
+            if isinstance(val,code_entry):
+                codesystem = '* #"' + stringer.escape_code(code) +  '" "' + stringer.escape(val.display) + '"\n'
+                if not stringer.is_blank(val.definition):
+                    codesystem += '  * ^definition = """' + val.definition + '\n"""\n'
+                for d_val in val.designation:
+                    if not isinstance(d_val,dict) or not 'value' in d_val:
+                        continue
+                    codesystem += '  * ^designation[+].value = ' + d_val['value'] + "\n"
+                    for k,v in d_val.items():
+                        if k == 'value':
                             continue
-                        codesystem += '  * ^property[+].code = #"' + stringer.escape_code(p['code']) +  '"\n'
-                        for coding_k,coding_v in p['value'].items():
-                            codesystem += '  * ^property[=].valueCoding.' + coding_k + ' = '
-                            if coding_k == 'code':
-                                codesystem +=  '#' + stringer.escape_code(coding_v) +  '\n'
-                            elif coding_k =='userSelected':
-                                codesystem +=  coding_v +  '\n'
-                            else:
-                                codesystem +=  '"' + stringer.escape(coding_v) +  '"\n'
+                        codesystem += '  * ^designation[=].' + k + " = " + v + "\n"
+
+                for p in val.propertyString:
+                    if not isinstance(p,dict) or not 'code' in p or not 'value' in p:
+                        continue
+                    codesystem += '  * ^property[+].code = #"' + stringer.escape_code(p['code']) +  '"\n'
+                    codesystem += '  * ^property[=].valueString = "' + stringer.escape(p['value']) +  '"\n'
+
+                for p in val.propertyCode:
+                    if not isinstance(p,dict) or not 'code' in p or not 'value' in p:
+                        continue
+                    codesystem += '  * ^property[+].code = #"' + stringer.escape_code(p['code']) +  '"\n'
+                    codesystem += '  * ^property[=].valueCode = "' + stringer.escape_code(p['value']) +  '"\n'
+
+                for p in val.propertyCoding:
+                    if not isinstance(p,dict) or not 'code' in p or not 'value' in p \
+                        or not isinstance(p['value'],dict):
+                        continue
+                    codesystem += '  * ^property[+].code = #"' + stringer.escape_code(p['code']) +  '"\n'
+                    for coding_k,coding_v in p['value'].items():
+                        codesystem += '  * ^property[=].valueCoding.' + coding_k + ' = '
+                        if coding_k == 'code':
+                            codesystem +=  '#' + stringer.escape_code(coding_v) +  '\n'
+                        elif coding_k =='userSelected':
+                            codesystem +=  coding_v +  '\n'
+                        else:
+                            codesystem +=  '"' + stringer.escape(coding_v) +  '"\n'
+                yield codesystem
             else:
-                self.logger.info("  failed to add code (expected string or dict with 'display' property)" + str(code))
+                self.logger.info("  failed to add code (expected code_entry)" + str(code))
                 self.logger.info(val)
-        return codesystem
@@ -30,6 +30,7 @@ class dd_extractor(extractor):
     FHIR resources for standardized data exchange.
     """
     xslt_file: str = "includes/bpmn2fhirfsh.xsl"
+    parallel_safe: bool = True
     dictionaries: Dict = {}
 
     def __init__(self, installer: installer) -> None:
@@ -136,7 +137,7 @@ class dd_extractor(extractor):
                 self.process_code_regular(code,row,code_definition)
             csm.merge_code_with_params(self.installer.dd_prefix,code, code_definition)
 
-        valueset = csm.render_vs_from_list(vs_id,self.installer.dd_prefix,code,vs_description,vs_codes)
+        valueset = csm.stream_vs_from_list(vs_id,self.installer.dd_prefix,vs_description,vs_codes)
         if not valueset:
             self.logger.info("Could not generate VS from list")
             return False
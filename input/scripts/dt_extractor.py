@@ -18,6 +18,7 @@ import sys
 import pprint
 import glob as glob
 import re
+import numpy as np
 import pandas as pd
 import urllib.parse
 from extractor import extractor
@@ -39,6 +40,23 @@ class dt_extractor(extractor):
     cql_definitions_by_type = {'input': {}, 'output': {}, 'annotation': {}}
     tab_data = {}
     dt_data: Dict[str, Dict[str, Any]] = {}
+    # profile id -> FSH of the decision tables that may have no BPMN profile
+    profile_stubs: Dict[str, str] = {}
+    cover_extracted: bool = False
+    # the codes, libraries and pages spanning all workbooks are generated by
+    # extract_finish(), so each workbook can be extracted on its own
+    parallel_safe: bool = True
+    # cell labels that delimit the decision tables laid out on a tab
+    table_labels: List[str] = [
+        "Decision ID",
+        "Business rule",
+        "Trigger",
+        "Inputs",
+        "Potential contraindications",
+        "Output",
+        "Guidance displayed to health worker",
+        "Annotations",
+        "Reference(s)"]
 
     def __init__(self, installer: installer) -> None:
         super().__init__(installer)
@@ -53,12 +71,33 @@ class dt_extractor(extractor):
     def find_cql_files(self) -> List[str]:
         return glob.glob("input/cql/*cql")
 
-    def extract(self) -> bool:
-        super().extract()
+    def extract_finish(self) -> bool:
+        if self.cover_extracted and not self.generate_codes():
+            self.logger.info("Could not generate codes from decision tables")
         # Generate questionnaires from existing DMN files
         self.generate_questionnaires_from_dmn()
         return self.generate_decision_table_page()
 
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            'cql_definitions': self.cql_definitions,
+            'cql_definitions_by_type': self.cql_definitions_by_type,
+            'dt_data': self.dt_data,
+            'profile_stubs': self.profile_stubs,
+            'cover_extracted': self.cover_extracted}
+
+    def merge_state(self, state: Dict[str, Any]) -> None:
+        for tab_id, dts in state.get('cql_definitions', {}).items():
+            for dt_id, definitions in dts.items():
+                self.cql_definitions.setdefault(tab_id, {}).setdefault(dt_id, {}).update(definitions)
+        for type, definitions in state.get('cql_definitions_by_type', {}).items():
+            self.cql_definitions_by_type.setdefault(type, {}).update(definitions)
+        self.dt_data.update(state.get('dt_data', {}))
+        for profile_id, profile_fsh in state.get('profile_stubs', {}).items():
+            self.profile_stubs.setdefault(profile_id, profile_fsh)
+        if state.get('cover_extracted'):
+            self.cover_extracted = True
+
     def generate_questionnaires_from_dmn(self) -> bool:
         """
         Generate FHIR Questionnaire FSH files from existing DMN files.
@@ -250,6 +289,19 @@ The table below provides an overview of the decision-support tables and algorith
                     " data=" +
                     str(dt_data))
 
+        self.cover_extracted = True
+        return True
+
+    def generate_codes(self) -> bool:
+        for profile_id, profile_fsh in self.profile_stubs.items():
+            # maybe the DT was not in a bpmn, check to see if there is a
+            # definition already loaded
+            if not self.installer.has_resource('profiles', profile_id):
+                self.logger.info(
+                    "WARNING - Decision Table " + profile_id + " present without representation in BPMN")
+                self.installer.add_resource(
+                    'profiles', profile_id, profile_fsh)
+
         cql_files = self.find_cql_files()
         # cql_files = ["input/cql/IMMZD5DTBCGElements.cql"]
         cql_contents = {}
@@ -334,7 +386,7 @@ The table below provides an overview of the decision-support tables and algorith
                 csm = self.installer.get_codesystem_manager()
                 dt_vs_title = 'Decision Table for ' + full_dt_id + \
                     ". Autogenerated from DAK artifacts"
-                dt_vs = csm.render_vs_from_list(
+                dt_vs = csm.stream_vs_from_list(
                     dt_vs_id, self.installer.dd_prefix, dt_vs_title, dt_codes)
                 if not dt_vs:
                     self.logger.info("Could not generate VS from list")
@@ -349,7 +401,7 @@ The table below provides an overview of the decision-support tables and algorith
             tab_vs_id = stringer.name_to_id(full_tab_id)
             csm = self.installer.get_codesystem_manager()
             tab_vs_title = 'Decision Tables For Tab ' + full_tab_id
-            tab_vs = csm.render_vs_from_list(
+            tab_vs = csm.stream_vs_from_list(
                 tab_vs_id,
                 self.installer.dd_prefix,
                 tab_vs_title,
@@ -467,6 +519,28 @@ The table below provides an overview of the decision-support tables and algorith
         return self.installer.create_cql_library(
             lib_name, cql_codes, properties)
 
+    def index_labels(self, values: np.ndarray) -> Dict[str, Dict[int, List[int]]]:
+        """
+        Locate every table label on a tab in a single vectorized pass.
+
+        Args:
+            values: Cell values of the tab as a 2D object array
+
+        Returns:
+            Map of label to {row: [columns in ascending order]}
+        """
+        labels: Dict[str, Dict[int, List[int]]] = {
+            label: {} for label in self.table_labels}
+        rows, cols = np.nonzero(np.isin(values, self.table_labels))
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            labels[values[row, col]].setdefault(row, []).append(col)
+        return labels
+
+    def last_label_col(self, labels: Dict[str, Dict[int, List[int]]],
+                       label: str, row: int, after_col: int):
+        cols = [c for c in labels[label].get(row, []) if c > after_col]
+        return cols[-1] if cols else False
+
     def load_tab(self, tab: str):
         tab_id = stringer.name_to_id("tab")
         if tab_id in self.tab_data:
@@ -475,10 +549,7 @@ The table below provides an overview of the decision-support tables and algorith
         self.logger.info(
             "Attempting to load decision table metadata for tab=" + tab)
         try:
-            df = pd.read_excel(
-                self.inputfile_name,
-                sheet_name=tab,
-                header=None)
+            df = self.get_sheet(tab)
 
         except Exception as e:
             self.logger.info("Could not open sheet " + tab)
@@ -487,133 +558,111 @@ The table below provides an overview of the decision-support tables and algorith
 
         tab_id = stringer.name_to_id(tab)
         self.logger.info("Exracting tab to " + tab_id)
-        self.tab_data[tab_id] = {'df': df, 'tables': {}}
-        for col in df:
-            matching_rows = df[col] == "Decision ID"
-            sched_matching_rows = df[col] == "Schedule ID"
-
-            if not isinstance(matching_rows,
-                              pd.Series) or not matching_rows.any():
-                continue
-
-            col_idx = df.columns.get_loc(col)
+        values = df.to_numpy(dtype=object)
+        labels = self.index_labels(values)
+        self.tab_data[tab_id] = {'df': df, 'values': values, 'tables': {}}
+        n_cols = values.shape[1]
+        # visit tables column by column, top to bottom
+        decision_positions = sorted(
+            (col, row) for row, cols in labels["Decision ID"].items() for col in cols)
+        for col, row_idx in decision_positions:
             self.logger.info(
-                "Found decision tables in column index " +
-                str(col_idx) +
-                " on  matched rows=",
-                df[matching_rows])
-            for row in df[matching_rows].iterrows():
-                row_idx = row[0]
+                "Validating decision table on row= # " +
+                str(row_idx) +
+                "\n\t" +
+                '\t'.join(
+                    str(x) for x in values[row_idx]))
+            id_val = values[row_idx, col + 1] if col + 1 < n_cols else None
+            decision_id = stringer.name_to_id(id_val)
+            if not isinstance(decision_id, str) or not decision_id:
                 self.logger.info(
-                    "Validating decision table on row= # " +
-                    str(row_idx) +
-                    "\n\t" +
-                    '\t'.join(
-                        str(x) for x in row[1].values))
-                decision_id = stringer.name_to_id(row[1][col_idx + 1])
-                if not isinstance(decision_id, str) or not decision_id:
-                    self.logger.info(
-                        "Could not find decision id to right of r,c:" + row + "," + col)
-                    continue
+                    "Could not find decision id to right of r,c:" + str(row_idx) + "," + str(col))
+                continue
 
-                self.logger.info("found decision id=" + decision_id)
-                br_row = row_idx + 1
-                if not isinstance(
-                        df[col][br_row],
-                        str) or not df[col][br_row] == "Business rule":
-                    self.logger.info(
-                        "Did not find Business Rule row of decision table " +
-                        decision_id)
-                    continue
-                br = df[col_idx + 1][br_row]
-                if not isinstance(br, str) or not br:
-                    self.logger.info(
-                        "Did not find any Business Rule defined for decision table " +
-                        decision_id)
-                    continue
+            self.logger.info("found decision id=" + decision_id)
+            br_row = row_idx + 1
+            if col not in labels["Business rule"].get(br_row, []):
+                self.logger.info(
+                    "Did not find Business Rule row of decision table " +
+                    decision_id)
+                continue
+            br = values[br_row, col + 1] if col + 1 < n_cols else None
+            if not isinstance(br, str) or not br:
+                self.logger.info(
+                    "Did not find any Business Rule defined for decision table " +
+                    decision_id)
+                continue
 
-                trigger_row = row_idx + 2
-                if not isinstance(
-                        df[col][trigger_row],
-                        str) or not df[col][trigger_row] == "Trigger":
-                    self.logger.info(
-                        "Did not find trigger row of decision table " + decision_id)
-                    continue
-                trigger = df[col_idx + 1][trigger_row]
-                if not isinstance(trigger, str) or not trigger:
-                    self.logger.info(
-                        "Did not find any trigger defined for decision table " +
-                        decision_id)
-                    continue
+            trigger_row = row_idx + 2
+            if col not in labels["Trigger"].get(trigger_row, []):
+                self.logger.info(
+                    "Did not find trigger row of decision table " + decision_id)
+                continue
+            trigger = values[trigger_row, col + 1] if col + 1 < n_cols else None
+            if not isinstance(trigger, str) or not trigger:
+                self.logger.info(
+                    "Did not find any trigger defined for decision table " +
+                    decision_id)
+                continue
 
-                input_row = row_idx + 3
-                if not isinstance(
-                        df[col][input_row], str) or (
-                        not df[col][input_row] == "Inputs" and not df[col][input_row] == "Potential contraindications"):
-                    self.logger.info(
-                        "Did not find Inputs row of decision table " + decision_id)
-                    continue
+            input_row = row_idx + 3
+            if col not in labels["Inputs"].get(input_row, []) \
+                    and col not in labels["Potential contraindications"].get(input_row, []):
                 self.logger.info(
-                    "Found Inputs/Potential contraindications at " +
-                    str(col) +
-                    " / " +
-                    str(input_row))
-
-                output_col = False
-                guidance_col = False
-                ref_col = False
-                anno_col = False
-                for c in df:
-                    if c <= col:
-                        continue
-                    if df[c][input_row] == "Output":
-                        output_col = c
-                    elif df[c][input_row] == "Guidance displayed to health worker":
-                        guidance_col = c
-                    elif df[c][input_row] == "Annotations":
-                        anno_col = c
-                    elif df[c][input_row] == "Reference(s)":
-                        ref_col = c
-
-                if not output_col:
-                    self.logger.info(
-                        "Did not find Output column of decision table " + decision_id)
-                    continue
+                    "Did not find Inputs row of decision table " + decision_id)
+                continue
+            self.logger.info(
+                "Found Inputs/Potential contraindications at " +
+                str(col) +
+                " / " +
+                str(input_row))
+
+            # the right-most matching column on the inputs row wins
+            output_col = self.last_label_col(labels, "Output", input_row, col)
+            guidance_col = self.last_label_col(
+                labels, "Guidance displayed to health worker", input_row, col)
+            anno_col = self.last_label_col(labels, "Annotations", input_row, col)
+            ref_col = self.last_label_col(labels, "Reference(s)", input_row, col)
+
+            if not output_col:
+                self.logger.info(
+                    "Did not find Output column of decision table " + decision_id)
+                continue
 
-                if not guidance_col:
-                    self.logger.info(
-                        "Did not find Guidance column of decision table " + decision_id)
-
-                if not ref_col:
-                    self.logger.info(
-                        "Did not find Reference column of decision table " +
-                        decision_id)
-
-                tab_data = {"row": row_idx,
-                            "col": col_idx,
-                            "trigger": trigger,
-                            "br": br,
-                            "input_row": input_row,
-                            "output_col": output_col,
-                            "guidance_col": guidance_col,
-                            "annotation_col": anno_col,
-                            "reference_col": ref_col,
-                            'used': False}
+            if not guidance_col:
+                self.logger.info(
+                    "Did not find Guidance column of decision table " + decision_id)
 
+            if not ref_col:
                 self.logger.info(
-                    "Found decision table " +
-                    decision_id +
-                    " in " +
-                    tab +
-                    " at r,c:" +
-                    str(row_idx) +
-                    "," +
-                    str(col_idx) +
-                    ".  Saving in tab_id=" +
-                    tab_id +
-                    " with " +
-                    str(tab_data))
-                self.tab_data[tab_id]['tables'][decision_id] = tab_data
+                    "Did not find Reference column of decision table " +
+                    decision_id)
+
+            tab_data = {"row": row_idx,
+                        "col": col,
+                        "trigger": trigger,
+                        "br": br,
+                        "input_row": input_row,
+                        "output_col": output_col,
+                        "guidance_col": guidance_col,
+                        "annotation_col": anno_col,
+                        "reference_col": ref_col,
+                        'used': False}
+
+            self.logger.info(
+                "Found decision table " +
+                decision_id +
+                " in " +
+                tab +
+                " at r,c:" +
+                str(row_idx) +
+                "," +
+                str(col) +
+                ".  Saving in tab_id=" +
+                tab_id +
+                " with " +
+                str(tab_data))
+            self.tab_data[tab_id]['tables'][decision_id] = tab_data
         return True
 
     def extract_inputs(self, vals, prev_inputs):
@@ -662,9 +711,9 @@ The table below provides an overview of the decision-support tables and algorith
                     self.tab_data[tab_id]['tables'].keys()))
             return False
         data = self.tab_data[tab_id]['tables'][dt_id]
-        df = self.tab_data[tab_id]["df"]
+        values = self.tab_data[tab_id]["values"]
 
-        ul_corner = df[data["col"]][data["row"]]
+        ul_corner = values[data["row"], data["col"]]
         is_contra_table = False
         is_regular_table = False
         is_schedule_table = False
@@ -675,7 +724,7 @@ The table below provides an overview of the decision-support tables and algorith
         self.logger.info("input row=" + str(data["input_row"]))
         if stringer.name_to_id(
                 ul_corner) == stringer.name_to_id("Decision ID"):
-            table_type = df[data["col"]][data["input_row"]]
+            table_type = values[data["input_row"], data["col"]]
             is_contra_table = table_type == "Potential contraindications"
             if is_contra_table:
                 row_offset += 1
@@ -735,7 +784,7 @@ The table below provides an overview of the decision-support tables and algorith
         while in_table:
             row_offset += 1
             prev_rule = rule
-            rule = self.get_rule(df, data, row_offset, prev_rule)
+            rule = self.get_rule(values, data, row_offset, prev_rule)
             self.logger.info(
                 "Previus rule=" +
                 str(prev_rule) +
@@ -767,17 +816,12 @@ The table below provides an overview of the decision-support tables and algorith
                 return False
         if is_regular_table:
             fsh['plan'] += "\n" + fsh['citations'] + "\n" + fsh['rules']
-            # maybe the DT was not in a bpmn, check to see if there is a
-            # definition already loaded
-            if not self.installer.has_resource('profiles', profile_id):
-                self.logger.info(
-                    "WARNING - Decision Table present without representation in BPMN")
-                profile_fsh = f"Profile: {profile_id}\n"
-                profile_fsh += "Parent: $SGDecisionTable\n"
-                profile_fsh += f"Title: \"{name}\"\n"
-                profile_fsh += f"* name = \"Decision Table profile: {name}\"\n"
-                self.installer.add_resource(
-                    'profiles', profile_id, profile_fsh)
+            # used by generate_codes() unless the BPMN extraction defined it
+            profile_fsh = f"Profile: {profile_id}\n"
+            profile_fsh += "Parent: $SGDecisionTable\n"
+            profile_fsh += f"Title: \"{name}\"\n"
+            profile_fsh += f"* name = \"Decision Table profile: {name}\"\n"
+            self.profile_stubs.setdefault(profile_id, profile_fsh)
             self.installer.add_resource(
                 'plandefinitions', full_dt_id, fsh['plan'])
         dmn_tab = self.get_dmn(full_dt_id, business_rule, trigger, dmn)
@@ -785,13 +829,14 @@ The table below provides an overview of the decision-support tables and algorith
         self.tab_data[tab_id]['tables'][dt_id]['used'] = True
         return True
 
-    def get_rule(self, df, data, row_offset, prev_rule):
+    def get_rule(self, values: np.ndarray, data, row_offset, prev_rule):
         t_row = data["input_row"] + row_offset
 
-        if t_row not in df[data["output_col"]]:
+        if t_row >= values.shape[0]:
             return None
 
-        vals = df.iloc[t_row, data["col"]:data["output_col"]].tolist()
+        row_values = values[t_row]
+        vals = row_values[data["col"]:data["output_col"]].tolist()
         first_val = vals[0]
         self.logger.info(
             "scanning row=" +
@@ -804,11 +849,16 @@ The table below provides an overview of the decision-support tables and algorith
                                    for v in trailing_vals])
         trailing_nan_input = all([stringer.is_nan(v) for v in trailing_vals])
 
+        # a missing column is stored as False, which indexes column 0
+        output = row_values[int(data["output_col"])]
+        guidance = row_values[int(data["guidance_col"])]
+        reference = row_values[int(data["reference_col"])]
+        annotation = row_values[int(data["annotation_col"])]
         rule = {'inputs': [],
-                'output': df[data["output_col"]][t_row].strip() if isinstance(df[data["output_col"]][t_row], str) else None,
-                'guidance': df[data["guidance_col"]][t_row].strip() if isinstance(df[data["guidance_col"]][t_row], str) else None,
-                'reference': df[data["reference_col"]][t_row].strip() if isinstance(df[data["reference_col"]][t_row], str) else None,
-                'annotation': df[data["annotation_col"]][t_row].strip() if isinstance(df[data["annotation_col"]][t_row], str) else None
+                'output': output.strip() if isinstance(output, str) else None,
+                'guidance': guidance.strip() if isinstance(guidance, str) else None,
+                'reference': reference.strip() if isinstance(reference, str) else None,
+                'annotation': annotation.strip() if isinstance(annotation, str) else None
                 }
 
         blank_outputs = stringer.is_blank(
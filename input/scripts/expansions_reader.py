@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Streaming Reader for IG Publisher expansions.json
+
+The IG publisher writes every expanded ValueSet into a single
+output/expansions.json Bundle. When a DAK binds to large external ValueSets
+(ICD-11, LOINC, SNOMED subsets) that file reaches hundreds of MB, so loading
+it with json.load keeps the whole Bundle in memory.
+
+This module reads the Bundle incrementally: the top-level members are
+scanned once and Bundle.entry is then decoded one entry at a time, so peak
+memory stays at roughly one ValueSet. Only the standard library json decoder
+is used.
+
+Usage:
+    bundle = ExpansionsBundle("output/expansions.json")
+    if bundle.resource_type == 'Bundle':
+        for entry in bundle:
+            resource = entry.get('resource', {})
+
+Author: SMART Guidelines Team
+"""
+
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class JsonStream:
+    """Incremental tokenizer over a JSON text file, decoding one value at a time."""
+
+    chunk_size = 1 << 16
+    whitespace = ' \t\n\r'
+    delimiters = whitespace + ',:]}'
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.keys = []
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size: Optional[int] = None) -> bool:
+        """Read more text into the buffer, returning False at end of file."""
+        if self.eof:
+            return False
+        # drop what has been consumed so the buffer only holds the current value
+        if self.pos > self.chunk_size:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at end)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number cut at the end of the buffer (e.g. '-2.5' of '-2.5e10')
+                # decodes fine, so only accept a value followed by a delimiter
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in self.delimiters):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # grow geometrically so a large value is not re-decoded once per chunk
+            self.fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def iter_object(self, array_key: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate over the members of a top-level object.
+
+        Members are yielded as (key, value) pairs, except for the member named
+        array_key whose array elements are yielded one by one as
+        (array_key, element) without building the array.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting property name", self.buffer, self.pos)
+            self.expect(':')
+            self.keys.append(key)
+            if key == array_key and self.peek() == '[':
+                self.pos += 1
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self.decode_value()
+                        separator = self.peek()
+                        self.pos += 1
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise json.JSONDecodeError("Expecting ',' delimiter", self.buffer, self.pos - 1)
+            else:
+                yield key, self.decode_value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", self.buffer, self.pos - 1)
+
+
+class ExpansionsBundle:
+    """
+    A FHIR Bundle on disk whose entries are read lazily.
+
+    Opening the bundle scans its top-level members (resourceType, id, ...)
+    so that malformed files are reported up front; iterating over it yields
+    the Bundle.entry items one at a time.
+
+    Attributes:
+        file_path: Path to the Bundle JSON file
+        header: The top-level members of the Bundle other than 'entry'
+        has_entries: Whether the Bundle has an 'entry' member
+        entry_count: Number of entries yielded by the last full iteration
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.header: Dict[str, Any] = {}
+        self.has_entries = False
+        self.entry_count = 0
+        self.scan_header()
+
+    @property
+    def resource_type(self) -> Optional[str]:
+        return self.header.get('resourceType')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dictionary-style access to the top-level members."""
+        return self.header.get(key, default)
+
+    def scan_header(self) -> None:
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            stream = JsonStream(f)
+            for key, value in stream.iter_object('entry'):
+                if key != 'entry':
+                    self.header[key] = value
+                elif 'resourceType' in self.header:
+                    # the IG publisher writes resourceType before the entries,
+                    # only read through them when it has not been seen yet
+                    break
+            self.has_entries = 'entry' in stream.keys
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if not self.has_entries:
+            return
+        count = 0
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            for key, value in JsonStream(f).iter_object('entry'):
+                if key == 'entry':
+                    count += 1
+                    yield value
+        self.entry_count = count
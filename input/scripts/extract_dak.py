@@ -19,11 +19,12 @@ into FHIR-compatible resources.
 
 Usage:
     python extract_dak.py [--run-publisher] [--tx URL] [--publisher-jar PATH]
-                          [--skip-commit] [--commit-message MSG]
+                          [--skip-commit] [--commit-message MSG] [--jobs N]
+                          [--incremental] [--log-contents]
 
 Author: SMART Guidelines Team
 """
-from typing import List, Type
+from typing import List, Optional, Type
 import stringer
 import logging
 import os
@@ -36,7 +37,9 @@ from dt_extractor import dt_extractor
 from svg_extractor import svg_extractor
 from extractpr import extractpr
 from extractor import extractor
+from extract_manifest import extract_manifest
 import getopt
+import multiprocessing
 import sys
 
 try:
@@ -57,6 +60,9 @@ class extract_dak:
     between different content types.
     """
     
+    jobs: int = 1
+    incremental: bool = False
+
     @property
     def logger(self) -> logging.Logger:
         """Get logger instance for this class."""
@@ -70,25 +76,85 @@ class extract_dak:
         print("--publisher-jar PATH : explicit path to publisher.jar")
         print("--skip-commit        : run publisher but do not commit .pot files")
         print("--commit-message MSG : custom git commit message for the .pot update")
+        print("--jobs N             : extract files of parallel-safe extractors on N worker processes")
+        print("--incremental        : only re-extract input files that changed since the last run (see temp/)")
+        print("--log-contents       : log the full content of every generated multifile entry")
         print("--help|h             : print this information")
         sys.exit(2)
 
     def extract(self) -> bool:
+        pool = None
+        manifest = None
         try:
             ins = installer()
+            if self.incremental:
+                manifest = extract_manifest(ins.temp_path)
+                manifest.load()
+            if self.jobs > 1 or manifest:
+                # spawn gives each worker a fresh installer, whose state lives on the class;
+                # one task per child so that state never leaks from one file to the next
+                pool = multiprocessing.get_context("spawn").Pool(self.jobs, maxtasksperchild=1)
             extractors: List[Type[extractor]] = [dd_extractor,bpmn_extractor,svg_extractor,req_extractor,dt_extractor,extractpr]
             for extractor_class in extractors:
                 self.logger.info("Initializing extractor " + extractor_class.__name__)
                 ext = extractor_class(ins)
-                if not ext.extract():
+                if pool and extractor_class.parallel_safe:
+                    extracted = self.extract_parallel(pool, ins, ext, manifest)
+                else:
+                    extracted = ext.extract()
+                if not extracted:
                     classname = extractor_class.__name__
                     self.logger.info(f"ERROR: Could not extract on {classname}")
                     return False
+            if manifest:
+                manifest.remove_stale()
             self.logger.info("Installing generated resources and such")
-            return ins.install()
+            if not ins.install():
+                return False
+            return manifest.save() if manifest else True
         except Exception as e:            
             self.logger.exception(f"ERROR: Could not extract: {e}")
             return False
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            stringer.log_cache_stats(self.logger)
+
+    def extract_parallel(self, pool, ins: installer, ext: extractor,
+                         manifest: Optional[extract_manifest] = None) -> bool:
+        """
+        Extract every file of ext on the worker pool.
+
+        Each file is extracted in isolation and the resulting installer and
+        extractor snapshots are merged back in find_files() order before
+        extract_finish() runs, so the installed output matches a serial run.
+        With a manifest, files whose content is unchanged since the last run
+        are merged from the cache instead.
+        """
+        extractor_name = ext.__class__.__name__
+        inputfile_names = ext.find_files()
+        fragments = {}
+        if manifest:
+            for inputfile_name in inputfile_names:
+                fragment = manifest.get_fragment(extractor_name, inputfile_name)
+                if fragment:
+                    fragments[inputfile_name] = fragment
+        pending = [name for name in inputfile_names if name not in fragments]
+        self.logger.info(f"Extracting {len(pending)} of {len(inputfile_names)} files for {extractor_name} on {self.jobs} workers")
+        for inputfile_name, fragment in zip(pending, pool.map(ext.__class__.extract_isolated, pending, chunksize=1)):
+            fragments[inputfile_name] = fragment
+            if manifest and fragment['result']:
+                manifest.put_fragment(extractor_name, inputfile_name, fragment,
+                                      ins.get_state_outputs(fragment['state']))
+        for inputfile_name in inputfile_names:
+            fragment = fragments[inputfile_name]
+            self.logger.info("Merging extraction of " + inputfile_name)
+            if not fragment['result']:
+                self.logger.info("Could not extract " + inputfile_name)
+            ins.merge_state(fragment['state'])
+            ext.merge_state(fragment.get('extractor', {}))
+        return ext.extract_finish()
 
     def main(self) -> bool:
         run_publisher = False
@@ -108,6 +174,9 @@ class extract_dak:
                     "publisher-jar=",
                     "skip-commit",
                     "commit-message=",
+                    "jobs=",
+                    "incremental",
+                    "log-contents",
                 ],
             )
         except getopt.GetoptError:
@@ -126,6 +195,16 @@ class extract_dak:
                 skip_commit = True
             elif opt == "--commit-message":
                 commit_message = val
+            elif opt == "--incremental":
+                self.incremental = True
+            elif opt == "--log-contents":
+                # via the environment so that worker processes pick it up too
+                os.environ["DAK_LOG_CONTENTS"] = "true"
+            elif opt == "--jobs":
+                try:
+                    self.jobs = max(1, int(val))
+                except ValueError:
+                    self.usage()
 
         if not self.extract():
             sys.exit(1)
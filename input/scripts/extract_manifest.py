@@ -0,0 +1,204 @@
+"""
+Content-Hash Manifest for Incremental DAK Extraction
+
+This module keeps track of which DAK L2 input files (xlsx, bpmn, svg, pdf)
+have already been extracted and what each of them produced, so that an
+incremental run of extract_dak.py only re-extracts inputs whose content
+changed.
+
+The manifest is stored in the temp/ directory next to the extraction log
+and records, per input file:
+- the extractor that processed it
+- the SHA-256 hash of its content
+- the generated files (FSH, DMN, CQL, pages, images) it produced
+
+The installer snapshot of each extracted input (see installer.get_state)
+is cached alongside the manifest, keyed by content hash, so unchanged
+inputs are merged from the cache instead of being extracted again.
+
+Author: SMART Guidelines Team
+"""
+from typing import Dict, List, Optional, Any
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+
+class extract_manifest(object):
+    """
+    Manifest of extracted input files and the outputs they produced.
+
+    Attributes:
+        temp_path (str): Directory holding the manifest and fragment cache
+        manifest_file (str): Name of the JSON manifest within temp_path
+        cache_dir (str): Name of the fragment cache directory within temp_path
+        inputs (dict): Input path -> {'extractor', 'hash', 'outputs'}
+    """
+    manifest_file: str = "extract-manifest.json"
+    cache_dir: str = "extract-cache"
+    chunk_size: int = 1 << 20
+
+    @property
+    def logger(self) -> logging.Logger:
+        """Get logger instance for this class."""
+        return logging.getLogger(self.__class__.__name__)
+
+    def __init__(self, temp_path: str = "temp") -> None:
+        self.temp_path = temp_path
+        self.inputs: Dict[str, Dict[str, Any]] = {}
+        self.hashes: Dict[str, str] = {}
+        self.seen: List[str] = []
+        self.version = self.get_scripts_version()
+
+    def get_manifest_path(self) -> Path:
+        return Path(self.temp_path) / self.manifest_file
+
+    def get_fragment_path(self, inputfile_name: str, file_hash: str) -> Path:
+        # the path is part of the key: identical files still produce different outputs
+        key = hashlib.sha256((inputfile_name + "\0" + file_hash).encode()).hexdigest()
+        return Path(self.temp_path) / self.cache_dir / (key + ".pickle")
+
+    def get_scripts_version(self) -> str:
+        """
+        Fingerprint of the extraction scripts and XSLTs.
+
+        Cached fragments are only valid for the code that produced them, so
+        any change to the scripts invalidates the whole manifest.
+        """
+        script_directory = os.path.dirname(os.path.abspath(__file__))
+        sha = hashlib.sha256()
+        for script in sorted(glob.glob(script_directory + "/*.py")
+                             + glob.glob(script_directory + "/includes/*")):
+            sha.update(os.path.basename(script).encode())
+            sha.update(Path(script).read_bytes())
+        return sha.hexdigest()
+
+    def hash_file(self, inputfile_name: str) -> str:
+        if inputfile_name not in self.hashes:
+            sha = hashlib.sha256()
+            with open(inputfile_name, "rb") as file:
+                for chunk in iter(lambda: file.read(self.chunk_size), b""):
+                    sha.update(chunk)
+            self.hashes[inputfile_name] = sha.hexdigest()
+        return self.hashes[inputfile_name]
+
+    def load(self) -> bool:
+        manifest_path = self.get_manifest_path()
+        if not manifest_path.exists():
+            self.logger.info("No extraction manifest at " + str(manifest_path))
+            return False
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (IOError, ValueError) as e:
+            self.logger.info("Could not read extraction manifest " + str(manifest_path))
+            self.logger.info(f"\tError: {e}")
+            return False
+        self.inputs = manifest.get('inputs', {})
+        if manifest.get('version') != self.version:
+            # keep the inputs so outputs of deleted inputs can still be removed,
+            # but forget their hashes so every input is extracted again
+            self.logger.info("Extraction scripts changed since last run, re-extracting all inputs")
+            for name, entry in self.inputs.items():
+                if entry['hash']:
+                    self.get_fragment_path(name, entry['hash']).unlink(missing_ok=True)
+                entry['hash'] = None
+        self.logger.info(f"Loaded extraction manifest with {len(self.inputs)} inputs")
+        return True
+
+    def save(self) -> bool:
+        manifest_path = self.get_manifest_path()
+        try:
+            manifest_path.parent.mkdir(exist_ok=True, parents=True)
+            with open(manifest_path, "w", encoding="utf-8") as file:
+                json.dump({'version': self.version, 'inputs': self.inputs},
+                          file, indent=2, sort_keys=True)
+            self.logger.info("Saved extraction manifest " + str(manifest_path))
+        except IOError as e:
+            self.logger.info("Could not save extraction manifest " + str(manifest_path))
+            self.logger.info(f"\tError: {e}")
+            return False
+        return True
+
+    def get_fragment(self, extractor_name: str, inputfile_name: str) -> Optional[Dict]:
+        """
+        Return the cached extraction of an input if it is still current.
+
+        The input is current when it was extracted by the same extractor,
+        its content hash is unchanged and every file it wrote directly is
+        still on disk.
+
+        Returns:
+            The cached worker result ({'result', 'state'}) or None
+        """
+        self.seen.append(inputfile_name)
+        entry = self.inputs.get(inputfile_name)
+        if not entry or entry['extractor'] != extractor_name \
+                or entry['hash'] != self.hash_file(inputfile_name):
+            return None
+        fragment_path = self.get_fragment_path(inputfile_name, entry['hash'])
+        try:
+            with open(fragment_path, "rb") as file:
+                fragment = pickle.load(file)
+        except Exception as e:
+            self.logger.info("Could not load cached extraction of " + inputfile_name)
+            self.logger.info(f"\tError: {e}")
+            return None
+        for file_path in fragment['state']['files']:
+            if not os.path.exists(file_path):
+                self.logger.info("Output " + file_path + " of " + inputfile_name + " is missing")
+                return None
+        return fragment
+
+    def put_fragment(self, extractor_name: str, inputfile_name: str,
+                     fragment: Dict, outputs: List[str]) -> bool:
+        file_hash = self.hash_file(inputfile_name)
+        previous = self.inputs.get(inputfile_name)
+        if previous and previous['hash'] and previous['hash'] != file_hash:
+            self.get_fragment_path(inputfile_name, previous['hash']).unlink(missing_ok=True)
+        fragment_path = self.get_fragment_path(inputfile_name, file_hash)
+        try:
+            fragment_path.parent.mkdir(exist_ok=True, parents=True)
+            with open(fragment_path, "wb") as file:
+                pickle.dump(fragment, file)
+        except Exception as e:
+            self.logger.info("Could not cache extraction of " + inputfile_name)
+            self.logger.info(f"\tError: {e}")
+            return False
+        self.inputs[inputfile_name] = {'extractor': extractor_name,
+                                       'hash': file_hash,
+                                       'outputs': outputs}
+        return True
+
+    def remove_stale(self) -> List[str]:
+        """
+        Forget inputs that were not seen in this run and delete their outputs.
+
+        Outputs that are also claimed by an input that is still present are
+        kept.
+
+        Returns:
+            List of the output files that were removed
+        """
+        stale = [name for name in self.inputs if name not in self.seen]
+        kept = set()
+        for name, entry in self.inputs.items():
+            if name not in stale:
+                kept.update(entry['outputs'])
+        removed = []
+        for name in stale:
+            entry = self.inputs.pop(name)
+            self.logger.info("Input " + name + " was removed, removing its outputs")
+            for output in entry['outputs']:
+                if output in kept or not os.path.exists(output):
+                    continue
+                os.remove(output)
+                self.logger.info("Removed " + output)
+                removed.append(output)
+            if entry['hash']:
+                self.get_fragment_path(name, entry['hash']).unlink(missing_ok=True)
+        return removed
@@ -21,11 +21,62 @@ from typing import List, Dict, Iterator, Tuple, Optional, Union, Any
 import stringer
 import re
 import os
+import sys
 import pandas as pd
 from installer import installer
 import logging
 
 
+class column_matcher(object):
+    """
+    Matches source sheet columns against a column map.
+
+    The possible column names of the map are normalized once with
+    stringer.name_to_lower_id into a lookup table, so a header row is
+    matched with one lookup per source column.
+
+    Attributes:
+        column_maps (dict): Desired column name -> list of possible source names
+        desired_columns (list): The desired column names, in column map order
+        column_ids (dict): Normalized possible name -> desired column name
+    """
+
+    def __init__(self, column_maps: Dict[str, List[str]]) -> None:
+        self.column_maps = column_maps
+        self.desired_columns = [str(name) for name in column_maps.keys()]
+        self.column_ids: Dict[str, str] = {}
+        for desired_column_name, possible_column_names in column_maps.items():
+            for possible_column_name in possible_column_names:
+                # a later desired column wins if two of them share a possible name
+                self.column_ids[stringer.name_to_lower_id(str(possible_column_name))] = \
+                    str(desired_column_name)
+
+    def match(self, column_names: List[Any]) -> Tuple[Dict[Any, str], List[int]]:
+        """
+        Match a header row against the column map.
+
+        Args:
+        column_names: The source column names, in sheet order
+
+        Returns:
+        Tuple of the rename map (source name -> desired name) and the
+        positions of the columns to keep. Blank source column names are
+        kept unrenamed, every other unmatched column is left out.
+        """
+        rename_map = {}
+        keep = []
+        for position, column_name in enumerate(column_names):
+            if stringer.is_blank(column_name):
+                keep.append(position)
+                continue
+            desired_column_name = self.column_ids.get(
+                stringer.name_to_lower_id(column_name))
+            if desired_column_name is not None:
+                rename_map[column_name] = desired_column_name
+                keep.append(position)
+        return rename_map, keep
+
+
 class extractor(object):
     """
     Base class for all data extractors in the SMART guidelines system.
@@ -43,10 +94,18 @@ class extractor(object):
         inputfile_name (str): Path to the currently processed input file
         class_cs (str): Default CodeSystem URL for generated resources
         installer: Instance of the installer for resource management
+        workbooks (dict): Parsed Excel workbooks of the files being extracted
     """
 
     inputfile_name: str = ""
     class_cs: str = "http://smart.who.int/base/CodeSystem/CDHIv1"
+    # workbook path -> {sheet name -> raw header-less frame}, kept while the
+    # file is being extracted and dropped afterwards (see release_workbook)
+    workbooks: Dict[str, Dict[str, pd.DataFrame]] = {}
+    # True when extract_file() only touches the installer and the extractor
+    # state of get_state(), so files can be extracted in separate processes
+    # and merged back (see extract_isolated)
+    parallel_safe: bool = False
 
     @property
     def logger(self) -> logging.Logger:
@@ -69,8 +128,9 @@ class extractor(object):
         """
         Main extraction workflow that processes all discovered files.
 
-        Iterates through all files returned by find_files() and
-        processes each one using the extract_file() method.
+        Iterates through all files returned by find_files(),
+        processes each one using the extract_file() method and then
+        runs extract_finish().
 
         Returns:
             True if extraction completed successfully
@@ -78,9 +138,68 @@ class extractor(object):
         for inputfile_name in self.find_files():
             self.logger.info('IF=' + inputfile_name)
             self.inputfile_name = inputfile_name
-            self.extract_file()
+            try:
+                self.extract_file()
+            finally:
+                self.release_workbook(inputfile_name)
+        return self.extract_finish()
+
+    def extract_finish(self) -> bool:
+        """
+        Generate what depends on all the files of this extractor.
+
+        Called once after every file has been extracted, or merged back
+        from a worker process or the incremental cache.
+
+        Returns:
+            True if successful
+        """
         return True
 
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Returns a picklable snapshot of what extract_file() collected on the
+        extractor itself, for extract_finish(), to be merged into the
+        extractor of the main process with merge_state().
+        """
+        return {}
+
+    def merge_state(self, state: Dict[str, Any]) -> None:
+        """Merges a snapshot produced by get_state() into this extractor."""
+        pass
+
+    @classmethod
+    def extract_isolated(cls, inputfile_name: str) -> Dict[str, Any]:
+        """
+        Extract a single file against a fresh installer.
+
+        Intended to run in a worker process: the extractor is created on
+        its own installer, processes only the given file and hands back
+        the installer state for the parent to merge with
+        installer.merge_state().
+
+        Args:
+        inputfile_name: Path of the file to extract
+
+        Returns:
+        Dictionary with the extract_file() outcome under 'result', the
+        installer snapshot under 'state' and the extractor snapshot
+        under 'extractor'
+        """
+        ins = installer(
+            logfile_path=installer.temp_path + "/" +
+            os.path.basename(sys.argv[0]) + "." +
+            os.path.basename(inputfile_name) + ".log")
+        ext = cls(ins)
+        ext.logger.info('IF=' + inputfile_name)
+        ext.inputfile_name = inputfile_name
+        try:
+            result = ext.extract_file()
+        finally:
+            ext.release_workbook(inputfile_name)
+        return {'result': result is not False, 'state': ins.get_state(),
+                'extractor': ext.get_state()}
+
     def get_aliases(self) -> List[str]:
         """
         Provide additional aliases for FHIR resource generation.
@@ -118,6 +237,99 @@ class extractor(object):
         """
         pass
 
+    def get_workbook(self, inputfile_name: Optional[str] = None) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Load every sheet of an Excel workbook once per run.
+
+        The workbook is parsed a single time with header=None and all of
+        its sheets are kept in memory as raw frames, so that header
+        detection and tab loading never need to reopen the file.
+
+        Args:
+        inputfile_name: Path to the workbook, defaults to the current input file
+
+        Returns:
+        Dictionary of sheet name to raw data frame, or None if the
+        workbook could not be read
+        """
+        if inputfile_name is None:
+            inputfile_name = self.inputfile_name
+        if inputfile_name not in self.workbooks:
+            self.logger.info("Loading workbook " + inputfile_name)
+            try:
+                self.workbooks[inputfile_name] = pd.read_excel(
+                    inputfile_name,
+                    sheet_name=None,
+                    header=None)
+            except Exception as e:
+                self.logger.info("Could not open workbook " + inputfile_name)
+                self.logger.info(e)
+                return None
+        return self.workbooks[inputfile_name]
+
+    def release_workbook(self, inputfile_name: Optional[str] = None) -> None:
+        """
+        Drop a workbook from the cache once its file has been extracted.
+
+        Each file is only read by its own extractor, so keeping its sheets
+        after extract_file() returns would hold every workbook of the run
+        in memory until exit.
+
+        Args:
+        inputfile_name: Path to the workbook, defaults to the current input file
+        """
+        if inputfile_name is None:
+            inputfile_name = self.inputfile_name
+        self.workbooks.pop(inputfile_name, None)
+
+    def get_sheet(self, sheet_name: str, header_row: Optional[int] = None) -> pd.DataFrame:
+        """
+        Retrieve a sheet of the current input file from the workbook cache.
+
+        With header_row=None the raw frame is returned as loaded. Otherwise
+        the given row is used as the column names and the following rows as
+        data, matching what pd.read_excel(..., header=header_row) produces.
+
+        Args:
+        sheet_name: Name of the sheet to retrieve
+        header_row: Row index to use as header, or None for no header
+
+        Returns:
+        Pandas DataFrame for the sheet
+
+        Raises:
+        KeyError: if the workbook or the sheet could not be found
+        ValueError: if header_row lies beyond the end of the sheet
+        """
+        workbook = self.get_workbook()
+        if workbook is None:
+            raise KeyError("Could not load workbook " + self.inputfile_name)
+        raw = workbook[sheet_name]
+        if header_row is None:
+            return raw
+        if header_row >= len(raw.index):
+            raise ValueError(
+                "Header row " + str(header_row) +
+                " is beyond the end of sheet " + sheet_name)
+
+        # mimic the column naming of pd.read_excel: blank headers become
+        # "Unnamed: <index>" and duplicates get a ".<n>" suffix
+        columns = []
+        seen: Dict[Any, int] = {}
+        for index, name in enumerate(raw.iloc[header_row].tolist()):
+            if stringer.is_blank(name):
+                name = "Unnamed: " + str(index)
+            if name in seen:
+                seen[name] += 1
+                name = str(name) + "." + str(seen[name])
+            else:
+                seen[name] = 0
+            columns.append(name)
+
+        data_frame = raw.iloc[header_row + 1:].reset_index(drop=True)
+        data_frame.columns = columns
+        return data_frame.infer_objects()
+
         # see
         # https://www.youtube.com/watch?v=EnSu9hHGq5o&t=1184s&ab_channel=NextDayVideo
     def generate_pairs_from_lists(self, lista: List[Any], listb: List[Any]) -> Iterator[Tuple[Any, Any]]:
@@ -157,7 +369,7 @@ class extractor(object):
 
     def retrieve_data_frame_by_headers(
         self,
-        column_maps: Dict[str, List[str]],
+        column_maps: Union[Dict[str, List[str]], column_matcher],
         sheet_names: List[str],
         header_offsets: List[int] = [
             0,
@@ -173,7 +385,8 @@ class extractor(object):
 
         Args:
         column_maps: Dictionary mapping desired column names to lists of
-                    possible source column names for matching
+                    possible source column names for matching, or a
+                    column_matcher built from such a dictionary
         sheet_names: List of possible sheet names to try
         header_offsets: List of row indices to try as header rows
 
@@ -203,6 +416,10 @@ class extractor(object):
         #     'i-want': ["I want","I want to"],
         #     'so-that':["So that"]
         #     }
+        if isinstance(column_maps, column_matcher):
+            matcher = column_maps
+        else:
+            matcher = column_matcher(column_maps)
         self.logger.info("Looking at sheets:" + " ".join(sheet_names))
         for sheet_name, header_row in self.generate_pairs_from_lists(
                 sheet_names, header_offsets):
@@ -212,10 +429,7 @@ class extractor(object):
                 "/" +
                 str(header_row))
             try:
-                data_frame = pd.read_excel(
-                    self.inputfile_name,
-                    sheet_name=sheet_name,
-                    header=header_row)
+                data_frame = self.get_sheet(sheet_name, header_row)
             except Exception as e:
                 self.logger.info(
                     "Could not open sheet " +
@@ -226,36 +440,22 @@ class extractor(object):
                 continue
 
             # this is where we will map current column names to
-            # canonicalized/normalied column names
-            true_column_map = {}
-            for column_name in list(data_frame):
-                if stringer.is_blank(column_name):
-                    continue
-                column_id = stringer.name_to_lower_id(column_name)
-
-                for desired_column_name, possible_column_name in self.generate_pairs_from_column_maps(
-                        column_maps):
-                    possible_column_id = stringer.name_to_lower_id(
-                        possible_column_name)
-                    if (possible_column_id == column_id):
-                        # we found what we needed
-                        self.logger.info(
-                            "Matched input sheet column " +
-                            column_name +
-                            " with desired column " +
-                            desired_column_name)
-                        true_column_map[column_name] = desired_column_name
-
-                if column_name not in true_column_map:
-                    # we dont need this input/source data frame column
-                    # we get rid of it to help normalize for downstream
-                    # processing
-                    data_frame.drop(column_name, axis='columns', inplace=True)
+            # canonicalized/normalied column names. columns we dont need are
+            # left out to help normalize for downstream processing
+            true_column_map, keep = matcher.match(list(data_frame))
+            for column_name, desired_column_name in true_column_map.items():
+                self.logger.info(
+                    "Matched input sheet column " +
+                    column_name +
+                    " with desired column " +
+                    desired_column_name)
+            kept = set(keep)
+            for position, column_name in enumerate(data_frame):
+                if position not in kept:
                     self.logger.info("Dropped: " + str(column_name))
-
             self.logger.info("Mapping columns: " + str(true_column_map))
-            data_frame = data_frame.rename(columns=true_column_map)
-            if (list(data_frame) != list(column_maps.keys())):
+            data_frame = data_frame.iloc[:, keep].rename(columns=true_column_map)
+            if (list(data_frame) != matcher.desired_columns):
                 continue
 
             self.logger.info(
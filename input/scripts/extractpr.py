@@ -46,6 +46,7 @@ class extractpr(extractor):
     - Table 2 containing generic personas definitions
     - Table 3 containing related personas definitions
     """
+    parallel_safe: bool = True
 
     def __init__(self, installer: installer) -> None:
         """Initialize the personas extractor with installer instance."""
@@ -13,19 +13,29 @@ It works by:
 The script is designed to work with a single IG publisher run, post-processing
 the generated HTML files instead of creating markdown that requires a second run.
 
+The HTML pages are edited in a single pass at the end; --jobs N spreads
+that pass over N worker processes (0 for one per CPU). --anchor-cache[=PATH]
+keeps the code anchors of the CodeSystem pages between runs
+(default input/temp/codesystem_anchors.json).
+
 Usage:
-    python generate_dak_api_hub.py [output_dir] [openapi_dir]
+    python generate_dak_api_hub.py [output_dir] [openapi_dir] [--jobs N] [--anchor-cache[=PATH]]
 
 Author: SMART Guidelines Team
 """
 
+import argparse
 import json
 import os
 import sys
 import logging
+import multiprocessing
 import re
+import bisect
+import functools
+import hashlib
 import html as html_module
-from typing import Dict, List, Optional, Any, Tuple, Union
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable, Iterator
 from pathlib import Path
 from urllib.parse import urlparse
 from datetime import datetime
@@ -35,6 +45,44 @@ from datetime import datetime
 # replacing small illustrative code snippets with fetch-based loaders.
 _MIN_SOURCE_SIZE_FOR_DYNAMIC_LOADING = 500
 
+# Patterns of the static source block scanner (_replace_static_sources)
+_PRE_OPEN_RE = re.compile(r'<pre\b[^>]*>', re.IGNORECASE)
+_PRE_CLOSE_RE = re.compile(r'</pre>', re.IGNORECASE)
+_CLASS_ATTR_RE = re.compile(r'\bclass=', re.IGNORECASE)
+_CODE_RE = re.compile(r'<code([^>]*)>([\s\S]*?)</code>', re.IGNORECASE)
+_CQL_CODE_RE = re.compile(r'\s*<code\b[^>]*\bclass="[^"]*\blanguage-cql\b', re.IGNORECASE)
+_CQL_PRE_RE = re.compile(r'<pre\b([^>]*?)>(\s*<code\b[^>]*\bclass="[^"]*\blanguage-cql\b)', re.IGNORECASE)
+_NON_ID_CHAR_RE = re.compile(r'[^a-z0-9]')
+
+# Patterns of the CodeSystem page tokenizer (parse_codesystem_anchors)
+_ANCHOR_TOKEN_RE = re.compile(r'<([a-z][^\s>]*)[^>]*>|id="([^"]*)"', re.IGNORECASE)
+_ID_ATTR_RE = re.compile(r'id="([^"]*)"', re.IGNORECASE)
+_NAME_ATTR_RE = re.compile(r'name="([^"]*)"', re.IGNORECASE)
+_NUMERIC_ID_RE = re.compile(r'-[0-9.]')
+_NUMERIC_CODE_RE = re.compile(r'[0-9]+(?:\.[0-9]+)*')
+_TD_CODE_RE = re.compile(r'([0-9]+(?:\.[0-9]+)*)</td>')
+
+# Default location of the CodeSystem anchor cache (--anchor-cache)
+ANCHOR_CACHE_PATH = "input/temp/codesystem_anchors.json"
+ANCHOR_CACHE_VERSION = 1
+
+
+@functools.lru_cache(maxsize=None)
+def _pre_class_re(lang: str) -> 're.Pattern':
+    """Pattern of a class attribute containing the language word."""
+    return re.compile(r'\bclass="[^"]*?\b' + re.escape(lang) + r'\b[^"]*?"', re.IGNORECASE)
+
+
+def _has_min_source_size(html: str, start: int, end: int) -> bool:
+    """Whether html[start:end].strip() has at least _MIN_SOURCE_SIZE_FOR_DYNAMIC_LOADING characters."""
+    if end - start < _MIN_SOURCE_SIZE_FOR_DYNAMIC_LOADING:
+        return False
+    while start < end and html[start].isspace():
+        start += 1
+    while end > start and html[end - 1].isspace():
+        end -= 1
+    return end - start >= _MIN_SOURCE_SIZE_FOR_DYNAMIC_LOADING
+
 
 def setup_logging() -> logging.Logger:
     """Configure logging for the script."""
@@ -221,6 +269,460 @@ class QAReporter:
             return False
 
 
+class OutputIndex:
+    """
+    File names of the IG output directory, listed once with os.scandir.
+
+    The output directory holds tens of thousands of files, and every phase of
+    the post-processing needs to know which of them exist (schemas, JSON-LD
+    vocabularies, HTML pages and the sibling pages of a resource, source files
+    per format). Instead of listing the directory or calling os.path.exists
+    again each time, the phases query the lookup tables of this index.
+    Files written by this script are added with add() so later phases see them.
+
+    Attributes:
+        output_dir: Directory that was scanned
+        names: Set of all entry names (files and subdirectories)
+        by_extension: Last extension ('.html', '.json', ...) -> sorted file names
+        by_resource_type: Text before the first '-' ('ValueSet', 'CodeSystem', ...) -> sorted file names
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.sorted_names: List[str] = []
+        self.by_extension: Dict[str, List[str]] = {}
+        self.by_resource_type: Dict[str, List[str]] = {}
+        with os.scandir(output_dir) as entries:
+            self.names = {entry.name for entry in entries}
+        self.sorted_names = sorted(self.names)
+        for name in self.sorted_names:
+            self.by_extension.setdefault(self.last_extension(name), []).append(name)
+            if '-' in name:
+                self.by_resource_type.setdefault(name.split('-', 1)[0], []).append(name)
+
+    @staticmethod
+    def last_extension(name: str) -> str:
+        return '.' + name.rsplit('.', 1)[1] if '.' in name else ''
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, filename: str) -> None:
+        """Record a file written to the output directory after the scan."""
+        filename = os.path.basename(filename)
+        if filename in self.names:
+            return
+        self.names.add(filename)
+        bisect.insort(self.sorted_names, filename)
+        bisect.insort(self.by_extension.setdefault(self.last_extension(filename), []), filename)
+        if '-' in filename:
+            bisect.insort(self.by_resource_type.setdefault(filename.split('-', 1)[0], []), filename)
+
+    def exists(self, filename: str) -> bool:
+        """Check whether the output directory has a file of this name."""
+        return filename in self.names
+
+    def with_suffix(self, suffix: str) -> List[str]:
+        """Sorted names ending in suffix, e.g. '.html' or '.schema.json'."""
+        candidates = self.by_extension.get(self.last_extension(suffix), [])
+        return [name for name in candidates if name.endswith(suffix)]
+
+    def with_prefix(self, prefix: str, suffix: str = '') -> List[str]:
+        """Sorted names starting with prefix (and ending in suffix, if given)."""
+        candidates = self.by_extension.get(self.last_extension(suffix), []) if suffix else self.sorted_names
+        start = bisect.bisect_left(candidates, prefix)
+        matches = []
+        for name in candidates[start:]:
+            if not name.startswith(prefix):
+                break
+            if name.endswith(suffix):
+                matches.append(name)
+        return matches
+
+    def spec_files(self, spec_name: str, suffix: str = '') -> List[str]:
+        """Sorted names of the pages and files of a resource: '{spec_name}-*' and '{spec_name}.*'."""
+        return sorted(self.with_prefix(f'{spec_name}-', suffix) + self.with_prefix(f'{spec_name}.', suffix))
+
+    def of_resource_type(self, resource_type: str, suffix: str = '') -> List[str]:
+        """Sorted names starting with '{resource_type}-' (and ending in suffix, if given)."""
+        return [name for name in self.by_resource_type.get(resource_type, []) if name.endswith(suffix)]
+
+
+# output directory -> OutputIndex, built on first use (see get_output_index)
+output_indexes: Dict[str, OutputIndex] = {}
+
+
+def get_output_index(output_dir: str) -> OutputIndex:
+    """Return the index of an output directory, scanning it on first use."""
+    key = os.path.abspath(output_dir)
+    if key not in output_indexes:
+        output_indexes[key] = OutputIndex(output_dir)
+    return output_indexes[key]
+
+
+def record_output_file(filepath: str) -> None:
+    """Add a file written by this script to the index of its directory, if there is one."""
+    output_index = output_indexes.get(os.path.abspath(os.path.dirname(filepath) or '.'))
+    if output_index is not None:
+        output_index.add(filepath)
+
+
+def parse_codesystem_anchors(html: str, codesystem_id: str) -> Dict[str, str]:
+    """
+    Map the codes of a CodeSystem page to their anchor names in a single pass.
+
+    The anchors are taken, in increasing order of precedence, from ids starting
+    with '<codesystem_id>-', ids with a numeric part, ids of <tr> rows containing
+    the CodeSystem id and <a name> anchors followed by the CodeSystem id on the
+    same line. Numeric <td> cells give best-guess anchors when none are found.
+
+    Args:
+        html: Content of the CodeSystem-<id>.html page
+        codesystem_id: Id of the CodeSystem
+
+    Returns:
+        Dictionary mapping codes to their anchor names
+    """
+    lower_id = codesystem_id.lower()
+    id_re = re.compile(re.escape(codesystem_id), re.IGNORECASE)
+    prefixed: List[str] = []
+    numeric: List[str] = []
+    rows: List[str] = []
+    named: List[str] = []
+    cells: List[str] = []
+    # position of the next CodeSystem id after searched_from, for the <a name> anchors
+    searched_from, next_id_at = -1, -1
+
+    for token in _ANCHOR_TOKEN_RE.finditer(html):
+        tag = token.group(1) or ''
+        if token.group(2) is not None:
+            ids = [token.group(2)]  # id="..." outside a tag
+        else:
+            ids = _ID_ATTR_RE.findall(html, token.start(), token.end())
+        for value in ids:
+            if value[:len(lower_id) + 1].lower() == lower_id + '-' and len(value) > len(lower_id) + 1:
+                prefixed.append(value)
+            if _NUMERIC_ID_RE.search(value):
+                numeric.append(value)
+
+        lower_tag = tag.lower()
+        if lower_tag.startswith('tr'):
+            row_ids = [value for value in ids if lower_id in value.lower()]
+            if row_ids:
+                rows.append(row_ids[-1])
+        elif lower_tag.startswith('a'):
+            names = _NAME_ATTR_RE.findall(html, token.start(), token.end())
+            if names:
+                end = token.end()
+                if not searched_from <= end <= next_id_at:
+                    found = id_re.search(html, end)
+                    searched_from, next_id_at = end, found.start() if found else len(html)
+                if next_id_at < len(html) and html.find('\n', end, next_id_at) == -1:
+                    named.append(names[-1])
+        elif tag.startswith('td'):
+            cell = _TD_CODE_RE.match(html, token.end())
+            if cell:
+                cells.append(cell.group(1))
+
+    anchor_map = {}
+    for match in prefixed + numeric + rows + named:
+        # Extract potential code from the match
+        if codesystem_id in match:
+            # Split by the codesystem ID and take the part after it
+            parts = match.split(codesystem_id, 1)
+            if len(parts) > 1 and parts[1]:
+                code_part = parts[1].lstrip('-_.')
+                if code_part:
+                    anchor_map[code_part] = match
+        else:
+            # For anchors that don't include the codesystem ID, try to extract numeric codes
+            code_match = _NUMERIC_CODE_RE.search(match)
+            if code_match:
+                anchor_map[code_match.group()] = match
+
+    # If we still don't have anchors, create best-guess anchors for the code cells
+    if not anchor_map:
+        for code in cells:
+            anchor_map[code] = f"{codesystem_id}-{code}"
+    return anchor_map
+
+
+class CodeSystemAnchorIndex:
+    """
+    Code -> anchor maps of the CodeSystem pages, each page parsed once per run.
+
+    Many ValueSet schemas draw their codes from the same, often large, CodeSystem.
+    The maps are kept in memory for the run and, if a cache file is given, saved
+    under the hash of the page so an unchanged page is not parsed on the next run.
+
+    Attributes:
+        output_dir: Directory of the CodeSystem pages
+        cache_path: JSON file the maps are persisted in, or None
+        anchors: CodeSystem id -> code -> anchor name
+        cached: Page hash -> {'codesystem', 'anchors'} loaded from cache_path
+        used: Page hash -> {'codesystem', 'anchors'} of the pages of this run
+    """
+
+    def __init__(self, output_dir: str, cache_path: Optional[str] = None):
+        self.output_dir = output_dir
+        self.cache_path = cache_path
+        self.anchors: Dict[str, Dict[str, str]] = {}
+        self.cached: Dict[str, Dict[str, Any]] = {}
+        self.used: Dict[str, Dict[str, Any]] = {}
+        if cache_path:
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('version') == ANCHOR_CACHE_VERSION:
+                    self.cached = cache.get('pages', {})
+            except (OSError, ValueError, AttributeError):
+                self.cached = {}
+
+    def get(self, codesystem_id: str) -> Dict[str, str]:
+        """Return the code -> anchor map of CodeSystem-<codesystem_id>.html (empty if there is no page)."""
+        if codesystem_id not in self.anchors:
+            anchor_map = {}
+            html_filename = f"CodeSystem-{codesystem_id}.html"
+            if get_output_index(self.output_dir).exists(html_filename):
+                with open(os.path.join(self.output_dir, html_filename), 'r', encoding='utf-8') as f:
+                    html_content = f.read()
+                page_hash = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+                entry = self.cached.get(page_hash)
+                if isinstance(entry, dict) and entry.get('codesystem') == codesystem_id:
+                    anchor_map = entry.get('anchors', {})
+                else:
+                    anchor_map = parse_codesystem_anchors(html_content, codesystem_id)
+                self.used[page_hash] = {'codesystem': codesystem_id, 'anchors': anchor_map}
+            self.anchors[codesystem_id] = anchor_map
+        return self.anchors[codesystem_id]
+
+    def save(self) -> bool:
+        """Write the maps of this run's pages to cache_path, if one is set."""
+        if not self.cache_path or self.used == self.cached:
+            return True
+        try:
+            Path(self.cache_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': ANCHOR_CACHE_VERSION, 'pages': self.used}, f,
+                          separators=(',', ':'), sort_keys=True)
+            return True
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Could not save CodeSystem anchor cache {self.cache_path}: {e}")
+            return False
+
+
+# output directory -> CodeSystemAnchorIndex, created on first use (see get_anchor_index)
+anchor_indexes: Dict[str, CodeSystemAnchorIndex] = {}
+
+
+def get_anchor_index(output_dir: str, cache_path: Optional[str] = None) -> CodeSystemAnchorIndex:
+    """Return the CodeSystem anchor index of an output directory, creating it on first use."""
+    key = os.path.abspath(output_dir)
+    if key not in anchor_indexes:
+        anchor_indexes[key] = CodeSystemAnchorIndex(output_dir, cache_path)
+    return anchor_indexes[key]
+
+
+# (name, transform) of an edit of a page; transform takes (filename, html) and returns the new html
+PageTransform = Tuple[str, Callable[[str, str], str]]
+
+
+def apply_transforms(filename: str, html: str, transforms: List[PageTransform],
+                     counts: Dict[str, int], warnings: List[str]) -> str:
+    """
+    Apply page transforms in order, counting per transform name the pages it
+    changed. A transform that fails is skipped with a warning.
+    """
+    for name, transform in transforms:
+        try:
+            new_html = transform(filename, html)
+        except Exception as e:
+            message = f'Could not apply {name} to {filename}: {e}'
+            logging.getLogger(__name__).warning(message)
+            warnings.append(message)
+            continue
+        if new_html != html:
+            counts[name] = counts.get(name, 0) + 1
+            html = new_html
+    return html
+
+
+def rewrite_page(output_dir: str, filename: str, html: Optional[str], changed: bool,
+                 transforms: List[PageTransform]) -> Tuple[bool, Dict[str, int], List[str]]:
+    """
+    Apply transforms to one page and write it if it changed.
+
+    Args:
+        output_dir: Directory of the page
+        filename: Page file name
+        html: Page content if already in memory, None to read it from disk
+        changed: Whether the in-memory content differs from the file
+        transforms: Edits to apply
+
+    Returns:
+        Tuple of whether the page was written, the pages changed per transform
+        name and the warnings
+    """
+    counts: Dict[str, int] = {}
+    warnings: List[str] = []
+    page_path = os.path.join(output_dir, filename)
+    try:
+        if html is None:
+            with open(page_path, 'r', encoding='utf-8', errors='replace') as f:
+                html = f.read()
+        new_html = apply_transforms(filename, html, transforms, counts, warnings)
+        if new_html != html or changed:
+            with open(page_path, 'w', encoding='utf-8') as f:
+                f.write(new_html)
+            return True, counts, warnings
+    except Exception as e:
+        message = f'Could not rewrite {filename}: {e}'
+        logging.getLogger(__name__).warning(message)
+        warnings.append(message)
+    return False, counts, warnings
+
+
+# transforms for all pages of a worker process, set by init_rewrite_worker
+worker_transforms: List[PageTransform] = []
+
+
+def init_rewrite_worker(transforms: List[PageTransform]) -> None:
+    setup_logging()
+    worker_transforms[:] = transforms
+
+
+def rewrite_page_in_worker(task: Tuple[str, str, Optional[str], bool, List[PageTransform], List[int]]
+                           ) -> Tuple[bool, Dict[str, int], List[str]]:
+    output_dir, filename, html, changed, page_transforms, transform_indexes = task
+    transforms = page_transforms + [worker_transforms[i] for i in transform_indexes]
+    return rewrite_page(output_dir, filename, html, changed, transforms)
+
+
+class HTMLRewritePipeline:
+    """
+    Edits the HTML pages of the output directory, reading and writing each
+    page at most once.
+
+    The post-processing phases (API content and tab injection into a resource
+    page, tab injection into its sibling pages, dynamic source loading) all
+    edit the same pages. Instead of each phase reading and writing the files,
+    they register their edits here:
+
+    - read() and write() for edits that need the page content right away;
+      the page is read once and kept in memory until run()
+    - add_page_transform() for edits of one page that can wait until run()
+    - add_transform() for edits of every HTML page matching a file name test
+
+    run() then takes each page once, applies its edits in the order they were
+    registered, followed by the transforms for all pages, and writes the page
+    only if it changed. Pages are independent of each other, so with jobs > 1
+    run() spreads them over a pool of worker processes; the transforms must
+    then be picklable (module functions or functools.partial of methods).
+
+    Attributes:
+        jobs: Number of worker processes used by run()
+        counts: Transform name -> number of pages it changed
+        warnings: Warnings of the transforms and page rewrites
+    """
+
+    def __init__(self, output_dir: str, logger: logging.Logger):
+        self.output_dir = output_dir
+        self.logger = logger
+        self.jobs = 1
+        self.pages: Dict[str, str] = {}
+        self.changed = set()
+        self.page_transforms: Dict[str, List[PageTransform]] = {}
+        self.transforms: List[Tuple[str, Callable[[str, str], str], Callable[[str], bool]]] = []
+        self.counts: Dict[str, int] = {}
+        self.warnings: List[str] = []
+
+    def apply(self, filename: str, html: str, transforms: List[PageTransform]) -> str:
+        return apply_transforms(filename, html, transforms, self.counts, self.warnings)
+
+    def read(self, filename: str) -> str:
+        """Return the current content of a page, reading it from disk on first use."""
+        if filename not in self.pages:
+            with open(os.path.join(self.output_dir, filename), 'r', encoding='utf-8', errors='replace') as f:
+                self.pages[filename] = f.read()
+            pending = self.page_transforms.pop(filename, [])
+            if pending:
+                self.write(filename, self.apply(filename, self.pages[filename], pending))
+        return self.pages[filename]
+
+    def write(self, filename: str, html: str) -> None:
+        """Set the content of a page, which may be a new one; it is written by run()."""
+        if self.pages.get(filename) != html:
+            self.pages[filename] = html
+            self.changed.add(filename)
+        get_output_index(self.output_dir).add(filename)
+
+    def add_page_transform(self, filename: str, name: str, transform: Callable[[str, str], str]) -> None:
+        """Register an edit of one page."""
+        if filename in self.pages:
+            self.write(filename, self.apply(filename, self.pages[filename], [(name, transform)]))
+        else:
+            self.page_transforms.setdefault(filename, []).append((name, transform))
+
+    def add_transform(self, name: str, transform: Callable[[str, str], str],
+                      applies_to: Callable[[str], bool]) -> None:
+        """Register an edit of every HTML page whose file name passes applies_to."""
+        self.transforms.append((name, transform, applies_to))
+
+    def iter_tasks(self) -> Iterator[Tuple[str, str, Optional[str], bool, List[PageTransform], List[int]]]:
+        filenames = set(self.pages) | set(self.page_transforms)
+        filenames.update(get_output_index(self.output_dir).with_suffix('.html'))
+        for filename in sorted(filenames):
+            transform_indexes = [i for i, (_, _, applies_to) in enumerate(self.transforms) if applies_to(filename)]
+            if filename in self.pages or filename in self.page_transforms or transform_indexes:
+                yield (self.output_dir, filename, self.pages.pop(filename, None), filename in self.changed,
+                       self.page_transforms.pop(filename, []), transform_indexes)
+
+    def run(self) -> int:
+        """
+        Apply all registered edits and write the changed pages.
+
+        Returns:
+            Number of pages written
+        """
+        transforms = [(name, transform) for name, transform, _ in self.transforms]
+        tasks = self.iter_tasks()
+        if self.jobs > 1:
+            pool = multiprocessing.get_context("spawn").Pool(
+                self.jobs, initializer=init_rewrite_worker, initargs=(transforms,))
+            results = pool.imap(rewrite_page_in_worker, tasks, chunksize=16)
+        else:
+            pool = None
+            results = (rewrite_page(output_dir, filename, html, changed,
+                                    page_transforms + [transforms[i] for i in transform_indexes])
+                       for output_dir, filename, html, changed, page_transforms, transform_indexes in tasks)
+        written = 0
+        try:
+            for page_written, counts, warnings in results:
+                written += page_written
+                for name, count in counts.items():
+                    self.counts[name] = self.counts.get(name, 0) + count
+                self.warnings.extend(warnings)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.changed = set()
+        self.transforms = []
+        return written
+
+
+# output directory -> HTMLRewritePipeline, created on first use (see get_rewrite_pipeline)
+rewrite_pipelines: Dict[str, HTMLRewritePipeline] = {}
+
+
+def get_rewrite_pipeline(output_dir: str) -> HTMLRewritePipeline:
+    """Return the HTML rewrite pipeline of an output directory."""
+    key = os.path.abspath(output_dir)
+    if key not in rewrite_pipelines:
+        rewrite_pipelines[key] = HTMLRewritePipeline(output_dir, logging.getLogger(__name__))
+    return rewrite_pipelines[key]
+
+
 class SchemaDetector:
     """Detects and categorizes schema files in the output directory."""
     
@@ -246,33 +748,36 @@ class SchemaDetector:
             return schemas
         
         self.logger.info(f"Scanning directory for schema files: {output_dir}")
-        all_files = os.listdir(output_dir)
-        schema_count = 0
+        output_index = get_output_index(output_dir)
+        schema_files = output_index.with_suffix('.schema.json')
+        schema_count = len(schema_files)
         
-        for file in all_files:
-            if file.endswith('.schema.json'):
-                schema_count += 1
-                file_path = os.path.join(output_dir, file)
-                self.logger.info(f"Found schema file: {file}")
-                
-                if file.startswith('ValueSet-'):
-                    schemas['valueset'].append(file_path)
-                    self.logger.info(f"  -> Categorized as ValueSet schema")
-                elif file in ['ValueSets.schema.json', 'LogicalModels.schema.json']:
-                    # These are enumeration schemas, categorize appropriately
-                    if file == 'ValueSets.schema.json':
-                        schemas['valueset'].append(file_path) 
-                        self.logger.info(f"  -> Categorized as ValueSet enumeration schema")
-                    else:
-                        schemas['logical_model'].append(file_path)
-                        self.logger.info(f"  -> Categorized as Logical Model enumeration schema")
-                elif not file.startswith('ValueSet-') and not file.startswith('CodeSystem-'):
-                    # Assume logical model if not ValueSet or CodeSystem
-                    schemas['logical_model'].append(file_path)
-                    self.logger.info(f"  -> Categorized as Logical Model schema")
+        for file in output_index.of_resource_type('ValueSet', '.schema.json'):
+            self.logger.info(f"Found schema file: {file}")
+            schemas['valueset'].append(os.path.join(output_dir, file))
+            self.logger.info(f"  -> Categorized as ValueSet schema")
+        
+        for file in schema_files:
+            if file.startswith('ValueSet-'):
+                continue
+            file_path = os.path.join(output_dir, file)
+            self.logger.info(f"Found schema file: {file}")
+            
+            if file in ['ValueSets.schema.json', 'LogicalModels.schema.json']:
+                # These are enumeration schemas, categorize appropriately
+                if file == 'ValueSets.schema.json':
+                    schemas['valueset'].append(file_path) 
+                    self.logger.info(f"  -> Categorized as ValueSet enumeration schema")
                 else:
-                    schemas['other'].append(file_path)
-                    self.logger.info(f"  -> Categorized as other schema")
+                    schemas['logical_model'].append(file_path)
+                    self.logger.info(f"  -> Categorized as Logical Model enumeration schema")
+            elif not file.startswith('CodeSystem-'):
+                # Assume logical model if not ValueSet or CodeSystem
+                schemas['logical_model'].append(file_path)
+                self.logger.info(f"  -> Categorized as Logical Model schema")
+            else:
+                schemas['other'].append(file_path)
+                self.logger.info(f"  -> Categorized as other schema")
         
         self.logger.info(f"Schema detection summary:")
         self.logger.info(f"  Total schema files found: {schema_count}")
@@ -282,7 +787,7 @@ class SchemaDetector:
         
         if schema_count == 0:
             self.logger.warning(f"No .schema.json files found in {output_dir}")
-            self.logger.info(f"Directory contents: {', '.join(all_files)}")
+            self.logger.info(f"Directory contents: {', '.join(output_index.sorted_names)}")
         
         return schemas
     
@@ -300,20 +805,13 @@ class SchemaDetector:
             return jsonld_files
         
         self.logger.info(f"Scanning directory for JSON-LD files: {output_dir}")
-        all_files = os.listdir(output_dir)
-        jsonld_count = 0
+        output_index = get_output_index(output_dir)
+        jsonld_count = len(output_index.with_suffix('.jsonld'))
         
-        for file in all_files:
-            if file.endswith('.jsonld'):
-                jsonld_count += 1
-                file_path = os.path.join(output_dir, file)
-                self.logger.info(f"Found JSON-LD file: {file}")
-                
-                if file.startswith('ValueSet-'):
-                    jsonld_files.append(file_path)
-                    self.logger.info(f"  -> Added ValueSet JSON-LD vocabulary")
-                else:
-                    self.logger.info(f"  -> Skipped non-ValueSet JSON-LD file")
+        for file in output_index.of_resource_type('ValueSet', '.jsonld'):
+            self.logger.info(f"Found JSON-LD file: {file}")
+            jsonld_files.append(os.path.join(output_dir, file))
+            self.logger.info(f"  -> Added ValueSet JSON-LD vocabulary")
         
         self.logger.info(f"JSON-LD detection summary:")
         self.logger.info(f"  Total JSON-LD files found: {jsonld_count}")
@@ -533,6 +1031,7 @@ class OpenAPIWrapper:
             
             with open(wrapper_path, 'w', encoding='utf-8') as f:
                 json.dump(openapi_spec, f, indent=2, ensure_ascii=False)
+            record_output_file(wrapper_path)
             
             self.logger.info(f"Created OpenAPI wrapper: {wrapper_path}")
             return wrapper_path
@@ -620,6 +1119,7 @@ class OpenAPIWrapper:
             
             with open(wrapper_path, 'w', encoding='utf-8') as f:
                 json.dump(openapi_spec, f, indent=2, ensure_ascii=False)
+            record_output_file(wrapper_path)
             
             self.logger.info(f"Created enumeration OpenAPI wrapper: {wrapper_path}")
             return wrapper_path
@@ -797,54 +1297,8 @@ class SchemaDocumentationRenderer:
             # Extract CodeSystem ID from URL
             if '/CodeSystem/' in codesystem_url:
                 codesystem_id = codesystem_url.split('/CodeSystem/')[-1]
-                html_filename = f"CodeSystem-{codesystem_id}.html"
-                html_path = os.path.join(output_dir, html_filename)
-                
-                if os.path.exists(html_path):
-                    with open(html_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    
-                    # Look for anchor patterns in code definition tables
-                    # Pattern 1: id="CodeSystem-ID-code" (simple case)
-                    # Pattern 2: id="ID-code" (common IG Publisher pattern)
-                    # Pattern 3: code-specific patterns based on the actual HTML structure
-                    import re
-                    
-                    # Try different anchor patterns that might be used by IG Publisher
-                    patterns = [
-                        rf'id="({codesystem_id}-[^"]+)"',  # CodeSystem-ID-code
-                        rf'id="([^"]*-[0-9.]+[^"]*)"',     # Any ID with numeric codes
-                        rf'<tr[^>]*id="([^"]*{codesystem_id}[^"]*)"',  # Table rows with CodeSystem ID
-                        rf'<a[^>]*name="([^"]*)"[^>]*>.*?{re.escape(codesystem_id)}'  # Named anchors
-                    ]
-                    
-                    for pattern in patterns:
-                        matches = re.findall(pattern, html_content, re.IGNORECASE)
-                        for match in matches:
-                            # Extract potential code from the match
-                            if codesystem_id in match:
-                                # Split by the codesystem ID and take the part after it
-                                parts = match.split(codesystem_id, 1)
-                                if len(parts) > 1 and parts[1]:
-                                    code_part = parts[1].lstrip('-_.')
-                                    if code_part:
-                                        anchor_map[code_part] = match
-                            else:
-                                # For patterns that don't include the codesystem ID
-                                # Try to extract numeric codes
-                                code_match = re.search(r'[0-9]+(?:\.[0-9]+)*', match)
-                                if code_match:
-                                    code = code_match.group()
-                                    anchor_map[code] = match
-                    
-                    # If we still don't have anchors, try a more generic approach
-                    if not anchor_map:
-                        # Look for any table cells or elements that might contain codes
-                        td_pattern = r'<td[^>]*>([0-9]+(?:\.[0-9]+)*)</td>'
-                        code_matches = re.findall(td_pattern, html_content)
-                        for code in code_matches:
-                            # Create a best-guess anchor
-                            anchor_map[code] = f"{codesystem_id}-{code}"
+                # Each CodeSystem page is parsed once per run, however many ValueSets use it
+                anchor_map = get_anchor_index(output_dir).get(codesystem_id)
                 
                 self.logger.info(f"Found {len(anchor_map)} anchor mappings for CodeSystem {codesystem_id}")
                 if anchor_map:
@@ -926,7 +1380,7 @@ class SchemaDocumentationRenderer:
                             system_filename = f"{spec_name}.system.json"
                             system_path = os.path.join(output_dir, system_filename)
                             
-                            if os.path.exists(system_path):
+                            if get_output_index(output_dir).exists(system_filename):
                                 with open(system_path, 'r', encoding='utf-8') as f:
                                     system_data = json.load(f)
                                 
@@ -1293,7 +1747,9 @@ class SchemaDocumentationRenderer:
 
         The main content page (``{spec_name}.html``) and the generated view
         pages are excluded — the former is handled by the caller and the latter
-        are the destinations of the new tabs.
+        are the destinations of the new tabs.  The tabs are added through the
+        HTML rewrite pipeline, so each sibling page is rewritten once by
+        ``HTMLRewritePipeline.run()`` together with the other edits of the page.
 
         Args:
             spec_name:        Resource name (e.g. ``StructureDefinition-DAK``)
@@ -1304,7 +1760,7 @@ class SchemaDocumentationRenderer:
                               (e.g. JSON-LD vocabulary tabs).
 
         Returns:
-            Number of sibling pages updated.
+            Number of sibling pages the tabs are added to.
         """
         if extra_tabs is None:
             extra_tabs = []
@@ -1316,54 +1772,48 @@ class SchemaDocumentationRenderer:
         count = 0
 
         try:
-            html_files = [f for f in os.listdir(output_dir) if f.endswith('.html')]
+            # Only process pages that belong to this spec (same name prefix)
+            html_files = get_output_index(output_dir).spec_files(spec_name, '.html')
         except OSError as e:
             self.logger.warning(f'Cannot list {output_dir} for sibling injection: {e}')
             return 0
 
+        add_tabs = functools.partial(self._add_tabs_to_sibling_page, schema_filename, spec_name, extra_tabs)
+        pipeline = get_rewrite_pipeline(output_dir)
         for html_file in html_files:
-            # Only process pages that belong to this spec (same name prefix)
-            if not (html_file.startswith(f'{spec_name}-')
-                    or html_file.startswith(f'{spec_name}.')):
-                continue
             # Skip the main content page and all generated view pages
             if html_file in excluded_pages:
                 continue
+            pipeline.add_page_transform(html_file, 'sibling page tabs', add_tabs)
+            count += 1
 
-            html_path = os.path.join(output_dir, html_file)
-            try:
-                with open(html_path, 'r', encoding='utf-8', errors='replace') as f:
-                    original_content = f.read()
-                html_content = original_content
+        return count
 
-                updated = self._inject_schema_as_new_tab(
-                    html_content, schema_filename, spec_name
-                )
-                if updated is not None:
-                    html_content = updated
-
-                # Inject any extra tabs (e.g. JSON-LD)
-                for res_filename, tab_lbl, page_fn in extra_tabs:
-                    upd = self._inject_schema_as_new_tab(
-                        html_content, res_filename, spec_name,
-                        tab_label=tab_lbl, page_filename=page_fn
-                    )
-                    if upd is not None:
-                        html_content = upd
+    def _add_tabs_to_sibling_page(self, schema_filename: str, spec_name: str, extra_tabs: list,
+                                  html_file: str, original_content: str) -> str:
+        """Page transform of _inject_schema_tab_into_sibling_pages for one sibling page."""
+        html_content = original_content
 
-                if html_content != original_content:
-                    with open(html_path, 'w', encoding='utf-8') as f:
-                        f.write(html_content)
-                    count += 1
-                    self.logger.info(
-                        f'Added tabs to sibling page: {html_file}'
-                    )
-            except Exception as e:
-                self.logger.warning(
-                    f'Could not inject schema tab into {html_file}: {e}'
-                )
+        updated = self._inject_schema_as_new_tab(
+            html_content, schema_filename, spec_name
+        )
+        if updated is not None:
+            html_content = updated
+
+        # Inject any extra tabs (e.g. JSON-LD)
+        for res_filename, tab_lbl, page_fn in extra_tabs:
+            upd = self._inject_schema_as_new_tab(
+                html_content, res_filename, spec_name,
+                tab_label=tab_lbl, page_filename=page_fn
+            )
+            if upd is not None:
+                html_content = upd
 
-        return count
+        if html_content != original_content:
+            self.logger.info(
+                f'Added tabs to sibling page: {html_file}'
+            )
+        return html_content
 
     def _generate_schema_view_page(self, html_content: str, schema_filename: str,
                                     spec_name: str, output_dir: str,
@@ -1548,8 +1998,7 @@ class SchemaDocumentationRenderer:
 
             full_page = header_html + '\n\n' + schema_body + '\n\n' + footer_html
 
-            with open(schema_page_path, 'w', encoding='utf-8') as f:
-                f.write(full_page)
+            get_rewrite_pipeline(output_dir).write(schema_page, full_page)
 
             self.logger.info(f'Generated {tab_label} view page: {schema_page_path}')
             return schema_page
@@ -1748,13 +2197,14 @@ class SchemaDocumentationRenderer:
             html_filename = f"{spec_name}.html"
             html_path = os.path.join(output_dir, html_filename)
             
-            if not os.path.exists(html_path):
+            output_index = get_output_index(output_dir)
+            if not output_index.exists(html_filename):
                 self.logger.warning(f"HTML file not found: {html_path}. IG publisher may not have processed the placeholder.")
                 return None
             
             # Read the existing HTML file
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
+            pipeline = get_rewrite_pipeline(output_dir)
+            html_content = pipeline.read(html_filename)
             
             # Check for the placeholder marker
             placeholder_marker = f'<!-- DAK_API_PLACEHOLDER: {spec_name} -->'
@@ -1798,8 +2248,7 @@ class SchemaDocumentationRenderer:
                     self.logger.warning(
                         f'Tab injection failed for {spec_name}; no schema tab added'
                     )
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
+                pipeline.write(html_filename, html_content)
                 return html_filename
 
             # Strip any pre-existing dak-api-content block (from a previous CI
@@ -1840,7 +2289,7 @@ class SchemaDocumentationRenderer:
                 extra_tabs = []
 
                 # ── JSON Schema tab ──────────────────────────────────────────
-                if os.path.exists(schema_path_check):
+                if output_index.exists(schema_file):
                     schema_page = f'{spec_name}.schema.json.html'
                     updated = self._inject_schema_as_new_tab(
                         html_content, schema_file, spec_name,
@@ -1865,7 +2314,7 @@ class SchemaDocumentationRenderer:
                     )
 
                 # ── JSON-LD tab ──────────────────────────────────────────────
-                if os.path.exists(jsonld_path_check):
+                if output_index.exists(jsonld_file):
                     jsonld_page = f'{spec_name}.jsonld.html'
                     updated = self._inject_schema_as_new_tab(
                         html_content, jsonld_file, spec_name,
@@ -1895,9 +2344,8 @@ class SchemaDocumentationRenderer:
                         spec_name, schema_file, output_dir, extra_tabs=extra_tabs
                     )
 
-            # Write the updated HTML file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            # Store the updated HTML, written by the rewrite pipeline
+            pipeline.write(html_filename, html_content)
             
             self.logger.info(f"Injected OpenAPI content into HTML file: {html_path}")
             return html_filename
@@ -1999,10 +2447,9 @@ class SchemaDocumentationRenderer:
         
         return html_content
 
-    def _replace_lang_source(self, html: str, lang: str, label: str, src_file: str,
-                             allow_classless: bool = False) -> str:
+    def _replace_static_sources(self, html: str, formats: List[Tuple[str, str, str, bool]]) -> str:
         """
-        Replace one language's static pre-formatted source block with a dynamic loader.
+        Replace the static pre-formatted source blocks of a page with dynamic loaders.
 
         The FHIR IG Publisher embeds full source code in ``<pre class="LANG">`` blocks
         at publication time (and sometimes in ``<pre><code>`` blocks without a class on
@@ -2010,159 +2457,204 @@ class SchemaDocumentationRenderer:
         plus a ``<script>`` that fetches the raw source file on-demand and applies
         Prism.js syntax highlighting.
 
-        For CQL (Library resource pages), ``Raw CQL | Download CQL`` links are prepended
-        to each replaced block because the IG Publisher does not generate these links for
-        CQL the way it does for JSON / XML.  Prism.js does not ship a CQL grammar, so the
-        content is displayed as plain pre-formatted text (the fetch and display still work
-        correctly; only syntax colouring is absent).
+        All formats are handled in one left-to-right pass over the page with
+        precompiled patterns: each ``<pre>`` tag is given to the first format (in
+        the order of ``formats``) it belongs to, which is what replacing one
+        format after the other would do, without scanning multi-MB pages once
+        per format.
+
+        For CQL (Library resource pages), the IG Publisher renders the source as
+        ``<pre><code class="language-cql">`` (no class on the outer ``<pre>``); such
+        tags are normalised to ``<pre class="cql">``.  ``Raw CQL | Download CQL`` links
+        are prepended to each replaced block because the IG Publisher does not generate
+        these links for CQL the way it does for JSON / XML.  Prism.js does not ship a
+        CQL grammar, so the content is displayed as plain pre-formatted text (the fetch
+        and display still work correctly; only syntax colouring is absent).
 
         Args:
             html: Full HTML content of the page
-            lang: Source language / class name ('json', 'xml', 'rdf', 'cql').
-                  TTL pages use 'rdf' because the FHIR IG Publisher emits
-                  ``<pre class="rdf">`` for Turtle content.
-            label: Human-readable label ('JSON', 'XML', 'TTL', 'CQL')
-            src_file: Relative URL of the raw source file to fetch (same directory)
-            allow_classless: When True, also replace ``<pre>`` blocks that have no
-                ``class`` attribute (used for format-specific pages where the language
-                is known from the page name, e.g. ``StructureDefinition-DAK.profile.xml.html``).
+            formats: (lang, label, src_file, allow_classless) of every format whose
+                source file exists, where
+                lang is the source language / class name ('json', 'xml', 'rdf', 'cql');
+                TTL pages use 'rdf' because the FHIR IG Publisher emits
+                ``<pre class="rdf">`` for Turtle content,
+                label is the human-readable label ('JSON', 'XML', 'TTL', 'CQL'),
+                src_file is the relative URL of the raw source file to fetch, and
+                allow_classless also replaces ``<pre>`` blocks that have no ``class``
+                attribute (used for format-specific pages where the language is known
+                from the page name, e.g. ``StructureDefinition-DAK.profile.xml.html``).
 
         Returns:
             Updated HTML string
         """
-        # Match <pre> opening tags whose class contains the language word.
-        # <pre> cannot be nested in HTML, so the first </pre> after each opening
-        # tag is always its matching close.
-        pre_open_re = re.compile(
-            r'<pre\b([^>]*?\bclass="[^"]*?\b' + re.escape(lang) + r'\b[^"]*?"[^>]*)>',
-            re.IGNORECASE
-        )
-        # For format-specific pages (allow_classless=True), also match <pre> tags that
-        # have no class attribute at all (the FHIR IG Publisher sometimes omits the class
-        # on per-format view pages like StructureDefinition-Foo.profile.xml.html).
-        classless_pre_re = re.compile(
-            r'<pre\b(?![^>]*\bclass=)[^>]*>',
-            re.IGNORECASE
-        ) if allow_classless else None
-        close_tag = '</pre>'
-        close_tag_lower = close_tag.lower()
+        if not formats:
+            return html
+        normalize_cql = any(lang == 'cql' for lang, _, _, _ in formats)
+        occurrences = {lang: 0 for lang, _, _, _ in formats}
 
         parts: List[str] = []
         pos = 0
-        occurrence = 0
-
-        while pos < len(html):
-            m = pre_open_re.search(html, pos)
-            # Also check the classless pattern when enabled; use whichever match comes first.
-            if classless_pre_re:
-                m2 = classless_pre_re.search(html, pos)
-                if m2 and (m is None or m2.start() < m.start()):
-                    m = m2
+        scan = 0
+
+        while True:
+            m = _PRE_OPEN_RE.search(html, scan)
             if not m:
                 break
-
             body_start = m.end()
-            close_pos = html.lower().find(close_tag_lower, body_start)
-            if close_pos < 0:
-                break  # malformed HTML; stop processing
+            # A classless <pre><code class="language-cql"> becomes <pre class="cql">,
+            # as seen by the CQL format and the ones after it, and in the output
+            # unless the block is replaced by an earlier format
+            tag = m.group()
+            if normalize_cql and _CQL_CODE_RE.match(html, body_start):
+                tag = '<pre class="cql">' if not _CLASS_ATTR_RE.search(tag) else '<pre' + tag[4:]
+
+            # The first format the tag belongs to, as in one pass per format
+            fmt = None
+            candidate_tag = m.group()
+            for candidate in formats:
+                if candidate[0] == 'cql':
+                    candidate_tag = tag
+                if (_pre_class_re(candidate[0]).search(candidate_tag)
+                        or (candidate[3] and not _CLASS_ATTR_RE.search(candidate_tag))):
+                    fmt = candidate
+                    break
+            if fmt is None:
+                if tag != m.group():
+                    parts.append(html[pos:m.start()])
+                    parts.append(tag)
+                    pos = body_start
+                scan = body_start
+                continue
 
-            pre_content = html[body_start:close_pos]
+            # <pre> cannot be nested in HTML, so the first </pre> after each opening
+            # tag is always its matching close.
+            close = _PRE_CLOSE_RE.search(html, body_start)
+            if not close:
+                break  # malformed HTML; stop processing
 
             # Replace blocks that contain substantial source content, either:
             #   a) wrapped in a <code> element (JSON / XML pages), or
             #   b) embedded directly in the <pre> block (TTL/RDF pages — the FHIR IG
             #      Publisher emits <pre class="rdf">…</pre> without a <code> wrapper).
-            code_match = re.search(r'<code([^>]*)>([\s\S]*?)</code>', pre_content, re.IGNORECASE)
-            source_content = code_match.group(2) if code_match else pre_content
-            if len(source_content.strip()) < _MIN_SOURCE_SIZE_FOR_DYNAMIC_LOADING:
-                # Keep this block unchanged; preserve everything from pos through </pre>
-                parts.append(html[pos:close_pos + len(close_tag)])
-                pos = close_pos + len(close_tag)
+            code_match = _CODE_RE.search(html, body_start, close.start())
+            if code_match:
+                source_start, source_end = code_match.span(2)
+            else:
+                source_start, source_end = body_start, close.start()
+            if not _has_min_source_size(html, source_start, source_end):
+                # Keep this block unchanged (apart from the CQL normalisation)
+                parts.append(html[pos:m.start()])
+                parts.append(tag)
+                parts.append(html[body_start:close.end()])
+                pos = scan = close.end()
                 continue
 
             # Everything before this <pre>
             parts.append(html[pos:m.start()])
+            lang, label, src_file, _ = fmt
+            occurrences[lang] += 1
+            parts.append(self._dynamic_loader_html(lang, label, src_file, occurrences[lang]))
+            pos = scan = close.end()
+
+        rest = html[pos:]
+        if normalize_cql and pos < len(html):
+            # Tags after a <pre> without </pre> are still normalised
+            rest = _CQL_PRE_RE.sub(
+                lambda m: ('<pre class="cql">' if not _CLASS_ATTR_RE.search(m.group(1))
+                           else '<pre' + m.group(1) + '>') + m.group(2),
+                rest
+            )
+        parts.append(rest)
+        return ''.join(parts)
+
+    def _dynamic_loader_html(self, lang: str, label: str, src_file: str, occurrence: int) -> str:
+        """
+        Loader element and script that replace one static source block.
 
-            # Build a stable, unique element ID: lang + sanitized filename + occurrence index
-            occurrence += 1
-            safe_name = re.sub(r'[^a-z0-9]', '-', src_file.lower())
-            el_id = 'dyn-{}-{}-{}'.format(lang, safe_name, occurrence)
-
-            # Fetch body differs by format: JSON gets pretty-printed via JSON.stringify.
-            # Content is fetched asynchronously via fetch().then(); once received the raw
-            # text is shown immediately, then Prism.highlight() (synchronous, no Web Worker)
-            # is deferred via setTimeout(fn,0) so it doesn't block the UI.
-            # We avoid Prism.highlightElement() which spawns a Web Worker and throws
-            # "Cannot read properties of undefined (reading 'payload')" on some pages.
-            if lang == 'json':
-                fetch_body = (
-                    'fetch("{f}").then(function(r){{return r.json();}}).then(function(d){{'
-                    'var txt=JSON.stringify(d,null,2);'
-                    'el.textContent=txt;'
-                    'if(window.Prism&&Prism.languages.json)'
-                    '{{setTimeout(function(){{el.innerHTML=Prism.highlight(txt,Prism.languages.json,"json");'
-                    '}},0);}}'
-                    '}})'
-                ).format(f=src_file)
+        Args:
+            lang: Source language / class name ('json', 'xml', 'rdf', 'cql')
+            label: Human-readable label ('JSON', 'XML', 'TTL', 'CQL')
+            src_file: Relative URL of the raw source file to fetch (same directory)
+            occurrence: Number of the block among the replaced blocks of this language
+
+        Returns:
+            HTML of the loader
+        """
+        # Build a stable, unique element ID: lang + sanitized filename + occurrence index
+        safe_name = _NON_ID_CHAR_RE.sub('-', src_file.lower())
+        el_id = 'dyn-{}-{}-{}'.format(lang, safe_name, occurrence)
+
+        # Fetch body differs by format: JSON gets pretty-printed via JSON.stringify.
+        # Content is fetched asynchronously via fetch().then(); once received the raw
+        # text is shown immediately, then Prism.highlight() (synchronous, no Web Worker)
+        # is deferred via setTimeout(fn,0) so it doesn't block the UI.
+        # We avoid Prism.highlightElement() which spawns a Web Worker and throws
+        # "Cannot read properties of undefined (reading 'payload')" on some pages.
+        if lang == 'json':
+            fetch_body = (
+                'fetch("{f}").then(function(r){{return r.json();}}).then(function(d){{'
+                'var txt=JSON.stringify(d,null,2);'
+                'el.textContent=txt;'
+                'if(window.Prism&&Prism.languages.json)'
+                '{{setTimeout(function(){{el.innerHTML=Prism.highlight(txt,Prism.languages.json,"json");'
+                '}},0);}}'
+                '}})'
+            ).format(f=src_file)
+        else:
+            # For XML, fall back to Prism.languages.markup when Prism.languages.xml
+            # is not registered (some Prism.js builds only register the grammar as
+            # 'markup').  For RDF/Turtle pages the FHIR IG Publisher uses class="rdf"
+            # but Prism registers the grammar as 'turtle'; use turtle with rdf fallback.
+            if lang == 'xml':
+                grammar_expr = '(Prism.languages["{l}"]||Prism.languages.markup)'.format(l=lang)
+            elif lang == 'rdf':
+                grammar_expr = '(Prism.languages.turtle||Prism.languages["{l}"])'.format(l=lang)
             else:
-                # For XML, fall back to Prism.languages.markup when Prism.languages.xml
-                # is not registered (some Prism.js builds only register the grammar as
-                # 'markup').  For RDF/Turtle pages the FHIR IG Publisher uses class="rdf"
-                # but Prism registers the grammar as 'turtle'; use turtle with rdf fallback.
-                if lang == 'xml':
-                    grammar_expr = '(Prism.languages["{l}"]||Prism.languages.markup)'.format(l=lang)
-                elif lang == 'rdf':
-                    grammar_expr = '(Prism.languages.turtle||Prism.languages["{l}"])'.format(l=lang)
-                else:
-                    grammar_expr = 'Prism.languages["{l}"]'.format(l=lang)
-                fetch_body = (
-                    'fetch("{f}").then(function(r){{return r.text();}}).then(function(t){{'
-                    'el.textContent=t;'
-                    'var _g={g};'
-                    'if(window.Prism&&_g)'
-                    '{{setTimeout(function(){{el.innerHTML=Prism.highlight(t,_g,"{l}");'
-                    '}},0);}}'
-                    '}})'
-                ).format(f=src_file, l=lang, g=grammar_expr)
-
-            # For CQL, the IG Publisher does not generate raw/download links the way it
-            # does for JSON and XML.  Prepend them here so users can access the raw file.
-            raw_download_prefix = ''
-            if lang == 'cql':
-                raw_download_prefix = (
-                    '<p><a href="' + src_file + '">Raw CQL</a>'
-                    ' | <a href="' + src_file + '" download>Download CQL</a></p>\n'
-                )
+                grammar_expr = 'Prism.languages["{l}"]'.format(l=lang)
+            fetch_body = (
+                'fetch("{f}").then(function(r){{return r.text();}}).then(function(t){{'
+                'el.textContent=t;'
+                'var _g={g};'
+                'if(window.Prism&&_g)'
+                '{{setTimeout(function(){{el.innerHTML=Prism.highlight(t,_g,"{l}");'
+                '}},0);}}'
+                '}})'
+            ).format(f=src_file, l=lang, g=grammar_expr)
+
+        # For CQL, the IG Publisher does not generate raw/download links the way it
+        # does for JSON and XML.  Prepend them here so users can access the raw file.
+        raw_download_prefix = ''
+        if lang == 'cql':
+            raw_download_prefix = (
+                '<p><a href="' + src_file + '">Raw CQL</a>'
+                ' | <a href="' + src_file + '" download>Download CQL</a></p>\n'
+            )
 
-            loader = (
-                raw_download_prefix +
-                '<pre class="{l}"><code id="{id}" class="language-{l}" style="display:block;">'
-                'Loading {label} source&#8230;</code></pre>'
-                '<script>(function(){{'
-                'var el=document.getElementById("{id}");if(!el)return;'
-                'function loadSrc(){{if(el.dataset.loaded)return;el.dataset.loaded="1";'
-                '{fb}'
-                '.catch(function(e){{el.textContent="Could not load {label}: "+e.message;}});'
-                '}}'
-                # Activate on Bootstrap tab-shown event
-                'document.addEventListener("shown.bs.tab",function(e){{'
-                'var h=e.target&&(e.target.getAttribute("href")||e.target.getAttribute("data-bs-target")||"");'
-                'if(h==="#{l}"||h.startsWith("#{l}-"))loadSrc();'
-                '}});'
-                # Load immediately on standalone format pages (no .tab-pane parent),
-                # or if the containing tab-pane is already active on page load.
-                'function checkActive(){{var p=el.closest&&el.closest(".tab-pane");'
-                'if(!p||p.classList.contains("active")||p.classList.contains("show"))loadSrc();}}'
-                'if(document.readyState!=="loading")checkActive();'
-                'else document.addEventListener("DOMContentLoaded",checkActive);'
-                '}})()</script>'
-            ).format(l=lang, id=el_id, label=label, fb=fetch_body)
-
-            parts.append(loader)
-            pos = close_pos + len(close_tag)
-
-        parts.append(html[pos:])
-        return ''.join(parts)
+        loader = (
+            raw_download_prefix +
+            '<pre class="{l}"><code id="{id}" class="language-{l}" style="display:block;">'
+            'Loading {label} source&#8230;</code></pre>'
+            '<script>(function(){{'
+            'var el=document.getElementById("{id}");if(!el)return;'
+            'function loadSrc(){{if(el.dataset.loaded)return;el.dataset.loaded="1";'
+            '{fb}'
+            '.catch(function(e){{el.textContent="Could not load {label}: "+e.message;}});'
+            '}}'
+            # Activate on Bootstrap tab-shown event
+            'document.addEventListener("shown.bs.tab",function(e){{'
+            'var h=e.target&&(e.target.getAttribute("href")||e.target.getAttribute("data-bs-target")||"");'
+            'if(h==="#{l}"||h.startsWith("#{l}-"))loadSrc();'
+            '}});'
+            # Load immediately on standalone format pages (no .tab-pane parent),
+            # or if the containing tab-pane is already active on page load.
+            'function checkActive(){{var p=el.closest&&el.closest(".tab-pane");'
+            'if(!p||p.classList.contains("active")||p.classList.contains("show"))loadSrc();}}'
+            'if(document.readyState!=="loading")checkActive();'
+            'else document.addEventListener("DOMContentLoaded",checkActive);'
+            '}})()</script>'
+        ).format(l=lang, id=el_id, label=label, fb=fetch_body)
+
+        return loader
 
     def replace_static_source_with_dynamic_loading(self, output_dir: str) -> int:
         """
@@ -2183,109 +2675,104 @@ class SchemaDocumentationRenderer:
         replacement and prepends ``Raw CQL | Download CQL`` links (the IG Publisher
         does not generate these links for CQL the way it does for JSON / XML).
 
+        This is the last edit of the pages: it runs the HTML rewrite pipeline,
+        which also writes the edits registered by the earlier phases, on the
+        pipeline's worker processes if its jobs attribute is above 1.
+
         Args:
             output_dir: Directory produced by the FHIR IG Publisher
 
         Returns:
             Number of HTML files modified
         """
-        # Each tuple is (prism_class, label, file_ext).
-        # prism_class: CSS class on <pre> and Prism language name used in the loader JS.
-        # file_ext: actual source file extension (.json / .xml / .ttl / .cql).
-        # Note: the FHIR IG Publisher uses class="rdf" (not "turtle") on TTL <pre> blocks.
-        # This applies to ALL FHIR resource types: StructureDefinitions, CodeSystems,
-        # ValueSets, etc. — not just profiles.
-        FORMATS = [
-            ('json', 'JSON', 'json'),
-            ('xml',  'XML',  'xml'),
-            ('rdf', 'TTL', 'ttl'),   # IG Publisher: <pre class="rdf">, source file *.ttl
-            ('cql', 'CQL', 'cql'),   # Library CQL source; raw/download links are injected
-        ]
-
-        modified = 0
         try:
-            html_files = sorted(f for f in os.listdir(output_dir) if f.endswith('.html'))
+            output_index = get_output_index(output_dir)
+            html_files = output_index.with_suffix('.html')
         except OSError as e:
             self.logger.error(f'Cannot list output dir {output_dir}: {e}')
             return 0
 
-        for html_file in html_files:
-            base_name = html_file[:-5]  # strip .html
-            html_path = os.path.join(output_dir, html_file)
-
-            # The FHIR IG Publisher creates dedicated per-format view pages in two
-            # naming conventions:
-            #   1. StructureDefinitions: "Foo.profile.{ext}.html" → source "Foo.{ext}"
-            #   2. Other resources (CodeSystem, ValueSet, …): "Foo.{ext}.html" → source "Foo.{ext}"
-            # Detect both patterns and remap the source file name accordingly; fall back
-            # to the generic "{base_name}.{ext}" for all other pages (e.g. pages that
-            # embed multiple formats inline).
-            def _src_for_ext(file_ext: str) -> str:
-                profile_suffix = f'.profile.{file_ext}'
-                if base_name.endswith(profile_suffix):
-                    return base_name[:-len(profile_suffix)] + '.' + file_ext
-                plain_suffix = f'.{file_ext}'
-                if base_name.endswith(plain_suffix):
-                    return base_name  # base_name already is "ResourceType-Name.{ext}"
-                return f'{base_name}.{file_ext}'
-
-            src_exists = {
-                file_ext: os.path.exists(os.path.join(output_dir, _src_for_ext(file_ext)))
-                for _, _, file_ext in FORMATS
-            }
-            if not any(src_exists.values()):
-                continue
-
-            try:
-                with open(html_path, 'r', encoding='utf-8', errors='replace') as f:
-                    html = f.read()
-
-                original = html
-                for prism_class, label, file_ext in FORMATS:
-                    if src_exists[file_ext]:
-                        # On format-specific pages (e.g. Foo.profile.xml.html or
-                        # CodeSystem-Foo.xml.html), the FHIR IG Publisher sometimes
-                        # emits <pre><code> blocks without a class attribute. Pass
-                        # allow_classless=True so those are also replaced.
-                        is_format_page = (
-                            base_name.endswith(f'.profile.{file_ext}')
-                            or base_name.endswith(f'.{file_ext}')
-                        )
-                        if prism_class == 'cql':
-                            # The FHIR IG Publisher renders Library CQL content as:
-                            #   <pre><code class="language-cql">...</code></pre>
-                            # rather than <pre class="cql"><code>...</code></pre>.
-                            # Normalise to the latter form so _replace_lang_source can
-                            # detect and replace the block with a dynamic fetch loader.
-                            html = re.sub(
-                                r'<pre\b([^>]*?)>(\s*<code\b[^>]*\bclass="[^"]*\blanguage-cql\b)',
-                                lambda m: (
-                                    '<pre class="cql">'
-                                    if not re.search(r'\bclass=', m.group(1), re.IGNORECASE)
-                                    else '<pre' + m.group(1) + '>'
-                                ) + m.group(2),
-                                html,
-                                flags=re.IGNORECASE,
-                            )
-                        html = self._replace_lang_source(
-                            html, prism_class, label, _src_for_ext(file_ext),
-                            allow_classless=is_format_page
-                        )
-
-                if html != original:
-                    with open(html_path, 'w', encoding='utf-8') as f:
-                        f.write(html)
-                    modified += 1
-                    self.logger.info(f'Dynamic source loading applied to {html_file}')
-
-            except Exception as e:
-                self.logger.warning(f'Could not process {html_file}: {e}')
+        # Run as the last edit of the rewrite pipeline, so pages edited by the
+        # earlier phases are still written only once
+        pipeline = get_rewrite_pipeline(output_dir)
+        modified_before = pipeline.counts.get('dynamic source loading', 0)
+        pipeline.add_transform(
+            'dynamic source loading',
+            functools.partial(self._load_source_dynamically, output_index),
+            functools.partial(self._has_dynamic_source, output_index)
+        )
+        pipeline.run()
+        modified = pipeline.counts.get('dynamic source loading', 0) - modified_before
 
         self.logger.info(
             f'Dynamic source loading: {modified}/{len(html_files)} HTML files modified'
         )
         return modified
 
+    # Each tuple is (prism_class, label, file_ext).
+    # prism_class: CSS class on <pre> and Prism language name used in the loader JS.
+    # file_ext: actual source file extension (.json / .xml / .ttl / .cql).
+    # Note: the FHIR IG Publisher uses class="rdf" (not "turtle") on TTL <pre> blocks.
+    # This applies to ALL FHIR resource types: StructureDefinitions, CodeSystems,
+    # ValueSets, etc. — not just profiles.
+    SOURCE_FORMATS = [
+        ('json', 'JSON', 'json'),
+        ('xml',  'XML',  'xml'),
+        ('rdf', 'TTL', 'ttl'),   # IG Publisher: <pre class="rdf">, source file *.ttl
+        ('cql', 'CQL', 'cql'),   # Library CQL source; raw/download links are injected
+    ]
+
+    @staticmethod
+    def _src_for_ext(base_name: str, file_ext: str) -> str:
+        """
+        Source file shown on a page for one format.
+
+        The FHIR IG Publisher creates dedicated per-format view pages in two
+        naming conventions:
+          1. StructureDefinitions: "Foo.profile.{ext}.html" → source "Foo.{ext}"
+          2. Other resources (CodeSystem, ValueSet, …): "Foo.{ext}.html" → source "Foo.{ext}"
+        Detect both patterns and remap the source file name accordingly; fall back
+        to the generic "{base_name}.{ext}" for all other pages (e.g. pages that
+        embed multiple formats inline).
+        """
+        profile_suffix = f'.profile.{file_ext}'
+        if base_name.endswith(profile_suffix):
+            return base_name[:-len(profile_suffix)] + '.' + file_ext
+        plain_suffix = f'.{file_ext}'
+        if base_name.endswith(plain_suffix):
+            return base_name  # base_name already is "ResourceType-Name.{ext}"
+        return f'{base_name}.{file_ext}'
+
+    def _has_dynamic_source(self, output_index: OutputIndex, html_file: str) -> bool:
+        """Whether any format's source file of the page is in the output directory."""
+        base_name = html_file[:-5]  # strip .html
+        return any(output_index.exists(self._src_for_ext(base_name, file_ext))
+                   for _, _, file_ext in self.SOURCE_FORMATS)
+
+    def _load_source_dynamically(self, output_index: OutputIndex, html_file: str, html: str) -> str:
+        """Page transform of replace_static_source_with_dynamic_loading for one page."""
+        base_name = html_file[:-5]  # strip .html
+        formats = []
+        for prism_class, label, file_ext in self.SOURCE_FORMATS:
+            src_file = self._src_for_ext(base_name, file_ext)
+            if output_index.exists(src_file):
+                # On format-specific pages (e.g. Foo.profile.xml.html or
+                # CodeSystem-Foo.xml.html), the FHIR IG Publisher sometimes
+                # emits <pre><code> blocks without a class attribute. Pass
+                # allow_classless=True so those are also replaced.
+                is_format_page = (
+                    base_name.endswith(f'.profile.{file_ext}')
+                    or base_name.endswith(f'.{file_ext}')
+                )
+                formats.append((prism_class, label, src_file, is_format_page))
+
+        original = html
+        html = self._replace_static_sources(html, formats)
+
+        if html != original:
+            self.logger.info(f'Dynamic source loading applied to {html_file}')
+        return html
+
 
 class DAKApiHubGenerator:
     """Generates the unified DAK API documentation hub."""
@@ -2430,6 +2917,7 @@ class DAKApiHubGenerator:
             enum_path = os.path.join(output_dir, enum_filename)
             with open(enum_path, 'w', encoding='utf-8') as f:
                 json.dump(enumeration_schema, f, indent=2, ensure_ascii=False)
+            record_output_file(enum_path)
             
             self.logger.info(f"Created enumeration schema: {enum_path}")
             return enum_path
@@ -3101,15 +3589,26 @@ def main():
     logger = setup_logging()
     
     # Parse command line arguments first
-    if len(sys.argv) == 1:
-        output_dir = "output"
-        openapi_dir = "input/openapi"  # Optional: externally defined APIs (e.g. smart-trust IG)
-    elif len(sys.argv) == 2:
-        output_dir = sys.argv[1]
-        openapi_dir = "input/openapi"  # Optional: externally defined APIs (e.g. smart-trust IG)
-    else:
-        output_dir = sys.argv[1]
-        openapi_dir = sys.argv[2]
+    parser = argparse.ArgumentParser(
+        description="Post-process the IG publisher output into the DAK API hub",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("output_dir", nargs="?", default="output",
+                        help="IG publisher output directory (default: output)")
+    # Optional: externally defined APIs (e.g. smart-trust IG)
+    parser.add_argument("openapi_dir", nargs="?", default="input/openapi",
+                        help="Directory with externally defined OpenAPI specs (default: input/openapi)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes, 0 for one per CPU (default: 1)")
+    parser.add_argument("--anchor-cache", nargs="?", const=ANCHOR_CACHE_PATH, default=None, metavar="PATH",
+                        help=f"Keep the CodeSystem code anchors between runs (default PATH: {ANCHOR_CACHE_PATH}); "
+                             "give the path as --anchor-cache=PATH")
+    options = parser.parse_args()
+    jobs = options.jobs if options.jobs >= 1 else (os.cpu_count() or 1)
+    anchor_cache = options.anchor_cache
+    output_dir = options.output_dir
+    openapi_dir = options.openapi_dir
     
     logger.info(f"Output directory: {output_dir}")
     logger.info(f"OpenAPI directory: {openapi_dir}")
@@ -3183,11 +3682,13 @@ def main():
     # Check if output directory exists and has content
     qa_reporter.add_file_expected(output_dir)
     if os.path.exists(output_dir):
-        logger.info(f"Output directory exists with {len(os.listdir(output_dir))} items")
-        qa_reporter.add_success(f"Output directory exists with {len(os.listdir(output_dir))} items")
+        # Every phase below looks files up in this index instead of listing the directory
+        output_index = get_output_index(output_dir)
+        get_anchor_index(output_dir, anchor_cache)
+        logger.info(f"Output directory exists with {len(output_index)} items")
+        qa_reporter.add_success(f"Output directory exists with {len(output_index)} items")
         # Log a few sample files to help debugging
-        all_files = os.listdir(output_dir)
-        sample_files = all_files[:10]  # Show first 10 files
+        sample_files = output_index.sorted_names[:10]  # Show first 10 files
         logger.info(f"Sample files in output directory: {sample_files}")
         qa_reporter.add_success("Output directory contents sampled", {"sample_files": sample_files})
     else:
@@ -3301,13 +3802,13 @@ def main():
     logger.info(f"Current working directory: {os.getcwd()}")
     logger.info(f"Output directory absolute path: {os.path.abspath(output_dir)}")
     if os.path.exists(output_dir):
-        all_files = os.listdir(output_dir)
-        html_files = [f for f in all_files if f.endswith('.html')]
+        all_files = output_index.sorted_names
+        html_files = output_index.with_suffix('.html')
         logger.info(f"Total files in output directory: {len(all_files)}")
         logger.info(f"HTML files in output directory: {len(html_files)} found")
         if len(html_files) > 0:
             logger.info(f"Sample HTML files: {html_files[:5]}")  # Show first 5
-        if 'dak-api.html' in all_files:
+        if output_index.exists('dak-api.html'):
             logger.info("✅ Found dak-api.html in directory listing")
         else:
             logger.warning("⚠️ dak-api.html NOT found in directory listing")
@@ -3317,14 +3818,13 @@ def main():
     
     # Continue processing even if dak-api.html is not found initially
     # The IG publisher might have generated it in a different location or named it differently
-    if not os.path.exists(dak_api_html_path):
+    if not output_index.exists('dak-api.html'):
         logger.warning(f"⚠️ dak-api.html not found at expected location: {dak_api_html_path}")
         
         # Try to find dak-api.html in the output directory with different approaches
         found_dak_api = False
         if os.path.exists(output_dir):
-            all_files = os.listdir(output_dir)
-            for file in all_files:
+            for file in output_index.sorted_names:
                 if file == 'dak-api.html':
                     found_dak_api = True
                     dak_api_html_path = os.path.join(output_dir, file)
@@ -3334,7 +3834,7 @@ def main():
         if not found_dak_api:
             logger.error(f"❌ Cannot find dak-api.html in output directory. Available HTML files:")
             if os.path.exists(output_dir):
-                html_files = [f for f in os.listdir(output_dir) if f.endswith('.html')]
+                html_files = output_index.with_suffix('.html')
                 for html_file in html_files[:10]:  # Show first 10
                     logger.error(f"  - {html_file}")
             logger.error("Make sure the IG publisher ran first and created dak-api.html from the dak-api.md placeholder.")
@@ -3397,11 +3897,6 @@ def main():
             openapi_filename = f"{schema_name}.openapi.json"
             jsonld_filename = f"{schema_name}.jsonld"
             
-            # Check if additional files exist
-            displays_path = os.path.join(output_dir, displays_filename)
-            openapi_path = os.path.join(output_dir, openapi_filename)
-            jsonld_path = os.path.join(output_dir, jsonld_filename)
-            
             schema_doc_entry = {
                 'title': title,
                 'description': schema.get('description', 'ValueSet schema documentation'),
@@ -3410,17 +3905,17 @@ def main():
             }
             
             # Add displays file if it exists
-            if os.path.exists(displays_path):
+            if output_index.exists(displays_filename):
                 schema_doc_entry['displays_file'] = displays_filename
                 logger.info(f"  Found displays file: {displays_filename}")
             
             # Add OpenAPI file if it exists
-            if os.path.exists(openapi_path):
+            if output_index.exists(openapi_filename):
                 schema_doc_entry['openapi_file'] = openapi_filename
                 logger.info(f"  Found OpenAPI file: {openapi_filename}")
                 
             # Add JSON-LD file if it exists  
-            if os.path.exists(jsonld_path):
+            if output_index.exists(jsonld_filename):
                 schema_doc_entry['jsonld_file'] = jsonld_filename
                 logger.info(f"  Found JSON-LD file: {jsonld_filename}")
             
@@ -3465,10 +3960,6 @@ def main():
             displays_filename = f"{schema_name}.displays.json"
             openapi_filename = f"{schema_name}.openapi.json"
             
-            # Check if additional files exist
-            displays_path = os.path.join(output_dir, displays_filename)
-            openapi_path = os.path.join(output_dir, openapi_filename)
-            
             schema_doc_entry = {
                 'title': title,
                 'description': schema.get('description', 'Logical Model schema documentation'),
@@ -3477,12 +3968,12 @@ def main():
             }
             
             # Add displays file if it exists
-            if os.path.exists(displays_path):
+            if output_index.exists(displays_filename):
                 schema_doc_entry['displays_file'] = displays_filename
                 logger.info(f"  Found displays file: {displays_filename}")
             
             # Add OpenAPI file if it exists
-            if os.path.exists(openapi_path):
+            if output_index.exists(openapi_filename):
                 schema_doc_entry['openapi_file'] = openapi_filename
                 logger.info(f"  Found OpenAPI file: {openapi_filename}")
             
@@ -3702,11 +4193,21 @@ def main():
     
     # Replace static pre-formatted source in all FHIR resource HTML pages with dynamic loaders
     logger.info("=== DYNAMIC SOURCE LOADING PHASE ===")
+    pipeline = get_rewrite_pipeline(output_dir)
+    pipeline.jobs = jobs
+    if jobs > 1:
+        logger.info(f"Rewriting HTML pages with {jobs} worker processes")
     try:
         dynamic_count = schema_doc_renderer.replace_static_source_with_dynamic_loading(output_dir)
         qa_reporter.add_success(f"Dynamic source loading applied to {dynamic_count} HTML files")
     except Exception as e:
         logger.warning(f"Dynamic source loading phase failed (non-fatal): {e}")
+    # Write the page edits of the earlier phases if the phase above did not
+    pipeline.run()
+    qa_reporter.add_success(f"Added tabs to {pipeline.counts.get('sibling page tabs', 0)} sibling pages")
+    for warning in pipeline.warnings:
+        qa_reporter.add_warning(warning)
+    get_anchor_index(output_dir).save()
 
     # Post-process the DAK API hub
     logger.info("=== DAK API HUB POST-PROCESSING PHASE ===")
@@ -10,20 +10,37 @@ whose allowed range is that Enumeration.
 The script is intended to be run after the IG publisher finishes processing
 to create semantic web vocabularies that can be used for linked data applications.
 
+Each vocabulary is streamed to its file one @graph member at a time. With
+--shared-context the terms common to all vocabularies are written once to
+ValueSets.context.jsonld and referenced by IRI from every vocabulary's
+@context instead of being repeated in each file.
+
+With --nquads the statements of all vocabularies are also written, sorted
+and de-duplicated, to a single ValueSets.nq file for bulk loading into a
+triple store (ValueSets.nq.gz with --nquads-gzip).
+
 Usage:
-    python generate_jsonld_vocabularies.py [expansions_json_path] [output_dir]
+    python generate_jsonld_vocabularies.py [--shared-context] [--nquads | --nquads-gzip] [expansions_json_path] [output_dir]
 
 Author: SMART Guidelines Team
 """
 
+import argparse
+import heapq
 import json
 import os
+import re
 import sys
 import logging
-from typing import Dict, List, Optional, Any
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from pathlib import Path
 from datetime import datetime
 
+import artifact_writer
+
+from expansions_reader import ExpansionsBundle
+
 
 def transform_codesystem_url(system_url: str) -> str:
     """
@@ -175,23 +192,25 @@ class QAReporter:
         return report
 
 
-def load_expansions_json(file_path: str) -> Optional[Dict[str, Any]]:
+def load_expansions_json(file_path: str) -> Optional[ExpansionsBundle]:
     """
-    Load and parse the expansions.json file.
+    Open the expansions.json file for streaming.
+    
+    Only the top-level members of the Bundle are read here; the entries are
+    decoded one at a time while iterating over the returned bundle.
     
     Args:
         file_path: Path to the expansions.json file
         
     Returns:
-        Parsed JSON data or None if failed to load
+        ExpansionsBundle or None if failed to load
     """
     logger = logging.getLogger(__name__)
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = ExpansionsBundle(file_path)
         
-        logger.info(f"Successfully loaded expansions.json from {file_path}")
+        logger.info(f"Successfully opened expansions.json from {file_path}")
         return data
     
     except FileNotFoundError:
@@ -376,32 +395,49 @@ def generate_canonical_iri(code: str, valueset_url: str, system_uri: str = None)
     return f"http://example.com/codes#{code}"
 
 
-def generate_jsonld_vocabulary(valueset_resource: Dict[str, Any], codes_with_display: List[Dict[str, str]]) -> Dict[str, Any]:
+# terms used by every vocabulary, published once as SHARED_CONTEXT_NAME with --shared-context
+SHARED_CONTEXT = {
+    "@version": 1.1,
+    "name": "http://www.w3.org/2000/01/rdf-schema#label",
+    "fhir": "https://smart.who.int/base/DataTypes.jsonld#",
+    "id": "@id",
+    "generatedAt": {
+        "@id": "http://www.w3.org/ns/prov#generatedAtTime",
+        "@type": "http://www.w3.org/2001/XMLSchema#dateTime"
+    },
+    "fhir:CodeSystem": {"@type": "@id"}
+}
+
+SHARED_CONTEXT_NAME = "ValueSets.context.jsonld"
+
+
+def get_jsonld_base_url(valueset_url: str) -> str:
+    """Base URL the JSON-LD files of a ValueSet are published under."""
+    if valueset_url and '/ValueSet/' in valueset_url:
+        return valueset_url.split('/ValueSet/')[0]
+    return "https://smart.who.int/base"
+
+
+def generate_jsonld_vocabulary_parts(valueset_resource: Dict[str, Any], codes_with_display: List[Dict[str, str]],
+                                     shared_context: bool = False) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]], Dict[str, Any]]:
     """
-    Generate a JSON-LD vocabulary for a ValueSet that defines an Enumeration class,
-    declares each code as a member of that Enumeration, and creates a property
-    whose allowed range is that Enumeration.
+    Generate a JSON-LD vocabulary for a ValueSet as the members before the
+    @graph, a generator of the @graph members and the members after it.
+    
+    With shared_context the terms of SHARED_CONTEXT are referenced by the IRI
+    of the shared context document instead of being inlined; only @base and
+    the code system aliases stay in the vocabulary's own context.
     
     Args:
         valueset_resource: FHIR ValueSet resource
         codes_with_display: List of dictionaries with 'code', 'display', and optionally 'system' keys
+        shared_context: Whether to reference the shared context document
         
     Returns:
-        JSON-LD vocabulary dictionary
+        Tuple of the head members, the @graph members and the tail members
     """
     valueset_id = extract_valueset_id(valueset_resource)
-    valueset_title = valueset_resource.get('title', valueset_resource.get('name', 'Unknown ValueSet'))
-    valueset_description = valueset_resource.get('description', f"Allowed values for the {valueset_title} enumeration.")
     valueset_url = valueset_resource.get('url', '')
-    valueset_version = valueset_resource.get('version', '')
-    valueset_date = None
-    valueset_publisher = valueset_resource.get('publisher', 'World Health Organization')
-    
-    # Extract date from expansion timestamp if available
-    if 'expansion' in valueset_resource and 'timestamp' in valueset_resource['expansion']:
-        valueset_date = valueset_resource['expansion']['timestamp']
-    elif 'date' in valueset_resource:
-        valueset_date = valueset_resource['date']
     
     # Determine JSON-LD file URL and vocabulary base IRI
     if valueset_url:
@@ -422,22 +458,26 @@ def generate_jsonld_vocabulary(valueset_resource: Dict[str, Any], codes_with_dis
     single_system = len(unique_systems) == 1
 
     # JSON-LD context - minimal, only multi-use terms
-    context = {
-        "@version": 1.1,
-        "@base": jsonld_file_url,
-        "name": "http://www.w3.org/2000/01/rdf-schema#label",
-        "fhir": "https://smart.who.int/base/DataTypes.jsonld#",
-        "id": "@id",
-        "generatedAt": {
-            "@id": "http://www.w3.org/ns/prov#generatedAtTime",
-            "@type": "http://www.w3.org/2001/XMLSchema#dateTime"
+    if shared_context:
+        context = {"@base": jsonld_file_url}
+    else:
+        context = {
+            "@version": 1.1,
+            "@base": jsonld_file_url,
+            "name": "http://www.w3.org/2000/01/rdf-schema#label",
+            "fhir": "https://smart.who.int/base/DataTypes.jsonld#",
+            "id": "@id",
+            "generatedAt": {
+                "@id": "http://www.w3.org/ns/prov#generatedAtTime",
+                "@type": "http://www.w3.org/2001/XMLSchema#dateTime"
+            }
         }
-    }
 
     # Build system alias map and add aliases to context
     system_alias_map: Dict[str, str] = {}
     if unique_systems:
-        context["fhir:CodeSystem"] = {"@type": "@id"}
+        if not shared_context:
+            context["fhir:CodeSystem"] = {"@type": "@id"}
         if single_system:
             context["cs"] = transform_codesystem_url(unique_systems[0])
             system_alias_map[unique_systems[0]] = "cs"
@@ -447,40 +487,63 @@ def generate_jsonld_vocabulary(valueset_resource: Dict[str, Any], codes_with_dis
                 context[alias] = transform_codesystem_url(system)
                 system_alias_map[system] = alias
 
-    # Start building the @graph - only codes, no enumeration class
-    graph = []
+    def generate_graph() -> Iterator[Dict[str, Any]]:
+        # Only include code instances, no enumeration class definition
+        for item in codes_with_display:
+            code = item['code']
+            display = item['display']
+            system = item.get('system', '')
 
-    # Only include code instances, no enumeration class definition
-    for item in codes_with_display:
-        code = item['code']
-        display = item['display']
-        system = item.get('system', '')
-
-        # Use a fragment identifier; @base in context resolves it to the full IRI
-        code_instance = {
-            "id": f"#{code}",
-            "name": display
-        }
+            # Use a fragment identifier; @base in context resolves it to the full IRI
+            code_instance = {
+                "id": f"#{code}",
+                "name": display
+            }
 
-        # Omit fhir:CodeSystem per entry when all codes share a single system
-        if not single_system and system and system in system_alias_map:
-            code_instance["fhir:CodeSystem"] = system_alias_map[system]
+            # Omit fhir:CodeSystem per entry when all codes share a single system
+            if not single_system and system and system in system_alias_map:
+                code_instance["fhir:CodeSystem"] = system_alias_map[system]
 
-        graph.append(code_instance)
+            yield code_instance
 
-    # Create the complete JSON-LD document with named graph
-    jsonld_vocab = {
-        "@context": context,
+    # Create the JSON-LD document with named graph
+    head = {
+        "@context": [f"{get_jsonld_base_url(valueset_url)}/{SHARED_CONTEXT_NAME}", context] if shared_context else context,
         "@id": jsonld_file_url,
         "@type": "http://www.w3.org/ns/prov#Entity",
-        "generatedAt": datetime.utcnow().isoformat() + "Z",
-        "@graph": graph
+        "generatedAt": datetime.utcnow().isoformat() + "Z"
     }
 
     # For single-system ValueSets, record the shared system once at document level
+    tail = {}
     if single_system and unique_systems:
-        jsonld_vocab["fhir:CodeSystem"] = "cs"
+        tail["fhir:CodeSystem"] = "cs"
+
+    return head, generate_graph(), tail
 
+
+def generate_jsonld_vocabulary(valueset_resource: Dict[str, Any], codes_with_display: List[Dict[str, str]],
+                               shared_context: bool = False) -> Dict[str, Any]:
+    """
+    Generate a JSON-LD vocabulary for a ValueSet that defines an Enumeration class,
+    declares each code as a member of that Enumeration, and creates a property
+    whose allowed range is that Enumeration.
+    
+    Builds the whole document in memory; write_jsonld_vocabulary streams it
+    to disk instead.
+    
+    Args:
+        valueset_resource: FHIR ValueSet resource
+        codes_with_display: List of dictionaries with 'code', 'display', and optionally 'system' keys
+        shared_context: Whether to reference the shared context document
+        
+    Returns:
+        JSON-LD vocabulary dictionary
+    """
+    head, graph, tail = generate_jsonld_vocabulary_parts(valueset_resource, codes_with_display, shared_context)
+    jsonld_vocab = dict(head)
+    jsonld_vocab["@graph"] = list(graph)
+    jsonld_vocab.update(tail)
     return jsonld_vocab
 
 
@@ -507,10 +570,49 @@ def save_jsonld_vocabulary(jsonld_vocab: Dict[str, Any], output_dir: str, values
         filepath = os.path.join(output_dir, filename)
         
         # Save JSON-LD vocabulary
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(jsonld_vocab, f, indent=2, ensure_ascii=False)
+        if artifact_writer.write_json(jsonld_vocab, filepath):
+            logger.info(f"Saved JSON-LD vocabulary for ValueSet {valueset_id} to {filepath}")
+        else:
+            logger.info(f"Unchanged JSON-LD vocabulary for ValueSet {valueset_id}: {filepath}")
+        return filepath
         
-        logger.info(f"Saved JSON-LD vocabulary for ValueSet {valueset_id} to {filepath}")
+    except Exception as e:
+        logger.error(f"Error saving JSON-LD vocabulary for ValueSet {valueset_id}: {e}")
+        return None
+
+
+def write_jsonld_vocabulary(valueset_resource: Dict[str, Any], codes_with_display: List[Dict[str, str]],
+                            output_dir: str, valueset_id: str, shared_context: bool = False,
+                            quads: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Generate a JSON-LD vocabulary and stream it to its file, one @graph
+    member at a time, so the graph of a large ValueSet is never held in memory.
+    
+    Args:
+        valueset_resource: FHIR ValueSet resource
+        codes_with_display: List of dictionaries with 'code', 'display', and optionally 'system' keys
+        output_dir: Directory to save JSON-LD files
+        valueset_id: ValueSet ID for filename
+        shared_context: Whether to reference the shared context document
+        quads: If given, the N-Quads lines of the vocabulary (see
+            generate_vocabulary_quads) are appended to it as the graph is written
+        
+    Returns:
+        Filepath if saved successfully, None otherwise
+    """
+    logger = logging.getLogger(__name__)
+    
+    try:
+        head, graph, tail = generate_jsonld_vocabulary_parts(valueset_resource, codes_with_display, shared_context)
+        filepath = os.path.join(output_dir, f"ValueSet-{valueset_id}.jsonld")
+        if quads is not None:
+            quads.extend(document_quads(head, tail))
+            graph = record_member_quads(head, graph, quads)
+        
+        if artifact_writer.write_json_stream(head, "@graph", graph, filepath, tail):
+            logger.info(f"Saved JSON-LD vocabulary for ValueSet {valueset_id} to {filepath}")
+        else:
+            logger.info(f"Unchanged JSON-LD vocabulary for ValueSet {valueset_id}: {filepath}")
         return filepath
         
     except Exception as e:
@@ -518,14 +620,187 @@ def save_jsonld_vocabulary(jsonld_vocab: Dict[str, Any], output_dir: str, values
         return None
 
 
-def process_expansions(expansions_data: Dict[str, Any], output_dir: str, qa_reporter: QAReporter) -> int:
+def save_shared_context(output_dir: str) -> Optional[str]:
+    """
+    Save the shared JSON-LD context referenced by the vocabularies generated
+    with shared_context.
+    
+    Returns:
+        Filepath if saved successfully, None otherwise
+    """
+    logger = logging.getLogger(__name__)
+    filepath = os.path.join(output_dir, SHARED_CONTEXT_NAME)
+    
+    try:
+        if artifact_writer.write_json({"@context": SHARED_CONTEXT}, filepath):
+            logger.info(f"Saved shared JSON-LD context to {filepath}")
+        else:
+            logger.info(f"Unchanged shared JSON-LD context: {filepath}")
+        return filepath
+        
+    except Exception as e:
+        logger.error(f"Error saving shared JSON-LD context: {e}")
+        return None
+
+
+NQUADS_NAME = "ValueSets.nq"
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+PROV_ENTITY = "http://www.w3.org/ns/prov#Entity"
+FHIR_CODESYSTEM = "https://smart.who.int/base/DataTypes.jsonld#CodeSystem"
+
+# characters that may not appear unescaped in an N-Quads IRI
+nquads_iri_pattern = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+
+def nquads_iri(iri: str) -> str:
+    """Render an IRI as an N-Quads IRIREF, percent-encoding what it may not contain."""
+    return "<" + nquads_iri_pattern.sub(lambda m: "".join(f"%{b:02X}" for b in m.group().encode("utf-8")), iri) + ">"
+
+
+def nquads_literal(value: str) -> str:
+    """Render a string as an N-Quads literal."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+
+def local_context(head: Dict[str, Any]) -> Dict[str, Any]:
+    """The vocabulary's own @context, which holds @base and the code system aliases."""
+    context = head["@context"]
+    return context[-1] if isinstance(context, list) else context
+
+
+def document_quads(head: Dict[str, Any], tail: Dict[str, Any]) -> Iterator[str]:
+    """N-Quads lines about the vocabulary document itself, in the default graph."""
+    document_iri = nquads_iri(head["@id"])
+    yield f"{document_iri} <{RDF_TYPE}> <{PROV_ENTITY}> .\n"
+    if "fhir:CodeSystem" in tail:
+        yield f"{document_iri} <{FHIR_CODESYSTEM}> {nquads_iri(local_context(head)[tail['fhir:CodeSystem']])} .\n"
+
+
+def record_member_quads(head: Dict[str, Any], graph: Iterable[Dict[str, Any]], quads: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Pass the @graph members on, appending the N-Quads lines of each to quads;
+    they are in the named graph of the document.
+    """
+    document = head["@id"]
+    document_iri = nquads_iri(document)
+    context = local_context(head)
+    for member in graph:
+        # member ids are fragments resolved against @base, the document IRI
+        subject = nquads_iri(document.split('#')[0] + member["id"])
+        quads.append(f"{subject} <{RDFS_LABEL}> {nquads_literal(member['name'])} {document_iri} .\n")
+        if "fhir:CodeSystem" in member:
+            quads.append(f"{subject} <{FHIR_CODESYSTEM}> {nquads_iri(context[member['fhir:CodeSystem']])} {document_iri} .\n")
+        yield member
+
+
+def generate_vocabulary_quads(valueset_resource: Dict[str, Any], codes_with_display: List[Dict[str, str]]) -> List[str]:
+    """
+    Generate the RDF statements of a ValueSet's JSON-LD vocabulary as N-Quads lines.
+    
+    The statements are those of the .jsonld file: the vocabulary document
+    is a prov:Entity in the default graph, and the code members with their
+    rdfs:label and fhir:CodeSystem are in the named graph of the document.
+    fhir:CodeSystem points to the code system IRI that the cs aliases of the
+    @context stand for. The volatile generatedAt timestamp is left out so the
+    export only changes when the vocabularies do.
+    
+    When the .jsonld file is written too, pass a list as the quads argument of
+    write_jsonld_vocabulary instead, so the vocabulary is only generated once.
+    
+    Args:
+        valueset_resource: FHIR ValueSet resource
+        codes_with_display: List of dictionaries with 'code', 'display', and optionally 'system' keys
+        
+    Returns:
+        One N-Quads line per statement, with trailing newline
+    """
+    head, graph, tail = generate_jsonld_vocabulary_parts(valueset_resource, codes_with_display)
+    quads = list(document_quads(head, tail))
+    for _ in record_member_quads(head, graph, quads):
+        pass
+    return quads
+
+
+class NQuadsExport:
+    """
+    Collects the N-Quads lines of all vocabularies and writes them as one
+    sorted, de-duplicated file, gzip-compressed if its name ends in .gz.
+    
+    Lines are sorted in runs of run_size lines; runs beyond the first are
+    spilled to temporary files and merged when the file is written, so
+    memory stays bounded for large DAKs.
+    """
+    
+    run_size = 500000
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.lines: List[str] = []
+        self.runs: List[Any] = []
+        self.quad_count = 0
+    
+    def add(self, lines: Iterable[str]) -> None:
+        """Add the N-Quads lines of one vocabulary."""
+        for line in lines:
+            self.lines.append(line)
+            if len(self.lines) >= self.run_size:
+                self.spill()
+    
+    def spill(self) -> None:
+        run = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.lines.sort()
+        run.writelines(self.lines)
+        run.seek(0)
+        self.runs.append(run)
+        self.lines = []
+    
+    def iter_sorted(self) -> Iterator[str]:
+        self.lines.sort()
+        previous = None
+        for line in heapq.merge(self.lines, *self.runs):
+            if line != previous:
+                self.quad_count += 1
+                yield line
+                previous = line
+    
+    def save(self) -> Optional[str]:
+        """
+        Write the export file.
+        
+        Returns:
+            Filepath if saved successfully, None otherwise
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            self.quad_count = 0
+            if artifact_writer.write_text_stream(self.iter_sorted(), self.filepath):
+                logger.info(f"Saved {self.quad_count} N-Quads to {self.filepath}")
+            else:
+                logger.info(f"Unchanged N-Quads export with {self.quad_count} statements: {self.filepath}")
+            return self.filepath
+        except Exception as e:
+            logger.error(f"Error saving N-Quads export {self.filepath}: {e}")
+            return None
+        finally:
+            for run in self.runs:
+                run.close()
+            self.runs = []
+            self.lines = []
+
+
+def process_expansions(expansions_data: ExpansionsBundle, output_dir: str, qa_reporter: QAReporter,
+                       shared_context: bool = False, nquads_export: Optional[NQuadsExport] = None) -> int:
     """
     Process the expansions data and generate JSON-LD vocabularies for all ValueSets.
     
     Args:
-        expansions_data: Parsed expansions.json data
+        expansions_data: Streaming expansions.json Bundle
         output_dir: Directory to save JSON-LD vocabulary files
         qa_reporter: QA reporter instance
+        shared_context: Whether the vocabularies reference one shared context document
+        nquads_export: Bulk N-Quads export to add every vocabulary's statements to
         
     Returns:
         Number of vocabularies successfully generated
@@ -547,21 +822,16 @@ def process_expansions(expansions_data: Dict[str, Any], output_dir: str, qa_repo
         })
         
         # Check if Bundle has entries
-        if 'entry' not in expansions_data:
+        if not expansions_data.has_entries:
             warning_msg = "Bundle has no entries"
             logger.warning(warning_msg)
             qa_reporter.add_warning(warning_msg)
             return 0
         
-        entries = expansions_data['entry']
-        qa_reporter.add_success(f"Found {len(entries)} entries in Bundle", {
-            "entry_count": len(entries)
-        })
-        
         vocabularies_generated = 0
         
-        # Process each entry
-        for i, entry in enumerate(entries):
+        # Process each entry, decoded one at a time from the file
+        for i, entry in enumerate(expansions_data):
             try:
                 if 'resource' not in entry:
                     warning_msg = f"Bundle entry {i} has no resource"
@@ -600,29 +870,30 @@ def process_expansions(expansions_data: Dict[str, Any], output_dir: str, qa_repo
                     "codes_count": len(codes_with_display)
                 })
                 
-                # Generate JSON-LD vocabulary
-                jsonld_vocab = generate_jsonld_vocabulary(resource, codes_with_display)
-                qa_reporter.add_success(f"Generated JSON-LD vocabulary for ValueSet {valueset_id}")
-                
-                # Save JSON-LD vocabulary
-                jsonld_path = save_jsonld_vocabulary(jsonld_vocab, output_dir, valueset_id)
+                # Generate JSON-LD vocabulary, streamed to its file
+                quads = [] if nquads_export else None
+                jsonld_path = write_jsonld_vocabulary(resource, codes_with_display, output_dir,
+                                                      valueset_id, shared_context, quads)
                 
                 # Count as successful if JSON-LD file is saved
                 if jsonld_path:
                     vocabularies_generated += 1
+                    qa_reporter.add_success(f"Generated JSON-LD vocabulary for ValueSet {valueset_id}")
+                    if nquads_export:
+                        nquads_export.add(quads)
                     
                     qa_reporter.add_file_processed(jsonld_path, "success", {
                         "valueset_id": valueset_id,
                         "codes_count": len(codes_with_display),
-                        "vocab_size": len(json.dumps(jsonld_vocab))
+                        "vocab_size": os.path.getsize(jsonld_path)
                     })
                     
                     qa_reporter.add_vocabulary_generated({
                         "valueset_id": valueset_id,
                         "jsonld_file": jsonld_path,
                         "codes_count": len(codes_with_display),
-                        "has_context": "@context" in jsonld_vocab,
-                        "has_graph": "@graph" in jsonld_vocab
+                        "has_context": True,
+                        "has_graph": True
                     })
                 else:
                     qa_reporter.add_error(f"Failed to save JSON-LD vocabulary for ValueSet {valueset_id}", {
@@ -638,6 +909,25 @@ def process_expansions(expansions_data: Dict[str, Any], output_dir: str, qa_repo
                 })
                 continue
         
+        if nquads_export and vocabularies_generated:
+            nquads_path = nquads_export.save()
+            if nquads_path:
+                qa_reporter.add_file_processed(nquads_path, "success", {
+                    "quad_count": nquads_export.quad_count
+                })
+            else:
+                qa_reporter.add_error("Failed to save N-Quads export")
+        
+        if shared_context and vocabularies_generated:
+            context_path = save_shared_context(output_dir)
+            if context_path:
+                qa_reporter.add_file_processed(context_path, "success")
+            else:
+                qa_reporter.add_error("Failed to save shared JSON-LD context")
+        
+        qa_reporter.add_success(f"Found {expansions_data.entry_count} entries in Bundle", {
+            "entry_count": expansions_data.entry_count
+        })
         qa_reporter.add_success(f"Generated {vocabularies_generated} JSON-LD vocabularies", {
             "vocabularies_generated": vocabularies_generated
         })
@@ -660,19 +950,30 @@ def main():
     # Initialize QA reporter
     qa_reporter = QAReporter("jsonld_vocabularies")
     
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(
+        description="Generate JSON-LD vocabularies for the ValueSets in expansions.json",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("expansions_path", nargs="?", default="output/expansions.json",
+                        help="Path to expansions.json (default: output/expansions.json)")
+    parser.add_argument("output_dir", nargs="?", default="output",
+                        help="Directory to write the vocabularies to (default: output)")
+    parser.add_argument("--shared-context", action="store_true",
+                        help=f"Reference one shared context document ({SHARED_CONTEXT_NAME})")
+    nquads_group = parser.add_mutually_exclusive_group()
+    nquads_group.add_argument("--nquads", action="store_true",
+                              help=f"Write one sorted N-Quads export of all vocabularies ({NQUADS_NAME})")
+    nquads_group.add_argument("--nquads-gzip", action="store_true",
+                              help=f"Like --nquads, gzip compressed ({NQUADS_NAME}.gz)")
+    options = parser.parse_args()
+    shared_context = options.shared_context
+    nquads = options.nquads or options.nquads_gzip
+    expansions_path = options.expansions_path
+    output_dir = options.output_dir  # JSON-LD vocabularies will be saved directly to output/ directory
+    
     try:
-        # Parse command line arguments
-        if len(sys.argv) < 2:
-            # Default paths
-            expansions_path = "output/expansions.json"
-            output_dir = "output"  # JSON-LD vocabularies will be saved directly to output/ directory
-        elif len(sys.argv) == 2:
-            expansions_path = sys.argv[1]
-            output_dir = "output"  # JSON-LD vocabularies will be saved directly to output/ directory
-        else:
-            expansions_path = sys.argv[1]
-            output_dir = sys.argv[2]
-        
         logger.info(f"Processing expansions from: {expansions_path}")
         logger.info(f"Output directory: {output_dir}")
         
@@ -699,7 +1000,12 @@ def main():
             })
             
             # Process expansions and generate JSON-LD vocabularies
-            vocabularies_count = process_expansions(expansions_data, output_dir, qa_reporter)
+            nquads_export = None
+            if nquads:
+                nquads_name = NQUADS_NAME + (".gz" if options.nquads_gzip else "")
+                nquads_export = NQuadsExport(os.path.join(output_dir, nquads_name))
+            vocabularies_count = process_expansions(expansions_data, output_dir, qa_reporter,
+                                                    shared_context, nquads_export)
             
             if vocabularies_count > 0:
                 success_msg = f"Successfully generated {vocabularies_count} JSON-LD vocabularies in {output_dir}"
@@ -721,6 +1027,7 @@ def main():
         })
     
     finally:
+        artifact_writer.save_manifests()
         # Always save QA report regardless of success/failure
         try:
             # Save to protected location that won't be overwritten by IG publisher
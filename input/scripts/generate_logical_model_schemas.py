@@ -12,12 +12,18 @@ StructureDefinition files from the output directory to create schemas that can b
 for validation of data against the Logical Models.
 
 Usage:
-    python generate_logical_model_schemas.py [output_dir] [schema_output_dir]
+    python generate_logical_model_schemas.py [--jobs N] [output_dir] [schema_output_dir]
+
+With --jobs N the StructureDefinitions are parsed and the schemas generated on
+N worker processes (0 for one per CPU); the QA report and schema list keep the
+order of the models.
 
 Author: SMART Guidelines Team
 """
 
+import argparse
 import json
+import multiprocessing
 import os
 import sys
 import logging
@@ -26,6 +32,9 @@ from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from datetime import datetime
 
+import artifact_writer
+from expansions_reader import JsonStream
+
 
 def setup_logging() -> logging.Logger:
     """Configure logging for the script."""
@@ -101,6 +110,11 @@ class QAReporter:
         schema_info["timestamp"] = datetime.now().isoformat()
         self.report["details"]["schemas_generated"].append(schema_info)
     
+    def merge_details(self, details: Dict[str, List]):
+        """Append the detail entries of another report, e.g. one filled in a worker process."""
+        for key, entries in details.items():
+            self.report["details"].setdefault(key, []).extend(entries)
+    
     def finalize_report(self, status: str = "completed"):
         """Finalize the QA report with summary statistics."""
         self.report["status"] = status
@@ -154,6 +168,72 @@ class QAReporter:
         return report
 
 
+class ElementSpec:
+    """
+    The parts of a StructureDefinition element used for schema generation.
+    
+    Supports dictionary-style reads (element['type'], element.get('choice'))
+    so it can be used wherever the parsed element dicts were used before.
+    """
+    
+    __slots__ = ('name', 'path', 'cardinality', 'type', 'valueset', 'choice', 'short', 'definition')
+    
+    def __init__(self, name: str, path: str = '', cardinality: str = '0..*', type: str = '',
+                 valueset: str = '', choice: bool = False, short: str = '', definition: str = ''):
+        self.name = name
+        self.path = path
+        self.cardinality = cardinality
+        self.type = type
+        self.valueset = valueset
+        self.choice = choice
+        self.short = short
+        self.definition = definition
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class LogicalModel:
+    """
+    A logical model reduced to the StructureDefinition fields used for schema
+    generation, without the snapshot, differential or narrative it was read from.
+    
+    Supports dictionary-style reads like ElementSpec. Instances are small and
+    picklable, so they can be passed to and returned from worker processes.
+    """
+    
+    __slots__ = ('name', 'id', 'title', 'description', 'url', 'parent', 'elements', 'file_path')
+    
+    # top-level StructureDefinition members read by StructureDefinitionParser
+    header_fields = ('kind', 'name', 'id', 'title', 'description', 'url', 'baseDefinition')
+    
+    def __init__(self, structure_def: Dict[str, Any], file_path: str = ''):
+        self.name = structure_def.get('name', '')
+        self.id = structure_def.get('id', '')
+        self.title = structure_def.get('title', '')
+        self.description = structure_def.get('description', '')
+        self.url = structure_def.get('url', '')
+        self.parent = structure_def.get('baseDefinition', '')
+        self.elements: List[ElementSpec] = []
+        self.file_path = file_path
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+
 class StructureDefinitionParser:
     """Parser for JSON StructureDefinition files to extract Logical Model definitions."""
     
@@ -167,9 +247,10 @@ class StructureDefinitionParser:
             for file in files:
                 if file.startswith('StructureDefinition-') and file.endswith('.json'):
                     json_files.append(os.path.join(root, file))
-        return json_files
+        # sorted so that schema_files and the QA report do not depend on directory order
+        return sorted(json_files)
     
-    def parse_logical_models(self, json_files: List[str]) -> List[Dict[str, Any]]:
+    def parse_logical_models(self, json_files: List[str]) -> List[LogicalModel]:
         """Parse logical models from StructureDefinition JSON files."""
         logical_models = []
         
@@ -180,48 +261,68 @@ class StructureDefinitionParser:
                 
         return logical_models
     
-    def extract_logical_model_from_file(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """Extract logical model from a single StructureDefinition JSON file."""
+    def extract_logical_model_from_file(self, file_path: str) -> Optional[LogicalModel]:
+        """
+        Extract logical model from a single StructureDefinition JSON file.
+        
+        The file is streamed member by member and only the fields used for the
+        schema are kept: the narrative is dropped as soon as it is read, element
+        lists are reduced to ElementSpecs right away, and files that are not
+        logical models are abandoned once their 'kind' has been seen.
+        """
+        header = {}
+        element_lists = {}
+        unparsed = set()
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                structure_def = json.load(f)
+                for key, value in JsonStream(f).iter_object(''):
+                    if key in LogicalModel.header_fields:
+                        header[key] = value
+                        if key == 'kind' and value != 'logical':
+                            return None
+                    elif key in ('snapshot', 'differential'):
+                        if isinstance(value, dict) and 'element' in value:
+                            if 'name' in header:
+                                element_lists[key] = self.parse_elements(value['element'], header['name'])
+                            else:
+                                # the root element is recognised by the model name, parse once it is known
+                                element_lists[key] = value['element']
+                                unparsed.add(key)
+                    # release the raw member before the next one is decoded
+                    del value
+                    if 'snapshot' in element_lists and len(header) == len(LogicalModel.header_fields):
+                        # the snapshot wins over the differential, no need to read on
+                        break
         except Exception as e:
             self.logger.error(f"Error reading file {file_path}: {e}")
             return None
         
         # Check if this is a logical model
-        if structure_def.get('kind') != 'logical':
+        if header.get('kind') != 'logical':
             return None
             
-        self.logger.info(f"Found logical model: {structure_def.get('name', 'Unknown')} in {file_path}")
-        
-        model = {
-            'name': structure_def.get('name', ''),
-            'id': structure_def.get('id', ''),
-            'title': structure_def.get('title', ''),
-            'description': structure_def.get('description', ''),
-            'url': structure_def.get('url', ''),
-            'parent': structure_def.get('baseDefinition', ''),
-            'elements': [],
-            'file_path': file_path
-        }
+        self.logger.info(f"Found logical model: {header.get('name', 'Unknown')} in {file_path}")
+        
+        model = LogicalModel(header, file_path)
         
         # Extract elements from snapshot or differential
-        elements = []
-        if 'snapshot' in structure_def and 'element' in structure_def['snapshot']:
-            elements = structure_def['snapshot']['element']
-        elif 'differential' in structure_def and 'element' in structure_def['differential']:
-            elements = structure_def['differential']['element']
+        source = 'snapshot' if 'snapshot' in element_lists else 'differential'
+        model.elements = element_lists.get(source, [])
+        if source in unparsed:
+            model.elements = self.parse_elements(model.elements, model.name)
         
-        # Process elements 
+        return model
+    
+    def parse_elements(self, elements: List[Dict[str, Any]], model_name: str) -> List[ElementSpec]:
+        """Parse the elements of a snapshot or differential, skipping those parse_element drops."""
+        parsed_elements = []
         for element in elements:
-            parsed_element = self.parse_element(element, model['name'])
+            parsed_element = self.parse_element(element, model_name)
             if parsed_element:
-                model['elements'].append(parsed_element)
-        
-        return model
+                parsed_elements.append(parsed_element)
+        return parsed_elements
     
-    def parse_element(self, element: Dict[str, Any], model_name: str) -> Optional[Dict[str, Any]]:
+    def parse_element(self, element: Dict[str, Any], model_name: str) -> Optional[ElementSpec]:
         """Parse an element from StructureDefinition."""
         path = element.get('path', '')
         
@@ -239,28 +340,24 @@ class StructureDefinitionParser:
         if element_name.startswith('extension'):
             return None
         
-        parsed_element = {
-            'name': element_name,
-            'path': path,
-            'cardinality': f"{element.get('min', 0)}..{element.get('max', '*')}",
-            'type': '',
-            'valueset': '',
-            'short': element.get('short', ''),
-            'definition': element.get('definition', '')
-        }
+        parsed_element = ElementSpec(
+            name=element_name,
+            path=path,
+            cardinality=f"{element.get('min', 0)}..{element.get('max', '*')}",
+            short=element.get('short', ''),
+            definition=element.get('definition', '')
+        )
         
         # Extract type information
         if 'type' in element and element['type']:
             type_info = element['type'][0]  # Take first type
-            parsed_element['type'] = type_info.get('code', '')
+            parsed_element.type = type_info.get('code', '')
             
             # Check for choice types
             if len(element['type']) > 1:
-                parsed_element['choice'] = True
+                parsed_element.choice = True
                 type_codes = [t.get('code', '') for t in element['type']]
-                parsed_element['type'] = ' or '.join(type_codes)
-            else:
-                parsed_element['choice'] = False
+                parsed_element.type = ' or '.join(type_codes)
         
         # Extract ValueSet binding
         if 'binding' in element:
@@ -270,7 +367,7 @@ class StructureDefinitionParser:
                 # Extract ValueSet name from URL
                 if '/' in valueset_url:
                     valueset_name = valueset_url.split('/')[-1]
-                    parsed_element['valueset'] = valueset_name
+                    parsed_element.valueset = valueset_name
         
         return parsed_element
 
@@ -283,6 +380,10 @@ class SchemaGenerator:
     # by every other generated schema via ``allOf``.
     FHIR_SCHEMA_BASE_NAME = "FHIRSchemaBase"
 
+    # (fhir_type, valueset) -> resolved JSON schema, shared by all models and
+    # generators of a process; get_type_schema hands out copies
+    type_schema_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
     def __init__(self, logger: logging.Logger, canonical_base: str = "http://smart.who.int/base"):
         self.logger = logger
         self.canonical_base = canonical_base
@@ -343,7 +444,7 @@ class SchemaGenerator:
             'Address': {'type': 'object'},
         }
     
-    def generate_schema(self, logical_model: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_schema(self, logical_model: LogicalModel) -> Dict[str, Any]:
         """Generate JSON schema for a logical model.
 
         For the :attr:`FHIR_SCHEMA_BASE_NAME` model this method generates the
@@ -455,7 +556,7 @@ class SchemaGenerator:
             }
             
             # Add ValueSet context entries
-            for vs in valuesets_used:
+            for vs in sorted(valuesets_used):
                 jsonld_context[vs] = f"{self.canonical_base}/ValueSet-{vs}.jsonld"
             
             # Add JSON-LD context properties to schema
@@ -535,7 +636,7 @@ class SchemaGenerator:
 
         return schema
     
-    def add_element_to_schema(self, schema: Dict[str, Any], element: Dict[str, Any]):
+    def add_element_to_schema(self, schema: Dict[str, Any], element: ElementSpec):
         """Add an element to the JSON schema."""
         element_name = element['name']
         cardinality = element['cardinality']
@@ -590,7 +691,17 @@ class SchemaGenerator:
         schema['properties'][element_name] = element_schema
     
     def get_type_schema(self, fhir_type: str, valueset: str = '') -> Dict[str, Any]:
-        """Get JSON schema for a FHIR type."""
+        """Get JSON schema for a FHIR type, memoized on (fhir_type, valueset)."""
+        key = (fhir_type, valueset or '')
+        type_schema = self.type_schema_cache.get(key)
+        if type_schema is None:
+            type_schema = self.resolve_type_schema(fhir_type, valueset)
+            self.type_schema_cache[key] = type_schema
+        # callers add descriptions to the schema they get, so never share it
+        return dict(type_schema)
+    
+    def resolve_type_schema(self, fhir_type: str, valueset: str = '') -> Dict[str, Any]:
+        """Build the JSON schema for a FHIR type."""
         # Handle Reference types
         if fhir_type.startswith('Reference('):
             return {
@@ -619,7 +730,7 @@ class SchemaGenerator:
         
         # Use type mapping
         if fhir_type in self.type_mapping:
-            return self.type_mapping[fhir_type].copy()
+            return self.type_mapping[fhir_type]
         
         # Default for unknown types
         return {
@@ -638,10 +749,10 @@ class SchemaGenerator:
             filepath = os.path.join(output_dir, filename)
             
             # Save schema
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(schema, f, indent=2, ensure_ascii=False)
-            
-            self.logger.info(f"Saved schema for Logical Model {model_name} to {filepath}")
+            if artifact_writer.write_json(schema, filepath):
+                self.logger.info(f"Saved schema for Logical Model {model_name} to {filepath}")
+            else:
+                self.logger.info(f"Unchanged schema for Logical Model {model_name}: {filepath}")
             return filepath
             
         except Exception as e:
@@ -649,8 +760,75 @@ class SchemaGenerator:
             return None
 
 
-def process_logical_models(structure_definition_dir: str, output_dir: str, qa_reporter: QAReporter) -> int:
-    """Process StructureDefinition JSON files and generate JSON schemas for logical models."""
+def generate_model_schema(model: LogicalModel, output_dir: str, generator: SchemaGenerator,
+                          qa_reporter: QAReporter) -> Optional[str]:
+    """Generate and save the JSON schema of one logical model, returning its path."""
+    logger = logging.getLogger(__name__)
+    model_name = model['name']
+    logger.info(f"Generating schema for logical model: {model_name}")
+    
+    try:
+        # Generate schema
+        schema = generator.generate_schema(model)
+        qa_reporter.add_success(f"Generated schema for model {model_name}")
+        
+        # Save schema
+        schema_path = generator.save_schema(schema, output_dir, model_name)
+        if schema_path:
+            qa_reporter.add_file_processed(schema_path, "success", {
+                "model_name": model_name,
+                "schema_size": len(json.dumps(schema))
+            })
+            
+            qa_reporter.add_schema_generated({
+                "model_name": model_name,
+                "schema_file": schema_path,
+                "properties_count": len(schema.get("properties", {})),
+                "required_fields": schema.get("required", [])
+            })
+        else:
+            qa_reporter.add_error(f"Failed to save schema for model {model_name}")
+        return schema_path
+            
+    except Exception as e:
+        qa_reporter.add_error(f"Error processing logical model {model_name}: {e}", {
+            "model_name": model_name,
+            "exception": str(e)
+        })
+        return None
+
+
+def parse_logical_model_in_worker(file_path: str) -> Optional[LogicalModel]:
+    """Pool entry point for StructureDefinitionParser.extract_logical_model_from_file."""
+    parser = StructureDefinitionParser(logging.getLogger(__name__))
+    return parser.extract_logical_model_from_file(file_path)
+
+
+# schema generator of a worker process, created on first use
+worker_generators: List[SchemaGenerator] = []
+
+
+def generate_model_schema_in_worker(task: Tuple[LogicalModel, str]) -> Tuple[Optional[str], Dict[str, List], Dict]:
+    """
+    Pool entry point for generate_model_schema: returns the schema path, the QA
+    details and the artifact manifest updates.
+    """
+    model, output_dir = task
+    if not worker_generators:
+        worker_generators.append(SchemaGenerator(logging.getLogger(__name__)))
+    qa_reporter = QAReporter("logical_model_schemas")
+    schema_path = generate_model_schema(model, output_dir, worker_generators[0], qa_reporter)
+    return schema_path, qa_reporter.report["details"], artifact_writer.take_updates()
+
+
+def process_logical_models(structure_definition_dir: str, output_dir: str, qa_reporter: QAReporter,
+                           jobs: int = 1) -> int:
+    """
+    Process StructureDefinition JSON files and generate JSON schemas for logical models.
+    
+    With jobs > 1 the files are parsed and the schemas generated on a pool of
+    worker processes.
+    """
     logger = logging.getLogger(__name__)
     
     try:
@@ -677,59 +855,50 @@ def process_logical_models(structure_definition_dir: str, output_dir: str, qa_re
         for file_path in json_files:
             qa_reporter.add_file_expected(file_path, found=True)
         
-        # Parse logical models
+        # models are independent: with jobs > 1 they are parsed and their schemas
+        # generated on worker processes, and the results merged back in file order
+        pool = multiprocessing.get_context("spawn").Pool(jobs, initializer=setup_logging) if jobs > 1 else None
         try:
-            logical_models = parser.parse_logical_models(json_files)
-            qa_reporter.add_success(f"Found {len(logical_models)} logical models", {
-                "models_found": len(logical_models),
-                "model_names": [model['name'] for model in logical_models]
-            })
-            logger.info(f"Found {len(logical_models)} logical models")
-        except Exception as e:
-            qa_reporter.add_error(f"Error parsing logical models: {e}", {
-                "exception": str(e)
-            })
-            return 0
-        
-        # Generate schemas
-        schemas_generated = 0
-        schema_files = []
-        
-        for model in logical_models:
-            model_name = model['name']
-            logger.info(f"Generating schema for logical model: {model_name}")
-            
+            # Parse logical models
             try:
-                # Generate schema
-                schema = generator.generate_schema(model)
-                qa_reporter.add_success(f"Generated schema for model {model_name}")
-                
-                # Save schema
-                schema_path = generator.save_schema(schema, output_dir, model_name)
-                if schema_path:
-                    schemas_generated += 1
-                    schema_files.append(schema_path)
-                    
-                    qa_reporter.add_file_processed(schema_path, "success", {
-                        "model_name": model_name,
-                        "schema_size": len(json.dumps(schema))
-                    })
-                    
-                    qa_reporter.add_schema_generated({
-                        "model_name": model_name,
-                        "schema_file": schema_path,
-                        "properties_count": len(schema.get("properties", {})),
-                        "required_fields": schema.get("required", [])
-                    })
+                if pool:
+                    logical_models = [model for model in pool.map(parse_logical_model_in_worker, json_files) if model]
                 else:
-                    qa_reporter.add_error(f"Failed to save schema for model {model_name}")
-                    
+                    logical_models = parser.parse_logical_models(json_files)
+                qa_reporter.add_success(f"Found {len(logical_models)} logical models", {
+                    "models_found": len(logical_models),
+                    "model_names": [model.name for model in logical_models]
+                })
+                logger.info(f"Found {len(logical_models)} logical models")
             except Exception as e:
-                qa_reporter.add_error(f"Error processing logical model {model_name}: {e}", {
-                    "model_name": model_name,
+                qa_reporter.add_error(f"Error parsing logical models: {e}", {
                     "exception": str(e)
                 })
-                continue
+                return 0
+            
+            # Generate schemas
+            schemas_generated = 0
+            schema_files = []
+            
+            if pool:
+                results = pool.map(generate_model_schema_in_worker,
+                                   [(model, output_dir) for model in logical_models])
+                for schema_path, details, manifest_updates in results:
+                    qa_reporter.merge_details(details)
+                    artifact_writer.merge_updates(manifest_updates)
+                    if schema_path:
+                        schemas_generated += 1
+                        schema_files.append(schema_path)
+            else:
+                for model in logical_models:
+                    schema_path = generate_model_schema(model, output_dir, generator, qa_reporter)
+                    if schema_path:
+                        schemas_generated += 1
+                        schema_files.append(schema_path)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
         
         qa_reporter.add_success(f"Generated {schemas_generated} Logical Model schemas", {
             "schemas_generated": schemas_generated,
@@ -752,17 +921,29 @@ def main():
     # Initialize QA reporter
     qa_reporter = QAReporter("logical_model_schemas")
     
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(
+        description="Generate JSON schemas for the FHIR Logical Models of the IG",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("structure_definition_dir", nargs="?", default=None,
+                        help="Directory with the StructureDefinition JSON files (default: output)")
+    parser.add_argument("output_dir", nargs="?", default=None,
+                        help="Directory to write the schemas to (default: output, or . when a "
+                             "StructureDefinition directory is given)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes, 0 for one per CPU (default: 1)")
+    options = parser.parse_args()
+    jobs = options.jobs if options.jobs >= 1 else (os.cpu_count() or 1)
+    
     try:
-        # Parse command line arguments
-        if len(sys.argv) > 2:
-            structure_definition_dir = sys.argv[1]
-            output_dir = sys.argv[2]
-        elif len(sys.argv) > 1:
-            structure_definition_dir = sys.argv[1]
-            output_dir = "."
-        else:
+        if options.structure_definition_dir is None:
             structure_definition_dir = "output"
             output_dir = "output"
+        else:
+            structure_definition_dir = options.structure_definition_dir
+            output_dir = options.output_dir if options.output_dir is not None else "."
         
         logger.info(f"Processing StructureDefinition files from: {structure_definition_dir}")
         logger.info(f"Schema output directory: {output_dir}")
@@ -785,7 +966,7 @@ def main():
             })
             
             # Process logical models
-            schemas_generated = process_logical_models(structure_definition_dir, output_dir, qa_reporter)
+            schemas_generated = process_logical_models(structure_definition_dir, output_dir, qa_reporter, jobs)
             
             if schemas_generated > 0:
                 success_msg = f"Successfully generated {schemas_generated} logical model schemas"
@@ -806,6 +987,7 @@ def main():
         })
     
     finally:
+        artifact_writer.save_manifests()
         # Always save QA report regardless of success/failure
         try:
             # Save to protected location that won't be overwritten by IG publisher
@@ -10,20 +10,38 @@ The script is intended to be run after the IG publisher finishes processing
 to create schemas that can be used for validation of data against the
 expanded ValueSets.
 
+Every ValueSet is read from expansions.json once and handed to a set of
+sinks: the schema and display files are always generated, --jsonld adds the
+JSON-LD vocabularies of generate_jsonld_vocabularies.py (referencing one
+shared context document with --shared-context) and --system-files
+adds the system URI mapping files, all from the same pass. The code lookup
+index of code_index.py (valueset-code-index.sqlite) is written too unless
+--no-code-index is given, and --nquads (--nquads-gzip) adds one sorted
+N-Quads export of all JSON-LD vocabularies, ValueSets.nq(.gz). --jobs N spreads the ValueSets over N worker
+processes (0 for one per CPU).
+
 Usage:
-    python generate_valueset_schemas.py [expansions_json_path] [output_dir]
+    python generate_valueset_schemas.py [--jsonld [--shared-context]] [--system-files] [--no-code-index] [--nquads | --nquads-gzip] [--jobs N] [expansions_json_path] [output_dir]
 
 Author: SMART Guidelines Team
 """
 
+import abc
+import argparse
 import json
+import multiprocessing
 import os
 import sys
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from datetime import datetime
 
+import artifact_writer
+import code_index
+
+from expansions_reader import ExpansionsBundle
+
 
 def transform_codesystem_url(system_url: str) -> str:
     """
@@ -149,23 +167,25 @@ class QAReporter:
             return False
 
 
-def load_expansions_json(file_path: str) -> Optional[Dict[str, Any]]:
+def load_expansions_json(file_path: str) -> Optional[ExpansionsBundle]:
     """
-    Load and parse the expansions.json file.
+    Open the expansions.json file for streaming.
+    
+    Only the top-level members of the Bundle are read here; the entries are
+    decoded one at a time while iterating over the returned bundle.
     
     Args:
         file_path: Path to the expansions.json file
         
     Returns:
-        Parsed JSON data or None if failed to load
+        ExpansionsBundle or None if failed to load
     """
     logger = logging.getLogger(__name__)
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = ExpansionsBundle(file_path)
         
-        logger.info(f"Successfully loaded expansions.json from {file_path}")
+        logger.info(f"Successfully opened expansions.json from {file_path}")
         return data
     
     except FileNotFoundError:
@@ -806,10 +826,10 @@ def save_schema(schema: Dict[str, Any], output_dir: str, valueset_id: str) -> Op
         filepath = os.path.join(output_dir, filename)
         
         # Save schema
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(schema, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"Saved schema for ValueSet {valueset_id} to {filepath}")
+        if artifact_writer.write_json(schema, filepath):
+            logger.info(f"Saved schema for ValueSet {valueset_id} to {filepath}")
+        else:
+            logger.info(f"Unchanged schema for ValueSet {valueset_id}: {filepath}")
         return filepath
         
     except Exception as e:
@@ -840,10 +860,10 @@ def save_display_file(display_file: Dict[str, Any], output_dir: str, valueset_id
         filepath = os.path.join(output_dir, filename)
         
         # Save display file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(display_file, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"Saved display file for ValueSet {valueset_id} to {filepath}")
+        if artifact_writer.write_json(display_file, filepath):
+            logger.info(f"Saved display file for ValueSet {valueset_id} to {filepath}")
+        else:
+            logger.info(f"Unchanged display file for ValueSet {valueset_id}: {filepath}")
         return filepath
         
     except Exception as e:
@@ -874,10 +894,10 @@ def save_system_file(system_file: Dict[str, Any], output_dir: str, valueset_id:
         filepath = os.path.join(output_dir, filename)
         
         # Save system file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(system_file, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"Saved system file for ValueSet {valueset_id} to {filepath}")
+        if artifact_writer.write_json(system_file, filepath):
+            logger.info(f"Saved system file for ValueSet {valueset_id} to {filepath}")
+        else:
+            logger.info(f"Unchanged system file for ValueSet {valueset_id}: {filepath}")
         return filepath
         
     except Exception as e:
@@ -908,10 +928,10 @@ def save_jsonld_vocabulary(jsonld_vocab: Dict[str, Any], output_dir: str, values
         filepath = os.path.join(output_dir, filename)
         
         # Save JSON-LD vocabulary
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(jsonld_vocab, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"Saved JSON-LD vocabulary for ValueSet {valueset_id} to {filepath}")
+        if artifact_writer.write_json(jsonld_vocab, filepath):
+            logger.info(f"Saved JSON-LD vocabulary for ValueSet {valueset_id} to {filepath}")
+        else:
+            logger.info(f"Unchanged JSON-LD vocabulary for ValueSet {valueset_id}: {filepath}")
         return filepath
         
     except Exception as e:
@@ -991,87 +1011,359 @@ def generate_index_html(schema_files: List[str], output_dir: str) -> bool:
         return False
 
 
-def process_expansions(expansions_data: Dict[str, Any], output_dir: str) -> int:
+class ValueSetSink(abc.ABC):
     """
-    Process the expansions data and generate schemas for all ValueSets.
+    One kind of per-ValueSet output of process_expansions.
+
+    process_expansions walks expansions.json once, works out each ValueSet's
+    id and code/display/system list, and hands them to every sink. emit() may
+    run in a worker process (see --jobs); collect() always runs in the main
+    process, in expansions.json order, with whatever emit() returned.
+    """
+    name = "valueset"
+
+    @abc.abstractmethod
+    def emit(self, resource: Dict[str, Any], valueset_id: str,
+             codes_with_display: List[Dict[str, str]], output_dir: str,
+             shared: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Generate and save the artifact for one ValueSet, returning {'path': ...} or None.
+
+        shared holds what the sinks emitted before this one worked out for the
+        same ValueSet (e.g. the N-Quads lines of its JSON-LD vocabulary).
+        """
+
+    def collect(self, valueset_id: str, result: Optional[Dict[str, Any]]) -> None:
+        """Record the result of emit() for one ValueSet."""
+        pass
+
+    def finish(self, output_dir: str) -> None:
+        """Called once after all ValueSets were emitted."""
+        pass
+
+
+class SchemaSink(ValueSetSink):
+    """Writes ValueSet-{id}.schema.json."""
+    name = "schema"
+
+    def __init__(self):
+        self.schema_files: List[str] = []
+
+    def emit(self, resource, valueset_id, codes_with_display, output_dir, shared):
+        schema = generate_json_schema(resource, codes_with_display)
+        schema_path = save_schema(schema, output_dir, valueset_id)
+        return {'path': schema_path} if schema_path else None
+
+    def collect(self, valueset_id, result):
+        if result:
+            self.schema_files.append(result['path'])
+
+
+class DisplaySink(ValueSetSink):
+    """Writes ValueSet-{id}.displays.json."""
+    name = "display"
+
+    def emit(self, resource, valueset_id, codes_with_display, output_dir, shared):
+        display_file = generate_display_file(resource, codes_with_display)
+        display_path = save_display_file(display_file, output_dir, valueset_id)
+        return {'path': display_path} if display_path else None
+
+
+class SystemFileSink(ValueSetSink):
+    """
+    Writes ValueSet-{id}.system.json.
+
+    Not enabled by default: system URIs are embedded in the schema enum values
+    to match the JSON-LD IRI format.
+    """
+    name = "system"
+
+    def emit(self, resource, valueset_id, codes_with_display, output_dir, shared):
+        system_file = generate_system_file(resource, codes_with_display)
+        system_path = save_system_file(system_file, output_dir, valueset_id)
+        return {'path': system_path} if system_path else None
+
+
+class JsonLdSink(ValueSetSink):
+    """
+    Writes ValueSet-{id}.jsonld using generate_jsonld_vocabularies, so the
+    vocabularies come out of the same pass as the schemas. QA results are
+    recorded in that script's own report (qa_jsonld_vocabularies.json).
+    """
+    name = "jsonld"
+    shared_context = False
+
+    def __init__(self):
+        import generate_jsonld_vocabularies as jsonld
+        self.jsonld = jsonld
+        self.qa_reporter = jsonld.QAReporter("jsonld_vocabularies")
+        self.qa_reporter.add_success("Generating JSON-LD vocabularies with ValueSet schemas")
+
+    def emit(self, resource, valueset_id, codes_with_display, output_dir, shared):
+        quads = [] if shared.get('want_quads') else None
+        jsonld_path = self.jsonld.write_jsonld_vocabulary(resource, codes_with_display, output_dir,
+                                                          valueset_id, self.shared_context, quads)
+        if not jsonld_path:
+            return None
+        if quads is not None:
+            shared['quads'] = quads
+        return {
+            'path': jsonld_path,
+            'codes_count': len(codes_with_display),
+            'vocab_size': os.path.getsize(jsonld_path),
+            'has_context': True,
+            'has_graph': True
+        }
+
+    def collect(self, valueset_id, result):
+        if result:
+            self.qa_reporter.add_file_processed(result['path'], "success", {
+                "valueset_id": valueset_id,
+                "codes_count": result['codes_count'],
+                "vocab_size": result['vocab_size']
+            })
+            self.qa_reporter.add_vocabulary_generated({
+                "valueset_id": valueset_id,
+                "jsonld_file": result['path'],
+                "codes_count": result['codes_count'],
+                "has_context": result['has_context'],
+                "has_graph": result['has_graph']
+            })
+        else:
+            self.qa_reporter.add_error(f"Failed to save JSON-LD vocabulary for ValueSet {valueset_id}", {
+                "valueset_id": valueset_id
+            })
+
+    def finish(self, output_dir):
+        generated = len(self.qa_reporter.report["details"]["vocabularies_generated"])
+        if self.shared_context and generated:
+            context_path = self.jsonld.save_shared_context(output_dir)
+            if context_path:
+                self.qa_reporter.add_file_processed(context_path, "success")
+            else:
+                self.qa_reporter.add_error("Failed to save shared JSON-LD context")
+        self.qa_reporter.add_success(f"Generated {generated} JSON-LD vocabularies", {
+            "vocabularies_generated": generated
+        })
+        self.qa_reporter.save_report("input/temp/qa_jsonld_vocabularies.json",
+                                     "/tmp/qa_jsonld_vocabularies.json")
+
+
+class CodeIndexSink(ValueSetSink):
+    """
+    Writes the code lookup index (valueset-code-index.sqlite, see code_index.py)
+    covering every ValueSet. emit() only passes the codes on; the index is
+    filled in collect() and written once in finish().
+    """
+    name = "index"
+
+    def __init__(self):
+        self.writer: Optional[code_index.CodeIndexWriter] = None
+
+    def emit(self, resource, valueset_id, codes_with_display, output_dir, shared):
+        return {
+            'path': os.path.join(output_dir, code_index.INDEX_NAME),
+            'url': resource.get('url', ''),
+            'codes': [(item.get('system', ''), item['code'], item['display']) for item in codes_with_display]
+        }
+
+    def collect(self, valueset_id, result):
+        if not result:
+            return
+        if self.writer is None:
+            self.writer = code_index.CodeIndexWriter(result['path'])
+        self.writer.add_valueset(valueset_id, result['url'], result['codes'])
+
+    def finish(self, output_dir):
+        logger = logging.getLogger(__name__)
+        if self.writer is None:
+            return
+        try:
+            written = self.writer.close()
+        except Exception as e:
+            logger.error(f"Error saving code index: {e}")
+            self.writer.abort()
+            return
+        state = "Saved" if written else "Unchanged"
+        logger.info(f"{state} code index with {self.writer.valueset_count} ValueSets and "
+                    f"{self.writer.code_count} codes: {self.writer.path}")
+
+
+class SharedContextJsonLdSink(JsonLdSink):
+    """JsonLdSink whose vocabularies reference the shared ValueSets.context.jsonld."""
+    name = "jsonld-shared"
+    shared_context = True
+
+
+class NQuadsSink(ValueSetSink):
+    """
+    Writes the statements of every ValueSet's JSON-LD vocabulary to one
+    sorted ValueSets.nq file (see generate_jsonld_vocabularies.NQuadsExport)
+    for bulk loading into a triple store. emit() takes the N-Quads lines the
+    JSON-LD sink recorded while writing the .jsonld file, or renders them if
+    there is no JSON-LD sink; they are merged and written once in finish().
+    """
+    name = "nquads"
+    gzip = False
+
+    def __init__(self):
+        import generate_jsonld_vocabularies as jsonld
+        self.jsonld = jsonld
+        self.export: Optional[jsonld.NQuadsExport] = None
+
+    def emit(self, resource, valueset_id, codes_with_display, output_dir, shared):
+        lines = shared.get('quads')
+        if lines is None:
+            lines = self.jsonld.generate_vocabulary_quads(resource, codes_with_display)
+        return {
+            'path': os.path.join(output_dir, self.jsonld.NQUADS_NAME + (".gz" if self.gzip else "")),
+            'lines': lines
+        }
+
+    def collect(self, valueset_id, result):
+        if not result:
+            return
+        if self.export is None:
+            self.export = self.jsonld.NQuadsExport(result['path'])
+        self.export.add(result['lines'])
+
+    def finish(self, output_dir):
+        if self.export is not None:
+            self.export.save()
+
+
+class GzipNQuadsSink(NQuadsSink):
+    """NQuadsSink writing a gzip-compressed ValueSets.nq.gz."""
+    name = "nquads-gzip"
+    gzip = True
+
+
+SINK_TYPES = {sink.name: sink for sink in [SchemaSink, DisplaySink, SystemFileSink, JsonLdSink,
+                                           SharedContextJsonLdSink, CodeIndexSink,
+                                           NQuadsSink, GzipNQuadsSink]}
+
+# sinks of a worker process, created on first use (see emit_valueset_in_worker)
+worker_sinks: List[ValueSetSink] = []
+
+
+def emit_valueset(entry: Dict[str, Any], output_dir: str,
+                  sinks: List[ValueSetSink]) -> Optional[Tuple[str, List[Optional[Dict[str, Any]]]]]:
+    """
+    Generate every sink's artifact for one Bundle entry.
     
     Args:
-        expansions_data: Parsed expansions.json data
-        output_dir: Directory to save schema files
+        entry: Bundle entry from expansions.json
+        output_dir: Directory to save the artifacts
+        sinks: Sinks to emit to
         
     Returns:
-        Number of schemas successfully generated
+        Tuple of the ValueSet id and the emit() result of each sink, or None
+        if the entry is not a ValueSet with codes
     """
     logger = logging.getLogger(__name__)
     
-    # Check if it's a Bundle
-    if expansions_data.get('resourceType') != 'Bundle':
-        logger.error("Expansions data is not a FHIR Bundle")
-        return 0
+    if 'resource' not in entry:
+        logger.warning("Bundle entry has no resource")
+        return None
+        
+    resource = entry['resource']
     
-    # Check if Bundle has entries
-    if 'entry' not in expansions_data:
-        logger.warning("Bundle has no entries")
-        return 0
+    # Check if it's a ValueSet
+    if resource.get('resourceType') != 'ValueSet':
+        logger.debug(f"Skipping non-ValueSet resource: {resource.get('resourceType')}")
+        return None
     
-    schemas_generated = 0
-    schema_files = []
+    valueset_id = extract_valueset_id_from_entry(entry)
+    logger.info(f"Processing ValueSet: {valueset_id}")
     
-    # Process each entry
-    for entry in expansions_data['entry']:
-        if 'resource' not in entry:
-            logger.warning("Bundle entry has no resource")
-            continue
-            
-        resource = entry['resource']
-        
-        # Check if it's a ValueSet
-        if resource.get('resourceType') != 'ValueSet':
-            logger.debug(f"Skipping non-ValueSet resource: {resource.get('resourceType')}")
-            continue
-        
-        valueset_id = extract_valueset_id_from_entry(entry)
-        logger.info(f"Processing ValueSet: {valueset_id}")
-        
-        # Extract codes with displays from expansion
-        codes_with_display = extract_valueset_codes_with_display(resource, valueset_id)
-        
-        if not codes_with_display:
-            logger.warning(f"No codes found for ValueSet {valueset_id}, skipping schema generation")
-            continue
-        
-        # Generate schema
-        schema = generate_json_schema(resource, codes_with_display)
-        
-        # Generate display file
-        display_file = generate_display_file(resource, codes_with_display)
-        
-        # System file no longer needed - system URIs are embedded in schema enum values
-        # to match JSON-LD IRI format as requested
-        # system_file = generate_system_file(resource, codes_with_display)
-        
-        # Generate JSON-LD vocabulary (skipped - now handled by separate script)
-        # jsonld_vocab = generate_jsonld_vocabulary(resource, codes_with_display)
+    # Extract codes with displays from expansion
+    codes_with_display = extract_valueset_codes_with_display(resource, valueset_id)
+    
+    if not codes_with_display:
+        logger.warning(f"No codes found for ValueSet {valueset_id}, skipping schema generation")
+        return None
+    
+    # the JSON-LD sink records the vocabulary's N-Quads as it writes the
+    # .jsonld file, so an N-Quads sink after it does not generate them again
+    shared = {'want_quads': any(isinstance(sink, NQuadsSink) for sink in sinks)}
+    return valueset_id, [sink.emit(resource, valueset_id, codes_with_display, output_dir, shared)
+                         for sink in sinks]
+
+
+def emit_valueset_in_worker(task: Tuple[Dict[str, Any], str, List[str]]):
+    """
+    Pool entry point for emit_valueset: task is (entry, output_dir, sink names).
+    Returns the emit_valueset result and the artifact manifest updates.
+    """
+    entry, output_dir, sink_names = task
+    if not worker_sinks:
+        worker_sinks.extend(SINK_TYPES[name]() for name in sink_names)
+    return emit_valueset(entry, output_dir, worker_sinks), artifact_writer.take_updates()
+
+
+def process_expansions(expansions_data: ExpansionsBundle, output_dir: str,
+                       sinks: Optional[List[ValueSetSink]] = None, jobs: int = 1) -> int:
+    """
+    Process the expansions data and generate schemas for all ValueSets.
+    
+    Each ValueSet's id and codes are extracted once and passed to every sink.
+    With jobs > 1 the ValueSets are emitted on a pool of worker processes;
+    results are still collected in expansions.json order.
+    
+    Args:
+        expansions_data: Streaming expansions.json Bundle
+        output_dir: Directory to save schema files
+        sinks: Artifacts to generate, defaults to schema and display files
+        jobs: Number of worker processes
         
-        # Save schema
-        schema_path = save_schema(schema, output_dir, valueset_id)
-        if schema_path:
-            schema_files.append(schema_path)
+    Returns:
+        Number of ValueSets for which every sink saved its file
+    """
+    logger = logging.getLogger(__name__)
+    if sinks is None:
+        sinks = [SchemaSink(), DisplaySink()]
+    pool = None
+    
+    try:
+        # Check if it's a Bundle
+        if expansions_data.get('resourceType') != 'Bundle':
+            logger.error("Expansions data is not a FHIR Bundle")
+            return 0
         
-        # Save display file
-        display_path = save_display_file(display_file, output_dir, valueset_id)
+        # Check if Bundle has entries
+        if not expansions_data.has_entries:
+            logger.warning("Bundle has no entries")
+            return 0
         
-        # System file no longer generated - system URIs are embedded in schema enum values
-        # system_path = save_system_file(system_file, output_dir, valueset_id)
+        schemas_generated = 0
         
-        # Save JSON-LD vocabulary (skipped - now handled by separate script)
-        # jsonld_path = save_jsonld_vocabulary(jsonld_vocab, output_dir, valueset_id)
+        # Process each entry, decoded one at a time from the file
+        if jobs > 1:
+            pool = multiprocessing.get_context("spawn").Pool(jobs, initializer=setup_logging)
+            sink_names = [sink.name for sink in sinks]
+            results = pool.imap(emit_valueset_in_worker,
+                                ((entry, output_dir, sink_names) for entry in expansions_data),
+                                chunksize=8)
+        else:
+            results = ((emit_valueset(entry, output_dir, sinks), {}) for entry in expansions_data)
         
-        # Count as successful if schema and display files are saved
-        if schema_path and display_path:
-            schemas_generated += 1
-    
-
+        for result, manifest_updates in results:
+            artifact_writer.merge_updates(manifest_updates)
+            if result is None:
+                continue
+            valueset_id, sink_results = result
+            for sink, sink_result in zip(sinks, sink_results):
+                sink.collect(valueset_id, sink_result)
+            # Count as successful if every sink saved its file
+            if all(sink_results):
+                schemas_generated += 1
+    
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        for sink in sinks:
+            sink.finish(output_dir)
     
     logger.info(f"Generated {schemas_generated} ValueSet schemas")
     return schemas_generated
@@ -1084,16 +1376,48 @@ def main():
     qa_reporter.add_success("Starting ValueSet schema generation")
     
     # Parse command line arguments
-    if len(sys.argv) < 2:
-        # Default paths
-        expansions_path = "output/expansions.json"
-        output_dir = "output"  # Schemas will be saved directly to output/ directory
-    elif len(sys.argv) == 2:
-        expansions_path = sys.argv[1]
-        output_dir = "output"  # Schemas will be saved directly to output/ directory
-    else:
-        expansions_path = sys.argv[1]
-        output_dir = sys.argv[2]
+    parser = argparse.ArgumentParser(
+        description="Generate JSON schemas and related artifacts for the ValueSets in expansions.json",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("expansions_path", nargs="?", default="output/expansions.json",
+                        help="Path to expansions.json (default: output/expansions.json)")
+    parser.add_argument("output_dir", nargs="?", default="output",
+                        help="Directory to write the generated files to (default: output)")
+    parser.add_argument("--jsonld", action="store_true",
+                        help="Write the JSON-LD vocabulary of each ValueSet")
+    parser.add_argument("--shared-context", action="store_true",
+                        help="With --jsonld, reference one shared context document")
+    parser.add_argument("--system-files", action="store_true",
+                        help="Write the ValueSet-{id}.system.json system URI mapping files")
+    parser.add_argument("--no-code-index", action="store_true",
+                        help="Do not write the code lookup index (valueset-code-index.sqlite)")
+    nquads_group = parser.add_mutually_exclusive_group()
+    nquads_group.add_argument("--nquads", action="store_true",
+                              help="Write one sorted N-Quads export of all JSON-LD vocabularies (ValueSets.nq)")
+    nquads_group.add_argument("--nquads-gzip", action="store_true",
+                              help="Like --nquads, gzip compressed (ValueSets.nq.gz)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes, 0 for one per CPU (default: 1)")
+    options = parser.parse_args()
+    jobs = options.jobs if options.jobs >= 1 else (os.cpu_count() or 1)
+    expansions_path = options.expansions_path
+    output_dir = options.output_dir  # Schemas will be saved directly to output/ directory
+    
+    # Optional artifacts generated in the same pass over expansions.json
+    sinks = [SchemaSink(), DisplaySink()]
+    if options.jsonld:
+        sinks.append(SharedContextJsonLdSink() if options.shared_context else JsonLdSink())
+    if options.system_files:
+        sinks.append(SystemFileSink())
+    if not options.no_code_index:
+        sinks.append(CodeIndexSink())
+    if options.nquads_gzip:
+        sinks.append(GzipNQuadsSink())
+    elif options.nquads:
+        sinks.append(NQuadsSink())
+    qa_reporter.add_success(f"Generating: {', '.join(sink.name for sink in sinks)}")
     
     logger.info(f"Processing expansions from: {expansions_path}")
     logger.info(f"Output directory: {output_dir}")
@@ -1113,9 +1437,11 @@ def main():
     # Process expansions and generate schemas (continue even if expansions_data is None)
     try:
         if expansions_data:
-            schemas_count = process_expansions(expansions_data, output_dir)
+            schemas_count = process_expansions(expansions_data, output_dir, sinks, jobs)
         else:
             schemas_count = 0
+            for sink in sinks:
+                sink.finish(output_dir)
             qa_reporter.add_warning("No expansions data available - no schemas will be generated")
         
         if schemas_count > 0:
@@ -1128,6 +1454,7 @@ def main():
         logger.error(f"Error during schema generation: {e}")
         qa_reporter.add_error(f"Error during schema generation: {e}")
         schemas_count = 0
+    artifact_writer.save_manifests()
     
     # Finalize QA report
     qa_status = "completed" if schemas_count > 0 else "completed_with_warnings"
@@ -16,8 +16,12 @@ The installer serves as the central orchestrator for:
 Author: SMART Guidelines Team
 """
 import lxml.etree as ET
-from typing import Union, List, Dict, Optional
+from typing import Union, List, Dict, Optional, Tuple
+import copy
 import glob
+import hashlib
+import io
+import itertools
 import re
 import os
 import shutil
@@ -58,18 +62,25 @@ class installer(object):
     multifile_schema = None
     codesystem_manager = None
     xslts: Dict[str, ET.XSLT] = {}
+    # compiled stylesheets by path, so registering a transformer again is free
+    compiled_xslts: Dict[str, ET.XSLT] = {}
     temp_path: str = "temp"
+    # files written directly during extraction (transforms, multifile bundles)
+    written_files: List[str] = []
+    # log full file contents of multifile bundles (DAK_LOG_CONTENTS=true)
+    log_contents: bool = False
 
     @property
     def logger(self) -> logging.Logger:
         """Get logger instance for this class."""
         return logging.getLogger(self.__class__.__name__)
 
-    def __init__(self) -> None:
+    def __init__(self, logfile_path: Optional[str] = None) -> None:
 
         Path(self.temp_path).mkdir(exist_ok=True)
-        logfile_path = self.temp_path + "/" + \
-            os.path.basename(sys.argv[0]) + ".log"
+        if logfile_path is None:
+            logfile_path = self.temp_path + "/" + \
+                os.path.basename(sys.argv[0]) + ".log"
         log_handlers = [
             logging.StreamHandler(),
             logging.FileHandler(
@@ -79,6 +90,8 @@ class installer(object):
             level=logging.INFO,
             handlers=log_handlers,
             format='%(levelname)s (%(name)s): %(message)s')
+        if os.environ.get("DAK_LOG_CONTENTS", "false").lower() == "true":
+            self.log_contents = True
         if not self.read_sushi_config():
             raise Exception('Could not load sushi-config')
         Path("input/dmn").mkdir(exist_ok=True, parents=True)
@@ -132,8 +145,10 @@ class installer(object):
             self.logger.info("initializing xslt at " + xsl_file)
             for prefix, namespace in namespaces.items():
                 ET.register_namespace(prefix, namespace)
-            with open(Path(xsl_file), "rb") as f:
-                self.xslts[key] = ET.XSLT(ET.parse(f))
+            if xsl_file not in self.compiled_xslts:
+                with open(Path(xsl_file), "rb") as f:
+                    self.compiled_xslts[xsl_file] = ET.XSLT(ET.parse(f))
+            self.xslts[key] = self.compiled_xslts[xsl_file]
 
         except BaseException as e:
             self.logger.info("WARNING: Could not find XSLT at " + xsl_file)
@@ -188,8 +203,7 @@ class installer(object):
 
     def install(self) -> bool:
         self.install_aliases()
-        for cs_id, cs in self.codesystem_manager.render_codesystems().items():
-            self.add_resource('codesystems', cs_id, cs)
+        self.install_codesystems()
         self.install_resources()
         self.install_dmns()
         self.install_pages()
@@ -293,6 +307,76 @@ class installer(object):
             self.logger.info(f"\tError: {e}")
         return True
 
+    def iter_multifile_elements(self, multifile_xml: Union[str, bytes, ET.Element]):
+        """
+            Yields the <file> elements of a multi-file XML bundle one at a time.
+            Strings are parsed incrementally with iterparse and each element is
+            released once the caller is done with it, so a large bundle is never
+            held in memory as a whole.  Trees are walked in place.
+
+            Raises:
+                ValueError: if the root element is not <files> or the input type
+                is not recognised
+            """
+        if isinstance(multifile_xml, (str, bytes)):
+            if isinstance(multifile_xml, str):
+                multifile_xml = multifile_xml.encode("utf-8")
+            root = None
+            for event, elem in ET.iterparse(io.BytesIO(multifile_xml), events=("start", "end")):
+                if root is None:
+                    root = elem
+                    if root.tag != "files":
+                        raise ValueError(
+                            f"Expected root element <files>, got <{root.tag}> instead.")
+                    continue
+                if event == "end" and elem.tag == "file" and elem.getparent() is root:
+                    yield elem
+                    elem.clear()
+                    root.remove(elem)
+            return
+        if isinstance(multifile_xml, (ET._Element, ET.ElementBase)):
+            root = multifile_xml
+        elif hasattr(multifile_xml, "getroot"):  # ElementTree
+            root = multifile_xml.getroot()
+        else:
+            raise ValueError(
+                f"multifile_xml is not a recognized XML type: {type(multifile_xml)}")
+        if root.tag != "files":
+            raise ValueError(
+                f"Expected root element <files>, got <{root.tag}> instead.")
+        yield from root.iterchildren("file")
+
+    def validate_multifile_element(self, file_elem: ET.Element) -> bool:
+        """
+            Validates a single <file> element against multifile.xsd by wrapping a
+            copy of it in its own <files> root.
+            """
+        files = ET.Element("files")
+        files.append(copy.deepcopy(file_elem))
+        if self.multifile_schema.validate(files):
+            return True
+        for error in self.multifile_schema.error_log:
+            self.logger.info(f"XSD validation error: {error}")
+        return False
+
+    def write_file_atomic(self, file_path: str, content: bytes) -> None:
+        """
+            Writes content next to file_path and renames it into place, so readers
+            never see a partially written file.
+            """
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
     def process_multifile_xml(
             self, multifile_xml: Union[str, ET.Element]) -> bool:
         """
@@ -303,64 +387,47 @@ class installer(object):
               ...
             </files>
 
+            The bundle is streamed: each <file> element is validated against
+            multifile.xsd and written atomically before the next one is read.
+            Invalid elements are skipped.  Only paths and sizes are logged, unless
+            log_contents is set.
+
             Args:
                 multifile_xml: XML as string or lxml.etree.Element/ElementTree
 
             Returns:
                 True on success, False on error (with logging).
         """
+        result = True
+        count = 0
         try:
-            # Parse input if it's a string
-            if isinstance(multifile_xml, str):
-                try:
-                    root = ET.fromstring(multifile_xml)
-                except Exception as e:
+            for file_elem in self.iter_multifile_elements(multifile_xml):
+                count += 1
+                if self.log_contents:
                     self.logger.info(
-                        f"ERROR: Could not parse multifile_xml string: {e}")
-                    return False
-            elif isinstance(multifile_xml, (ET._Element, ET.ElementBase)):
-                root = multifile_xml
-            elif hasattr(multifile_xml, "getroot"):  # ElementTree
-                root = multifile_xml.getroot()
-            else:
-                self.logger.info(
-                    f"ERROR: multifile_xml is not a recognized XML type: {type(multifile_xml)}")
-                return False
-            self.logger.info(f"Multifile={ET.tostring(multifile_xml)}")
-
-            # Validate XML against schema
-            if not self.multifile_schema.validate(multifile_xml):
-                self.logger.info("XML failed XSD validation!")
-                for error in self.multifile_schema.error_log:
-                    self.logger.info(f"XSD validation error: {error}")
-                return False
-
-            if root.tag != "files":
-                self.logger.info(
-                    f"ERROR: Expected root element <files>, got <{root.tag}> instead.")
-                return False
-            file_elements = root.findall("file")
-            if not file_elements:
-                self.logger.info(
-                    "WARNING: No <file> elements found in multifile XML.")
-                return False
-            for file_elem in file_elements:
+                        "Multifile element=" + ET.tostring(file_elem, encoding="unicode"))
+                if not self.validate_multifile_element(file_elem):
+                    self.logger.info(
+                        f"ERROR: <file> element #{count} failed XSD validation, skipping.")
+                    result = False
+                    continue
                 file_path = file_elem.get("name")
-                self.logger.info("Extracting " + file_path)
-                mime_type = file_elem.get("mime-type", "text/plain")
-                # content = etree.XML(file_elem.text) or ""
-                content = file_elem.text
                 if not file_path:
                     self.logger.info(
                         "ERROR: <file> element missing 'name' attribute, skipping.")
                     continue
+                self.logger.info("Extracting " + file_path)
+                mime_type = file_elem.get("mime-type", "text/plain")
+                content = file_elem.text or ""
 
                 try:
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(content)
-                        self.logger.info(
-                            f"Created file: {file_path} (mime-type: {mime_type}, {len(content)} bytes) with content:" + str(content))
+                    data = content.encode("utf-8")
+                    self.write_file_atomic(file_path, data)
+                    self.written_files.append(file_path)
+                    self.logger.info(
+                        f"Created file: {file_path} (mime-type: {mime_type}, {len(data)} bytes)")
+                    if self.log_contents:
+                        self.logger.info("With content:\n" + content)
                 except Exception as fe:
                     self.logger.info(
                         f"ERROR: Could not write to file '{file_path}': {fe}")
@@ -370,11 +437,46 @@ class installer(object):
             self.logger.info(f"FATAL ERROR in process_multifile_xml: {ex}")
             return False
 
-        return True
+        if count == 0:
+            self.logger.info(
+                "WARNING: No <file> elements found in multifile XML.")
+            return False
+        return result
+
+    def parse_xml(self, prefix: str, xml: Union[str, Path, ET.ElementTree]):
+        """
+            Turns a document given to transform_xml() into a tree.  Parsed trees are
+            used as is, a Path is parsed straight from the file and a string has its
+            XML declaration stripped before parsing.  Trees built here are indented
+            so that the whitespace seen by the XSLT does not depend on the input form.
+
+            Returns:
+                The parsed tree, or False (with logging) if it could not be parsed
+            """
+        if isinstance(xml, ET._ElementTree) or isinstance(xml, ET._Element):
+            return xml
+        try:
+            if isinstance(xml, Path):
+                xml_tree = ET.parse(str(xml))
+            elif isinstance(xml, str):
+                xml_tree = ET.XML(re.sub(r'<\?xml[^>]+\?>', '', xml))
+            else:
+                self.logger.info("invalid xml sent to transformer=" + str(xml))
+                return False
+            ET.indent(xml_tree)
+        except BaseException as e:
+            self.logger.info(
+                "ERROR: Generated invalid XML for " +
+                prefix +
+                "\n" +
+                f"\tError: {e}\n")
+            return False
+        return xml_tree
 
     def transform_xml(self,
                       prefix: str,
                       xml: Union[str,
+                                 Path,
                                  ET.ElementTree],
                       out_path: Union[str,
                                       Path,
@@ -384,24 +486,40 @@ class installer(object):
             self.logger.info(
                 "trying to transform unregistered thing " + prefix)
             return False
-        if isinstance(xml, ET._ElementTree) or isinstance(xml, ET._Element):
-            xml_tree = xml
-        elif isinstance(xml, str):
-            xml = re.sub(r'<\?xml[^>]+\?>', '', xml)
-            try:
-                xml_tree = ET.XML(xml)
-                ET.indent(xml_tree)
-            except BaseException as e:
-                self.logger.info(
-                    "ERROR: Generated invalid XML for " +
-                    prefix +
-                    "\n" +
-                    f"\tError: {e}\n")
-                return False
-        else:
-            self.logger.info("invalid xml sent to transformer=" + str(xml))
+        xml_tree = self.parse_xml(prefix, xml)
+        if xml_tree is False:
             return False
+        return self.apply_transform(prefix, xml_tree, out_path, process_multiline)
+
+    def transform_xml_batch(self,
+                            prefix: str,
+                            documents: List[Tuple[Union[str, Path, ET.ElementTree],
+                                                  Union[str, Path, bool]]],
+                            process_multiline=False) -> List:
+        """
+            Applies the registered XSLT for prefix to many documents.  Each document
+            is a (xml, out_path) pair accepting the same values as transform_xml();
+            documents are parsed one at a time so only one input tree is alive.
 
+            Returns:
+                The transform_xml() result for each document, in order
+            """
+        if prefix not in self.xslts:
+            self.logger.info(
+                "trying to transform unregistered thing " + prefix)
+            return [False] * len(documents)
+        results = []
+        for xml, out_path in documents:
+            xml_tree = self.parse_xml(prefix, xml)
+            if xml_tree is False:
+                results.append(False)
+                continue
+            results.append(self.apply_transform(
+                prefix, xml_tree, out_path, process_multiline))
+        return results
+
+    def apply_transform(self, prefix: str, xml_tree, out_path: Union[str, Path, bool] = False,
+                        process_multiline=False):
         try:
             out = self.xslts[prefix](xml_tree)
             if out_path:
@@ -410,15 +528,15 @@ class installer(object):
                     prefix +
                     " to " +
                     str(out_path))
-                out = str(
-                    ET.tostring(
-                        out.getroot(),
-                        encoding="unicode",
-                        pretty_print=True,
-                        doctype=None))
-                out_file = open(out_path, "w", encoding="utf-8")
-                out_file.write(out)
-                out_file.close()
+                # serialise straight to UTF-8 bytes, no intermediate python string
+                with open(out_path, "wb") as out_file:
+                    out_file.write(
+                        ET.tostring(
+                            out.getroot(),
+                            encoding="utf-8",
+                            pretty_print=True,
+                            doctype=None))
+                self.written_files.append(str(out_path))
             elif process_multiline:
                 return self.process_multifile_xml(out)
             else:
@@ -461,21 +579,78 @@ class installer(object):
 
         return True
 
+    def install_codesystems(self) -> bool:
+        """
+            Streams the FSH of every registered CodeSystem to input/fsh/codesystems,
+            one code at a time, leaving files whose content did not change untouched.
+            """
+        result = True
+        for cs_id in self.codesystem_manager.codesystems.keys():
+            file_path = "input/fsh/codesystems/" + cs_id + ".fsh"
+            try:
+                # the trailing newline matches the print() used for other resources
+                chunks = itertools.chain(self.codesystem_manager.iter_codesystem(cs_id), ["\n"])
+                if self.write_fsh_if_changed(file_path, chunks):
+                    self.logger.info("Installed " + file_path)
+                else:
+                    self.logger.info("Unchanged " + file_path)
+            except IOError as e:
+                result = False
+                self.logger.info("Could not save codesystem with id: " + cs_id + "\n")
+                self.logger.info(f"\tError: {e}")
+        return result
+
+    def write_fsh_if_changed(self, file_path: str, chunks) -> bool:
+        """
+            Writes text chunks to file_path via a temporary file, hashing them on the
+            way. If the result is identical to the file already on disk the temporary
+            file is discarded, so the existing file keeps its mtime.
+
+            Returns:
+                True if file_path was (re)written, False if it was unchanged
+            """
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        sha = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    data = chunk.encode("utf-8")
+                    sha.update(data)
+                    f.write(data)
+            if os.path.exists(file_path) and self.hash_file(file_path) == sha.hexdigest():
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def hash_file(self, file_path: str) -> str:
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
     def install_resources(self):
         result = True
         for directory, instances in self.resources.items():
             for id, resource in instances.items():
                 try:
                     file_path = "input/fsh/" + directory + "/" + id + ".fsh"
-                    Path(
-                        "input/fsh/" +
-                        directory).mkdir(
-                        exist_ok=True,
-                        parents=True)
-                    file = open(file_path, "w")
-                    print(resource, file=file)
-                    file.close()
-                    self.logger.info("Installed " + file_path)
+                    if isinstance(resource, codesystem_manager.valueset_fsh):
+                        chunks = itertools.chain(resource, ["\n"])
+                    else:
+                        chunks = [str(resource), "\n"]
+                    if self.write_fsh_if_changed(file_path, chunks):
+                        self.logger.info("Installed " + file_path)
+                    else:
+                        self.logger.info("Unchanged " + file_path)
                 except IOError as e:
                     result = False
                     self.logger.info(
@@ -487,6 +662,57 @@ class installer(object):
                     self.logger.info(f"\tError: {e}")
         return result
 
+    def get_state(self) -> Dict:
+        """
+            Returns a picklable snapshot of everything registered on this installer
+            (resources, CQL, DMN, pages, aliases and codesystems) so that work done
+            in another process can be merged back with merge_state().
+            """
+        return {
+            'resources': self.resources,
+            'cqls': self.cqls,
+            'pages': self.pages,
+            'dmn_tables': self.dmn_tables,
+            'aliases': self.aliases,
+            'files': self.written_files,
+            'codesystems': self.codesystem_manager.get_state()}
+
+    def merge_state(self, state: Dict) -> bool:
+        """
+            Merges a snapshot produced by get_state() into this installer.  Entries
+            are applied in their original order so that merging the snapshots of
+            several input files, in file order, gives the same result as
+            extracting those files one after another in this process.
+            """
+        for dir, instances in state['resources'].items():
+            for id, resource in instances.items():
+                self.add_resource(dir, id, resource)
+        for id, cql in state['cqls'].items():
+            self.add_cql(id, cql)
+        for id, page in state['pages'].items():
+            self.add_page(id, page)
+        for dt_id, dt_dmn in state['dmn_tables'].items():
+            self.add_dmn_table(dt_id, dt_dmn)
+        self.add_aliases(state['aliases'])
+        for file_path in state['files']:
+            if file_path not in self.written_files:
+                self.written_files.append(file_path)
+        return self.codesystem_manager.merge_state(state['codesystems'])
+
+    def get_state_outputs(self, state: Dict) -> List[str]:
+        """
+            Lists the files that installing a snapshot from get_state() produces,
+            including the files that were written directly while extracting.
+            """
+        outputs = list(state['files'])
+        for dir, instances in state['resources'].items():
+            outputs += ["input/fsh/" + dir + "/" + id + ".fsh" for id in instances]
+        outputs += ["input/fsh/codesystems/" + id + ".fsh" for id in state['codesystems']['codesystems']]
+        outputs += ["input/cql/" + id + ".cql" for id in state['cqls']]
+        outputs += ["input/pagecontent/" + id + ".md" for id in state['pages']]
+        outputs += [str(Path("input/dmn/") / f"{id}.dmn") for id in state['dmn_tables']]
+        return sorted(set(outputs))
+
     def add_resource(self, dir: str, id: str, resource: str) -> bool:
         self.resources[dir][id] = resource
         return True
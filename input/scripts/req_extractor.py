@@ -29,6 +29,7 @@ class req_extractor(extractor):
     converting them into appropriate FHIR resources for use in clinical
     decision support implementations.
     """
+    parallel_safe: bool = True
 
     def __init__(self, installer: installer) -> None:
         super().__init__(installer)
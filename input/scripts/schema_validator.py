@@ -0,0 +1,743 @@
+#!/usr/bin/env python3
+"""
+Bulk Validator for the Generated Logical Model and ValueSet JSON Schemas
+
+generate_logical_model_schemas.py and generate_valueset_schemas.py write one
+StructureDefinition-{name}.schema.json per logical model and one
+ValueSet-{id}.schema.json per ValueSet, the logical model schemas referencing
+the ValueSet ones with relative $refs. This script validates instances
+against those schemas offline, e.g. data exported from a DAK implementation.
+
+All *.schema.json files of the schema directory are loaded once and every
+schema is compiled into a tree of small validator functions:
+
+- $refs between the schema files (./ValueSet-X.schema.json, absolute $ids
+  and #/json/pointer fragments) are resolved locally, never over the network
+- enum and const are turned into hash-set lookups
+- keywords that only annotate (description, examples, fhir:*, ...) cost
+  nothing at validation time
+
+A valid instance is checked without building any error messages; the paths
+of the errors are only put together for invalid instances.
+
+Only the JSON Schema keywords used by the generated schemas and the common
+structural ones are supported: type, enum, const, properties, required,
+additionalProperties, items, minItems, maxItems, uniqueItems, minLength,
+maxLength, pattern, minimum, maximum, exclusiveMinimum, exclusiveMaximum,
+allOf, anyOf, oneOf, not and $ref. "format" is an annotation unless
+--check-formats is given.
+
+Usage:
+    python schema_validator.py [--schema-dir DIR] [--schema NAME] [--jobs N]
+                               [--check-formats] [--max-errors N]
+                               [--report FILE] [instances.ndjson ...]
+
+The instance files hold one JSON instance per line (NDJSON); without files,
+or with "-", instances are read from stdin. Each instance is validated
+against the logical model schema named by its resourceType, or against the
+schema given with --schema (e.g. --schema ValueSet-VS0 for Codings). With
+--jobs N the lines are validated on N worker processes (0 for one per CPU).
+
+Exits with status 1 if any instance is invalid.
+
+Author: SMART Guidelines Team
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# a compiled validator returns None for a valid value, else a list of
+# (JSON pointer relative to the value, message) errors
+Validator = Callable[[Any], Optional[List[Tuple[str, str]]]]
+
+# keywords without effect on validation
+ANNOTATION_KEYWORDS = frozenset([
+    "$schema", "$id", "$comment", "$defs", "definitions", "title", "description",
+    "examples", "example", "default", "narrative", "format", "readOnly", "writeOnly",
+    "deprecated",
+])
+
+# "format" assertions for --check-formats, following the FHIR datatype regexes
+# so that partial dates such as "2024" or "2024-05" are accepted
+FORMAT_PATTERNS = {
+    "date": re.compile(r"\d{4}(-(0[1-9]|1[0-2])(-(0[1-9]|[12]\d|3[01]))?)?"),
+    "date-time": re.compile(r"\d{4}(-(0[1-9]|1[0-2])(-(0[1-9]|[12]\d|3[01])"
+                            r"(T([01]\d|2[0-3]):[0-5]\d:([0-5]\d|60)(\.\d+)?(Z|[+-]\d{2}:\d{2}))?)?)?"),
+    "time": re.compile(r"([01]\d|2[0-3]):[0-5]\d:([0-5]\d|60)(\.\d+)?"),
+    "uuid": re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"),
+    "uri": re.compile(r"\S+"),
+}
+
+LINES_PER_TASK = 1000
+
+
+def setup_logging() -> logging.Logger:
+    """Configure logging for the script."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    return logging.getLogger(__name__)
+
+
+class SchemaError(Exception):
+    """Raised for a schema that cannot be loaded or compiled."""
+
+
+def freeze(value: Any) -> Any:
+    """
+    Hashable form of a JSON value for enum/const/uniqueItems lookups.
+
+    Booleans are tagged because Python treats True == 1, while 1 and 1.0 stay
+    equal as in JSON Schema.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return ("boolean", value)
+    if isinstance(value, dict):
+        return ("object", frozenset((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return ("array", tuple(freeze(v) for v in value))
+    return value
+
+
+def is_integer(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": is_integer,
+    "number": is_number,
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+# JSON types that map to a single Python type (bool is not an int here)
+PYTHON_TYPES = {"object": dict, "array": list, "string": str, "boolean": bool, "null": type(None)}
+
+
+def escape_pointer(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def prefix_errors(prefix: str, errors: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [(prefix + path, message) for path, message in errors]
+
+
+class SchemaRegistry:
+    """
+    The *.schema.json files of a directory, compiled on demand.
+
+    Attributes:
+        schema_dir: Directory holding the schema files
+        check_formats: Whether "format" is asserted (see FORMAT_PATTERNS)
+        documents: Schema file name -> parsed schema
+        ids: Schema $id -> schema file name
+        compiled: (file name, JSON pointer) -> compiled validator
+        ignored_keywords: Keywords found in the schemas that are not supported
+    """
+
+    def __init__(self, schema_dir: str, check_formats: bool = False):
+        self.schema_dir = schema_dir
+        self.check_formats = check_formats
+        self.documents: Dict[str, Any] = {}
+        self.ids: Dict[str, str] = {}
+        self.compiled: Dict[Tuple[str, str], Validator] = {}
+        # $ref targets are compiled after the schema referencing them, so that
+        # recursive references work: the cells are filled in by compile_pending
+        self.ref_cells: Dict[Tuple[str, str], List[Optional[Validator]]] = {}
+        self.pending: List[Tuple[str, str]] = []
+        self.ignored_keywords: Counter = Counter()
+        self.logger = logging.getLogger(__name__)
+        self.load()
+
+    def load(self) -> None:
+        for schema_path in sorted(Path(self.schema_dir).glob("*.schema.json")):
+            try:
+                with open(schema_path, "r", encoding="utf-8") as f:
+                    schema = json.load(f)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Skipping unreadable schema {schema_path}: {e}")
+                continue
+            self.documents[schema_path.name] = schema
+            if isinstance(schema, dict) and isinstance(schema.get("$id"), str):
+                self.ids[schema["$id"]] = schema_path.name
+
+    def find_schema(self, name: str) -> Optional[str]:
+        """
+        Return the schema file name for a file name, a file name without
+        '.schema.json', a logical model name or a $id.
+        """
+        for candidate in (name, f"{name}.schema.json", f"StructureDefinition-{name}.schema.json"):
+            if candidate in self.documents:
+                return candidate
+        return self.ids.get(name)
+
+    def get_validator(self, name: str) -> Optional[Validator]:
+        """Return the compiled validator of a schema (see find_schema), or None if unknown."""
+        filename = self.find_schema(name)
+        if filename is None:
+            return None
+        key = (filename, "")
+        if key not in self.compiled:
+            self.compiled[key] = self.compile(self.documents[filename], filename)
+            self.compile_pending()
+        return self.compiled[key]
+
+    def compile_all(self) -> int:
+        """Compile every loaded schema up front, returning the number of schemas."""
+        for filename in self.documents:
+            self.get_validator(filename)
+        return len(self.documents)
+
+    def compile_pending(self) -> None:
+        while self.pending:
+            key = self.pending.pop()
+            if key not in self.compiled:
+                filename, pointer = key
+                self.compiled[key] = self.compile(self.resolve_pointer(filename, pointer), filename)
+            self.ref_cells[key][0] = self.compiled[key]
+
+    def resolve_pointer(self, filename: str, pointer: str) -> Any:
+        node = self.documents[filename]
+        for token in pointer.split("/")[1:]:
+            token = token.replace("~1", "/").replace("~0", "~")
+            try:
+                node = node[int(token)] if isinstance(node, list) else node[token]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise SchemaError(f"Cannot resolve #{pointer} in {filename}")
+        return node
+
+    def resolve_ref(self, ref: str, base: str) -> Optional[Tuple[str, str]]:
+        """Resolve a $ref found in schema file base to (file name, JSON pointer)."""
+        target, _, pointer = ref.partition("#")
+        if not target:
+            filename = base
+        elif target in self.ids:
+            filename = self.ids[target]
+        else:
+            # relative references and $ids under another base URL: match by file name
+            filename = target.rstrip("/").rsplit("/", 1)[-1]
+            if filename not in self.documents:
+                return None
+        return filename, pointer
+
+    def compile_ref(self, ref: str, base: str) -> Validator:
+        key = self.resolve_ref(ref, base)
+        if key is None:
+            self.logger.warning(f"Unresolved $ref {ref} in {base}")
+            error = [("", f"unresolved $ref {ref}")]
+            return lambda value: error
+        if key not in self.ref_cells:
+            self.ref_cells[key] = [None]
+            self.pending.append(key)
+        cell = self.ref_cells[key]
+        return lambda value: cell[0](value)
+
+    def compile(self, node: Any, base: str) -> Validator:
+        """
+        Compile a schema node of schema file base into a validator.
+
+        Args:
+            node: Schema object or boolean schema
+            base: Schema file name that relative $refs are resolved against
+
+        Returns:
+            Function returning None for a valid value, else the list of errors
+        """
+        if node is True or node == {}:
+            return lambda value: None
+        if node is False:
+            error = [("", "no value is allowed here")]
+            return lambda value: error
+        if not isinstance(node, dict):
+            raise SchemaError(f"Invalid schema node in {base}: {node!r}")
+
+        checks: List[Validator] = []
+        for keyword in node:
+            if keyword not in ANNOTATION_KEYWORDS and keyword not in self.keyword_compilers \
+                    and not keyword.startswith(("fhir:", "jsonld:", "x-")):
+                self.ignored_keywords[keyword] += 1
+
+        if "$ref" in node:
+            checks.append(self.compile_ref(node["$ref"], base))
+        # "type": "object" / "array" is checked by check_object / check_items
+        # when the node has properties or items, saving a call per value
+        fused_type = node.get("type") if node.get("type") in ("object", "array") else None
+        if fused_type == "object" and not ("properties" in node or "required" in node):
+            fused_type = None
+        if fused_type == "array" and not isinstance(node.get("items"), (dict, bool)):
+            fused_type = None
+        object_checks = self.compile_object(node, base, fused_type == "object")
+        array_checks = self.compile_array(node, base, fused_type == "array")
+        if fused_type == "object" and not object_checks:
+            # e.g. empty properties and required: nothing to fuse the type check into
+            fused_type = None
+        if "type" in node and not fused_type:
+            checks.append(self.compile_type(node["type"]))
+        if "enum" in node:
+            checks.append(self.compile_enum(node["enum"]))
+        if "const" in node:
+            checks.append(self.compile_const(node["const"]))
+        if self.check_formats and node.get("format") in FORMAT_PATTERNS:
+            checks.append(self.compile_format(node["format"]))
+        checks.extend(object_checks)
+        checks.extend(array_checks)
+        for compiler in (self.compile_string, self.compile_number, self.compile_combinators):
+            checks.extend(compiler(node, base))
+
+        if not checks:
+            return lambda value: None
+        if len(checks) == 1:
+            return checks[0]
+        if len(checks) == 2:
+            first, second = checks
+
+            def check_two(value):
+                errors = first(value)
+                more = second(value)
+                if more:
+                    return errors + more if errors else more
+                return errors
+            return check_two
+
+        def check_all(value):
+            errors = None
+            for check in checks:
+                more = check(value)
+                if more:
+                    errors = errors + more if errors else more
+            return errors
+        return check_all
+
+    # keywords handled by compile() and the compile_* methods below
+    keyword_compilers = frozenset([
+        "$ref", "type", "enum", "const", "properties", "required", "additionalProperties",
+        "items", "minItems", "maxItems", "uniqueItems", "minLength", "maxLength", "pattern",
+        "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "allOf", "anyOf",
+        "oneOf", "not",
+    ])
+
+    def compile_type(self, types: Any) -> Validator:
+        if isinstance(types, str):
+            types = [types]
+        unknown = [t for t in types if t not in TYPE_CHECKS]
+        if unknown:
+            raise SchemaError(f"Unknown type {unknown[0]}")
+        error = [("", f"expected type {' or '.join(types)}")]
+        if len(types) == 1 and types[0] in PYTHON_TYPES:
+            python_type = PYTHON_TYPES[types[0]]
+            return lambda value: None if isinstance(value, python_type) else error
+        if len(types) == 1:
+            type_check = TYPE_CHECKS[types[0]]
+            return lambda value: None if type_check(value) else error
+        type_checks = [TYPE_CHECKS[t] for t in types]
+        return lambda value: None if any(check(value) for check in type_checks) else error
+
+    def compile_enum(self, values: List[Any]) -> Validator:
+        error = [("", f"value is not one of the {len(values)} allowed values")]
+        if all(isinstance(v, str) for v in values):
+            # codes of a ValueSet: a plain string set
+            allowed = frozenset(values)
+            return lambda value: None if isinstance(value, str) and value in allowed else error
+        allowed = frozenset(freeze(v) for v in values)
+
+        def check_enum(value):
+            try:
+                return None if freeze(value) in allowed else error
+            except TypeError:
+                return error
+        return check_enum
+
+    def compile_const(self, expected: Any) -> Validator:
+        frozen = freeze(expected)
+        error = [("", f"value must be {json.dumps(expected, ensure_ascii=False)}")]
+        if isinstance(expected, str):
+            return lambda value: None if value == expected and isinstance(value, str) else error
+        return lambda value: None if freeze(value) == frozen else error
+
+    def compile_format(self, format_name: str) -> Validator:
+        pattern = FORMAT_PATTERNS[format_name].fullmatch
+        error = [("", f"value is not a valid {format_name}")]
+        return lambda value: None if not isinstance(value, str) or pattern(value) else error
+
+    def compile_object(self, node: Dict[str, Any], base: str, typed: bool = False) -> List[Validator]:
+        properties = {name: self.compile(schema, base)
+                      for name, schema in node.get("properties", {}).items()}
+        required = list(node.get("required", []))
+        additional = node.get("additionalProperties", True)
+        if not properties and not required and additional is True:
+            return []
+        additional_check = None if additional in (True, False) else self.compile(additional, base)
+        allow_additional = additional is not False
+        type_error = [("", "expected type object")] if typed else None
+
+        def check_object(value):
+            if not isinstance(value, dict):
+                return type_error
+            errors = None
+            for name in required:
+                if name not in value:
+                    errors = errors or []
+                    errors.append(("", f"missing required property '{name}'"))
+            for name, item in value.items():
+                check = properties.get(name)
+                if check is None:
+                    if not allow_additional:
+                        errors = errors or []
+                        errors.append(("", f"property '{name}' is not allowed"))
+                        continue
+                    check = additional_check
+                    if check is None:
+                        continue
+                item_errors = check(item)
+                if item_errors:
+                    errors = errors or []
+                    errors.extend(prefix_errors("/" + escape_pointer(name), item_errors))
+            return errors
+        return [check_object]
+
+    def compile_array(self, node: Dict[str, Any], base: str, typed: bool = False) -> List[Validator]:
+        checks = []
+        if "items" in node and isinstance(node["items"], (dict, bool)):
+            item_check = self.compile(node["items"], base)
+            type_error = [("", "expected type array")] if typed else None
+
+            def check_items(value):
+                if not isinstance(value, list):
+                    return type_error
+                errors = None
+                for index, item in enumerate(value):
+                    item_errors = item_check(item)
+                    if item_errors:
+                        errors = errors or []
+                        errors.extend(prefix_errors(f"/{index}", item_errors))
+                return errors
+            checks.append(check_items)
+        if "minItems" in node:
+            min_items = node["minItems"]
+            error = [("", f"expected at least {min_items} items")]
+            checks.append(lambda value, error=error: error if isinstance(value, list) and len(value) < min_items else None)
+        if "maxItems" in node:
+            max_items = node["maxItems"]
+            error = [("", f"expected at most {max_items} items")]
+            checks.append(lambda value, error=error: error if isinstance(value, list) and len(value) > max_items else None)
+        if node.get("uniqueItems"):
+            error = [("", "items are not unique")]
+            checks.append(lambda value, error=error: error if isinstance(value, list)
+                          and len(set(map(freeze, value))) < len(value) else None)
+        return checks
+
+    def compile_string(self, node: Dict[str, Any], base: str) -> List[Validator]:
+        checks = []
+        if "minLength" in node:
+            min_length = node["minLength"]
+            error = [("", f"expected at least {min_length} characters")]
+            checks.append(lambda value, error=error: error if isinstance(value, str) and len(value) < min_length else None)
+        if "maxLength" in node:
+            max_length = node["maxLength"]
+            error = [("", f"expected at most {max_length} characters")]
+            checks.append(lambda value, error=error: error if isinstance(value, str) and len(value) > max_length else None)
+        if "pattern" in node:
+            search = re.compile(node["pattern"]).search
+            error = [("", f"value does not match pattern {node['pattern']}")]
+            checks.append(lambda value, error=error: error if isinstance(value, str) and not search(value) else None)
+        return checks
+
+    def compile_number(self, node: Dict[str, Any], base: str) -> List[Validator]:
+        checks = []
+        bounds = [
+            ("minimum", lambda value, limit: value < limit, "at least"),
+            ("maximum", lambda value, limit: value > limit, "at most"),
+            ("exclusiveMinimum", lambda value, limit: value <= limit, "greater than"),
+            ("exclusiveMaximum", lambda value, limit: value >= limit, "less than"),
+        ]
+        for keyword, violates, wording in bounds:
+            if is_number(node.get(keyword)):
+                limit = node[keyword]
+                error = [("", f"value must be {wording} {limit}")]
+                checks.append(lambda value, limit=limit, violates=violates, error=error:
+                              error if is_number(value) and violates(value, limit) else None)
+        return checks
+
+    def compile_combinators(self, node: Dict[str, Any], base: str) -> List[Validator]:
+        checks = []
+        for subschema in node.get("allOf", []):
+            checks.append(self.compile(subschema, base))
+        if "anyOf" in node:
+            options = [self.compile(subschema, base) for subschema in node["anyOf"]]
+            any_of_error = [("", f"value does not match any of the {len(options)} anyOf schemas")]
+            checks.append(lambda value: None if any(option(value) is None for option in options) else any_of_error)
+        if "oneOf" in node:
+            options = [self.compile(subschema, base) for subschema in node["oneOf"]]
+
+            def check_one_of(value):
+                matches = sum(1 for option in options if option(value) is None)
+                if matches == 1:
+                    return None
+                return [("", f"value matches {matches} of the oneOf schemas instead of exactly one")]
+            checks.append(check_one_of)
+        if "not" in node:
+            negated = self.compile(node["not"], base)
+            not_error = [("", "value matches the 'not' schema")]
+            checks.append(lambda value: not_error if negated(value) is None else None)
+        return checks
+
+
+class ValidationStats:
+    """
+    Counters of a bulk validation run.
+
+    Attributes:
+        instances: Number of lines with an instance
+        valid: Number of valid instances
+        invalid: Number of invalid instances (including unparseable lines)
+        by_schema: Schema file name -> number of instances validated against it
+        errors: The first max_errors errors as {'line', 'schema', 'path', 'message'}
+        error_count: Total number of errors
+    """
+
+    def __init__(self, max_errors: int = 100):
+        self.max_errors = max_errors
+        self.instances = 0
+        self.valid = 0
+        self.invalid = 0
+        self.by_schema: Counter = Counter()
+        self.errors: List[Dict[str, Any]] = []
+        self.error_count = 0
+
+    def add_errors(self, line: int, schema: Optional[str], errors: List[Tuple[str, str]]) -> None:
+        self.invalid += 1
+        self.error_count += len(errors)
+        for path, message in errors:
+            if len(self.errors) >= self.max_errors:
+                break
+            self.errors.append({"line": line, "schema": schema, "path": path or "/", "message": message})
+
+    def merge(self, other: "ValidationStats") -> None:
+        """Add the counters of another run, e.g. of a worker process."""
+        self.instances += other.instances
+        self.valid += other.valid
+        self.invalid += other.invalid
+        self.by_schema.update(other.by_schema)
+        self.error_count += other.error_count
+        self.errors.extend(other.errors[:max(0, self.max_errors - len(self.errors))])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "instances": self.instances,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "error_count": self.error_count,
+            "by_schema": dict(sorted(self.by_schema.items())),
+            "errors": self.errors,
+        }
+
+
+def validate_lines(registry: SchemaRegistry, lines: Iterable[str], schema_name: Optional[str] = None,
+                   first_line: int = 1, max_errors: int = 100) -> ValidationStats:
+    """
+    Validate NDJSON lines against the registry's schemas.
+
+    Args:
+        registry: Loaded schemas
+        lines: One JSON instance per line, blank lines are skipped
+        schema_name: Schema for all instances, else the one named by each
+            instance's resourceType
+        first_line: Line number of the first line, for error reports
+        max_errors: Number of errors to keep in the stats
+
+    Returns:
+        The counters and the first errors
+    """
+    stats = ValidationStats(max_errors)
+    fixed_validator = None
+    fixed_schema = None
+    if schema_name:
+        fixed_schema = registry.find_schema(schema_name)
+        fixed_validator = registry.get_validator(schema_name)
+        if fixed_validator is None:
+            raise SchemaError(f"Unknown schema {schema_name}")
+    # resourceType -> (schema file name, validator)
+    by_type: Dict[str, Tuple[Optional[str], Optional[Validator]]] = {}
+    decode = json.JSONDecoder().decode
+
+    for line_number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        stats.instances += 1
+        try:
+            instance = decode(line)
+        except ValueError as e:
+            stats.add_errors(line_number, None, [("", f"invalid JSON: {e}")])
+            continue
+
+        schema, validator = fixed_schema, fixed_validator
+        if validator is None:
+            resource_type = instance.get("resourceType") if isinstance(instance, dict) else None
+            if not isinstance(resource_type, str):
+                stats.add_errors(line_number, None, [("", "instance has no resourceType and no --schema was given")])
+                continue
+            if resource_type not in by_type:
+                schema = registry.find_schema(f"StructureDefinition-{resource_type}.schema.json")
+                by_type[resource_type] = (schema, registry.get_validator(schema) if schema else None)
+            schema, validator = by_type[resource_type]
+            if validator is None:
+                stats.add_errors(line_number, None, [("", f"no schema for resourceType {resource_type}")])
+                continue
+
+        stats.by_schema[schema] += 1
+        errors = validator(instance)
+        if errors:
+            stats.add_errors(line_number, schema, errors)
+        else:
+            stats.valid += 1
+    return stats
+
+
+def iter_batches(files: List[str], batch_size: int = LINES_PER_TASK) -> Iterator[Tuple[int, List[str]]]:
+    """Yield (number of the first line, lines) batches of the instance files, in order."""
+    line_number = 1
+    for file_name in files:
+        f = sys.stdin if file_name == "-" else open(file_name, "r", encoding="utf-8")
+        try:
+            while True:
+                lines = list(islice(f, batch_size))
+                if not lines:
+                    break
+                yield line_number, lines
+                line_number += len(lines)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+# schema registry of a worker process, set up by init_worker
+worker_state: Dict[str, Any] = {}
+
+
+def init_worker(schema_dir: str, check_formats: bool, schema_name: Optional[str], max_errors: int) -> None:
+    setup_logging()
+    registry = SchemaRegistry(schema_dir, check_formats)
+    registry.compile_all()
+    worker_state.update(registry=registry, schema_name=schema_name, max_errors=max_errors)
+
+
+def validate_batch_in_worker(batch: Tuple[int, List[str]]) -> ValidationStats:
+    first_line, lines = batch
+    return validate_lines(worker_state["registry"], lines, worker_state["schema_name"],
+                          first_line, worker_state["max_errors"])
+
+
+def validate_files(schema_dir: str, files: List[str], schema_name: Optional[str] = None,
+                   jobs: int = 1, check_formats: bool = False, max_errors: int = 100) -> ValidationStats:
+    """
+    Validate NDJSON instance files, on jobs worker processes if jobs > 1.
+
+    Returns:
+        The merged counters; errors are kept in line order
+    """
+    logger = logging.getLogger(__name__)
+    stats = ValidationStats(max_errors)
+
+    # compiled here even when the workers compile their own copy, so the schema
+    # count and the unsupported keywords are reported once
+    start = time.perf_counter()
+    registry = SchemaRegistry(schema_dir, check_formats)
+    schema_count = registry.compile_all()
+    logger.info(f"Compiled {schema_count} schemas from {schema_dir} in {time.perf_counter() - start:.2f}s")
+    for keyword, count in sorted(registry.ignored_keywords.items()):
+        logger.warning(f"Unsupported schema keyword '{keyword}' ignored ({count} occurrences)")
+
+    if jobs > 1:
+        init_args = (schema_dir, check_formats, schema_name, max_errors)
+        with multiprocessing.get_context("spawn").Pool(jobs, initializer=init_worker, initargs=init_args) as pool:
+            for batch_stats in pool.imap(validate_batch_in_worker, iter_batches(files)):
+                stats.merge(batch_stats)
+        return stats
+
+    for first_line, lines in iter_batches(files):
+        stats.merge(validate_lines(registry, lines, schema_name, first_line, max_errors))
+    return stats
+
+
+def main() -> int:
+    """Main entry point for the script."""
+    parser = argparse.ArgumentParser(
+        description="Validate NDJSON instances against the generated logical model and ValueSet JSON schemas",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("files", nargs="*", default=["-"],
+                        help="NDJSON instance files (default: stdin)")
+    parser.add_argument("--schema-dir", default="output",
+                        help="Directory with the generated *.schema.json files (default: output)")
+    parser.add_argument("--schema", default=None,
+                        help="Validate every instance against this schema instead of the one named by its resourceType")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes, 0 for one per CPU (default: 1)")
+    parser.add_argument("--check-formats", action="store_true",
+                        help="Assert the date, date-time, time, uuid and uri formats")
+    parser.add_argument("--max-errors", type=int, default=100,
+                        help="Number of errors to log and report (default: 100)")
+    parser.add_argument("--report", default=None,
+                        help="Write the counters and errors as JSON to this file")
+    args = parser.parse_args()
+
+    logger = setup_logging()
+    jobs = args.jobs if args.jobs >= 1 else (os.cpu_count() or 1)
+
+    if not os.path.isdir(args.schema_dir):
+        logger.error(f"Schema directory does not exist: {args.schema_dir}")
+        return 2
+
+    start = time.perf_counter()
+    try:
+        stats = validate_files(args.schema_dir, args.files, args.schema, jobs,
+                               args.check_formats, args.max_errors)
+    except (SchemaError, OSError) as e:
+        logger.error(f"Validation failed: {e}")
+        return 2
+    elapsed = time.perf_counter() - start
+
+    for error in stats.errors:
+        logger.info(f"line {error['line']}: {error['schema'] or '-'} {error['path']}: {error['message']}")
+    rate = stats.instances / elapsed if elapsed > 0 else 0
+    logger.info(f"Validated {stats.instances} instances in {elapsed:.2f}s ({rate:,.0f} instances/s): "
+                f"{stats.valid} valid, {stats.invalid} invalid, {stats.error_count} errors")
+    for schema, count in sorted(stats.by_schema.items()):
+        logger.info(f"  {schema}: {count} instances")
+
+    if args.report:
+        report = stats.as_dict()
+        report.update(elapsed_seconds=round(elapsed, 3), instances_per_second=round(rate, 1), jobs=jobs)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logger.info(f"Validation report saved to {args.report}")
+
+    return 1 if stats.invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,13 +12,27 @@ The module handles various escaping scenarios required for:
 - Markdown documentation
 - Code system processing
 
+The identifier helpers (to_hash, escape_code, markdown_escape, name_to_id
+and name_to_lower_id) are pure and are called from the innermost loops of
+the extractors, so they are memoized with bounded LRU caches. Only the pure
+computation is cached; the hashing of over-long ids, and its log messages,
+happen on every call. Hit and miss counts are available from cache_stats()
+and log_cache_stats().
+
 Author: SMART Guidelines Team
 """
-from typing import Optional, Union
+from typing import Dict, Optional, Union
+import functools
 import hashlib
 import logging
 import re
 
+cache_size: int = 65536
+
+quote_pattern = re.compile(r"['\"]")
+whitespace_pattern = re.compile(r"\s+")
+non_id_pattern = re.compile('[^0-9a-zA-Z\\-\\.]+')
+
 
 def to_hash(input: str, len: int) -> str:
     """
@@ -35,6 +49,11 @@ def to_hash(input: str, len: int) -> str:
     Returns:
         Truncated string with hash suffix
     """
+    return _to_hash(input, len)
+
+
+@functools.lru_cache(maxsize=cache_size)
+def _to_hash(input: str, len: int) -> str:
     return input[:len - 10] + \
         str(hashlib.shake_256(input.encode()).hexdigest(5))
 
@@ -101,11 +120,24 @@ def escape_code(input: str) -> Optional[str]:
     Returns:
         Safe identifier string, or None if input is not a string
     """
-    original = input
     if (not (isinstance(input, str))):
         return None
+    code = _escape_code(input)
+    # logged here rather than in the cached _escape_code, so on every call
+    if len(code) > 245:
+        # max filename size is 255, leave space for extensions such as .fsh
+        logging.getLogger(__name__).info(
+            "ERROR: name of id is too long.hashing: " + code)
+        code = to_hash(code, 245)
+        logging.getLogger(__name__).info(
+            "Escaping code " + input + " to " + code)
+    return code
+
+
+@functools.lru_cache(maxsize=cache_size)
+def _escape_code(input: str) -> str:
     input = input.strip()
-    input = re.sub(r"['\"]", "", input)
+    input = quote_pattern.sub("", input)
     # SUSHI BUG on processing codes with double quote.  sushi fails
     # Example \"Bivalent oral polio vaccine (bOPV)–inactivated polio vaccine
     # (IPV)\" schedule (in countries with high vaccination coverage [e.g.
@@ -113,15 +145,7 @@ def escape_code(input: str) -> Optional[str]:
     # countries that share substantial population movement have a similarly
     # high coverage])"
 
-    input = re.sub(r"\s+", " ", input)
-    if len(input) > 245:
-        # max filename size is 255, leave space for extensions such as .fsh
-        logging.getLogger(__name__).info(
-            "ERROR: name of id is too long.hashing: " + input)
-        input = to_hash(input, 245)
-        logging.getLogger(__name__).info(
-            "Escaping code " + original + " to " + input)
-    return input
+    return whitespace_pattern.sub(" ", input)
 
 
 def markdown_escape(input: str) -> str:
@@ -139,8 +163,12 @@ def markdown_escape(input: str) -> str:
     """
     if not isinstance(input, str):
         return " "
-    input = input.replace('"""', '\\"\\"\\"')
-    return input
+    return _markdown_escape(input)
+
+
+@functools.lru_cache(maxsize=cache_size)
+def _markdown_escape(input: str) -> str:
+    return input.replace('"""', '\\"\\"\\"')
 
 
 def ruleset_escape(input: str) -> str:
@@ -229,7 +257,12 @@ def name_to_lower_id(name: str) -> Optional[str]:
     """
     if (not (isinstance(name, str))):
         return None
-    return name_to_id(name.lower())
+    return hash_long_id(_name_to_lower_id(name))
+
+
+@functools.lru_cache(maxsize=cache_size)
+def _name_to_lower_id(name: str) -> str:
+    return _name_to_id(name.lower())
 
 
 def name_to_id(name: str) -> Optional[str]:
@@ -248,9 +281,11 @@ def name_to_id(name: str) -> Optional[str]:
     """
     if (not (isinstance(name, str))):
         return None
-    id = re.sub('[^0-9a-zA-Z\\-\\.]+', '', name)
-    # to work around jekyll error, make sure there are no trailing periods...
-    id = id.rstrip('.')
+    return hash_long_id(_name_to_id(name))
+
+
+def hash_long_id(id: str) -> str:
+    # outside the cached functions so every over-long id is logged
     if len(id) > 55:
         # make length of an id is 64 characters
         # we need to make use of hashes
@@ -258,3 +293,53 @@ def name_to_id(name: str) -> Optional[str]:
             "ERROR: name of id is too long. hashing.: " + id)
         id = to_hash(id, 55)
     return id
+
+
+@functools.lru_cache(maxsize=cache_size)
+def _name_to_id(name: str) -> str:
+    id = non_id_pattern.sub('', name)
+    # to work around jekyll error, make sure there are no trailing periods...
+    return id.rstrip('.')
+
+
+cached_functions = {
+    'to_hash': _to_hash,
+    'escape_code': _escape_code,
+    'markdown_escape': _markdown_escape,
+    'name_to_id': _name_to_id,
+    'name_to_lower_id': _name_to_lower_id,
+}
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get hit/miss counters of the memoized identifier functions.
+
+    Returns:
+        Mapping of function name to {'hits', 'misses', 'size', 'maxsize'}
+    """
+    stats = {}
+    for name, function in cached_functions.items():
+        info = function.cache_info()
+        stats[name] = {'hits': info.hits, 'misses': info.misses,
+                       'size': info.currsize, 'maxsize': info.maxsize}
+    return stats
+
+
+def log_cache_stats(logger: Optional[logging.Logger] = None) -> None:
+    """
+    Write the cache counters of the memoized identifier functions to the log.
+
+    Args:
+        logger: Logger to write to, defaults to this module's logger
+    """
+    logger = logger or logging.getLogger(__name__)
+    for name, stats in cache_stats().items():
+        logger.info(f"stringer.{name} cache: {stats['hits']} hits, "
+                    f"{stats['misses']} misses, {stats['size']}/{stats['maxsize']} entries")
+
+
+def cache_clear() -> None:
+    """Empty the caches of the memoized identifier functions."""
+    for function in cached_functions.values():
+        function.cache_clear()
@@ -15,6 +15,7 @@ Author: SMART Guidelines Team
 from typing import List
 import logging
 import glob as glob
+from pathlib import Path
 import os
 from extractor import extractor 
 from installer import installer
@@ -35,6 +36,7 @@ class svg_extractor(extractor):
         namespaces (dict): XML namespaces used in SVG files
     """
     xslt_file: str = "includes/svg2svg.xsl"
+    parallel_safe: bool = True
     namespaces: dict = {'svg':'http://www.w3.org/2000/svg'}
     
     def __init__(self, installer: installer) -> None:
@@ -76,12 +78,10 @@ class svg_extractor(extractor):
         Returns:
             True if transformation and copy successful, False otherwise
         """
-        with open(self.inputfile_name, 'r', encoding="utf-8") as file:
-            svg = str(file.read())
-            outputfile_name = "input/images/" + os.path.basename(self.inputfile_name)
-            if not self.installer.transform_xml("svg",svg,out_path=outputfile_name):
-                self.logger.info("Could not transform svg on " + self.inputfile_name)
-                return False
+        outputfile_name = "input/images/" + os.path.basename(self.inputfile_name)
+        if not self.installer.transform_xml("svg",Path(self.inputfile_name),out_path=outputfile_name):
+            self.logger.info("Could not transform svg on " + self.inputfile_name)
+            return False
         return True
             
 
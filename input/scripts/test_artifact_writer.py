@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for artifact_writer.py
+
+Run from the repository root with:
+    python -m unittest discover -s input/scripts -p "test_*.py"
+
+Author: SMART Guidelines Team
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import artifact_writer
+
+
+class StripVolatileTest(unittest.TestCase):
+
+    def test_top_level_timestamp_is_ignored(self):
+        a = {"@id": "x", "generatedAt": "2024-01-01T00:00:00Z"}
+        b = {"@id": "x", "generatedAt": "2025-06-30T12:00:00Z"}
+        self.assertEqual(artifact_writer.content_hash(a), artifact_writer.content_hash(b))
+
+    def test_nested_property_named_generated_at_is_content(self):
+        a = {"properties": {"generatedAt": {"type": "string"}}}
+        b = {"properties": {"generatedAt": {"type": "integer"}}}
+        self.assertNotEqual(artifact_writer.content_hash(a), artifact_writer.content_hash(b))
+
+    def test_context_term_is_kept(self):
+        data = {"@context": {"generatedAt": {"@id": "http://www.w3.org/ns/prov#generatedAtTime"}},
+                "generatedAt": "2024-01-01T00:00:00Z"}
+        self.assertEqual(artifact_writer.strip_volatile(data),
+                         {"@context": {"generatedAt": {"@id": "http://www.w3.org/ns/prov#generatedAtTime"}}})
+
+    def test_stream_hash_matches_content_hash(self):
+        head = {"@context": {"generatedAt": {"@id": "prov:generatedAtTime"}}, "generatedAt": "now"}
+        items = [{"@id": "a", "generatedAt": "kept"}, {"@id": "b"}]
+        tail = {"generatedAt": "later"}
+        stripped = "".join(stripped for _, stripped in
+                           artifact_writer.iter_json_stream(head, "@graph", items, tail))
+        expected = artifact_writer.render_json(
+            artifact_writer.strip_volatile({**head, "@graph": items, **tail}))
+        self.assertEqual(stripped, expected)
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        artifact_writer.manifests.clear()
+
+    def tearDown(self):
+        artifact_writer.manifests.clear()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_manifest_is_kept_out_of_the_output_directory(self):
+        filepath = os.path.join("output", "ValueSet-X.schema.json")
+        self.assertTrue(artifact_writer.write_json({"generatedAt": "1"}, filepath))
+        artifact_writer.save_manifests()
+        self.assertEqual(os.listdir("output"), ["ValueSet-X.schema.json"])
+        with open(artifact_writer.MANIFEST_PATH, "r", encoding="utf-8") as f:
+            directories = json.load(f)["directories"]
+        self.assertIn("ValueSet-X.schema.json", directories[os.path.abspath("output")])
+
+        artifact_writer.manifests.clear()
+        self.assertFalse(artifact_writer.write_json({"generatedAt": "2"}, filepath))
+
+
+if __name__ == "__main__":
+    unittest.main()
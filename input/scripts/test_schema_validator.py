@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests for schema_validator.py
+
+Run from the repository root with:
+    python -m unittest discover -s input/scripts -p "test_*.py"
+
+Author: SMART Guidelines Team
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import schema_validator
+
+VALUESET_SCHEMA = {
+    "$id": "http://example.org/ValueSet-Colors.schema.json",
+    "type": "string",
+    "enum": ["red", "green"],
+}
+
+MODEL_SCHEMA = {
+    "$id": "http://example.org/StructureDefinition-Paint.schema.json",
+    "type": "object",
+    "properties": {
+        "resourceType": {"const": "Paint"},
+        "color": {"$ref": "./ValueSet-Colors.schema.json"},
+        "mix": {"type": "array", "items": {"$ref": "#/$defs/part"}},
+    },
+    "required": ["resourceType", "color"],
+    "$defs": {
+        "part": {
+            "type": "object",
+            "properties": {
+                "color": {"$ref": "http://example.org/ValueSet-Colors.schema.json"},
+                "parts": {"type": "array", "items": {"$ref": "#/$defs/part"}},
+            },
+        },
+    },
+}
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write_schema("ValueSet-Colors.schema.json", VALUESET_SCHEMA)
+        self.write_schema("StructureDefinition-Paint.schema.json", MODEL_SCHEMA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_schema(self, filename, schema):
+        with open(os.path.join(self.tmp.name, filename), "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+
+    def validator(self, schema):
+        self.write_schema("Test.schema.json", schema)
+        return schema_validator.SchemaRegistry(self.tmp.name).get_validator("Test")
+
+
+class RefTest(RegistryTestCase):
+
+    def test_cross_file_ref(self):
+        check = schema_validator.SchemaRegistry(self.tmp.name).get_validator("Paint")
+        self.assertIsNone(check({"resourceType": "Paint", "color": "red"}))
+        self.assertEqual(check({"resourceType": "Paint", "color": "blue"}),
+                         [("/color", "value is not one of the 2 allowed values")])
+
+    def test_recursive_ref(self):
+        check = schema_validator.SchemaRegistry(self.tmp.name).get_validator("Paint")
+        mix = [{"color": "red", "parts": [{"color": "green", "parts": [{"color": "blue"}]}]}]
+        self.assertEqual(check({"resourceType": "Paint", "color": "red", "mix": mix}),
+                         [("/mix/0/parts/0/parts/0/color", "value is not one of the 2 allowed values")])
+
+    def test_unresolved_ref(self):
+        with self.assertLogs(schema_validator.__name__, "WARNING"):
+            check = self.validator({"$ref": "./ValueSet-Missing.schema.json"})
+        self.assertEqual(check("red"), [("", "unresolved $ref ./ValueSet-Missing.schema.json")])
+
+
+class KeywordTest(RegistryTestCase):
+
+    def test_enum_tells_booleans_from_numbers(self):
+        check = self.validator({"enum": [1, "a"]})
+        self.assertIsNone(check(1))
+        self.assertIsNone(check(1.0))
+        self.assertIsNotNone(check(True))
+        check = self.validator({"enum": [True]})
+        self.assertIsNone(check(True))
+        self.assertIsNotNone(check(1))
+
+    def test_const_tells_booleans_from_numbers(self):
+        check = self.validator({"const": 1})
+        self.assertIsNone(check(1.0))
+        self.assertIsNotNone(check(True))
+        check = self.validator({"const": False})
+        self.assertIsNone(check(False))
+        self.assertIsNotNone(check(0))
+
+    def test_one_of(self):
+        check = self.validator({"oneOf": [{"type": "integer"}, {"type": "number"}]})
+        self.assertIsNone(check(1.5))
+        self.assertIsNotNone(check(1))
+        self.assertIsNotNone(check("1"))
+
+    def test_any_of(self):
+        check = self.validator({"anyOf": [{"type": "string"}, {"type": "null"}]})
+        self.assertIsNone(check("a"))
+        self.assertIsNone(check(None))
+        self.assertIsNotNone(check(1))
+
+    def test_not(self):
+        check = self.validator({"not": {"type": "string"}})
+        self.assertIsNone(check(1))
+        self.assertIsNotNone(check("a"))
+
+    def test_object_type_without_property_checks(self):
+        for schema in ({"type": "object", "properties": {}}, {"type": "object", "required": []}):
+            check = self.validator(schema)
+            self.assertIsNone(check({}))
+            self.assertIsNotNone(check("a string"))
+            self.assertIsNotNone(check([]))
+
+    def test_fused_object_and_array_types(self):
+        check = self.validator({"type": "object", "required": ["a"]})
+        self.assertEqual(check([]), [("", "expected type object")])
+        check = self.validator({"type": "array", "items": {"type": "string"}})
+        self.assertEqual(check({}), [("", "expected type array")])
+        self.assertEqual(check(["a", 1]), [("/1", "expected type string")])
+
+
+class ValidateTest(RegistryTestCase):
+
+    def instances(self):
+        return [
+            json.dumps({"resourceType": "Paint", "color": "red"}),
+            json.dumps({"resourceType": "Paint", "color": "blue"}),
+            json.dumps({"resourceType": "Brush"}),
+            json.dumps({"color": "red"}),
+            "",
+            "{not json",
+        ]
+
+    def test_validate_lines_routes_by_resource_type(self):
+        registry = schema_validator.SchemaRegistry(self.tmp.name)
+        stats = schema_validator.validate_lines(registry, self.instances())
+        self.assertEqual((stats.instances, stats.valid, stats.invalid), (5, 1, 4))
+        self.assertEqual(stats.by_schema, {"StructureDefinition-Paint.schema.json": 2})
+        self.assertEqual([(error["line"], error["message"]) for error in stats.errors], [
+            (2, "value is not one of the 2 allowed values"),
+            (3, "no schema for resourceType Brush"),
+            (4, "instance has no resourceType and no --schema was given"),
+            (6, "invalid JSON: Expecting property name enclosed in double quotes: line 1 column 2 (char 1)"),
+        ])
+
+    def test_validate_lines_with_fixed_schema(self):
+        registry = schema_validator.SchemaRegistry(self.tmp.name)
+        stats = schema_validator.validate_lines(registry, ['"red"', '"blue"'], "ValueSet-Colors")
+        self.assertEqual((stats.valid, stats.invalid), (1, 1))
+
+    def test_jobs_give_the_same_result_as_a_serial_run(self):
+        # more lines than one worker task, so the batches are merged in order
+        lines = self.instances() * (schema_validator.LINES_PER_TASK // 3)
+        instances_path = os.path.join(self.tmp.name, "instances.ndjson")
+        with open(instances_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        with self.assertLogs(schema_validator.__name__, "INFO"):
+            serial = schema_validator.validate_files(self.tmp.name, [instances_path], max_errors=5000)
+        with self.assertLogs(schema_validator.__name__, "INFO"):
+            parallel = schema_validator.validate_files(self.tmp.name, [instances_path], jobs=2, max_errors=5000)
+        self.assertGreater(serial.instances, schema_validator.LINES_PER_TASK)
+        self.assertEqual(parallel.as_dict(), serial.as_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()